@@ -1,14 +1,19 @@
 #!/usr/bin/env python3
 import json
 import os
-import subprocess
 import sys
 import time
-import urllib.error
-import urllib.request
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any, Tuple
 
+import usage_cache
+import usage_credentials
+import usage_retry
+import usage_schedule
+import usage_trace
+from usage_retry import Deadline
+from usage_trace import span
+
 DEBUG = os.environ.get("MODELMETER_DEBUG", "").strip() == "1"
 
 
@@ -21,16 +26,26 @@ CRED_PATHS = [
     os.path.expanduser("~/.claude/.credentials.json"),
     os.path.expanduser("~/.config/claude/.credentials.json"),
 ]
+# Claude Code's own config, which records the signed-in account.
+CLAUDE_CONFIG_PATH = os.path.join(
+    os.environ.get("CLAUDE_CONFIG_DIR", "").strip() or os.path.expanduser("~"), ".claude.json"
+)
+ACCOUNT_MEMO_NAME = "claude-account.json"
 USAGE_URL = os.environ.get("CLAUDE_USAGE_URL", "").strip() or "https://api.anthropic.com/api/oauth/usage"
 TOKEN_URL = os.environ.get("CLAUDE_TOKEN_URL", "").strip() or "https://platform.claude.com/v1/oauth/token"
+PROVIDER = "claude"
 CLIENT_ID = "9d1c250a-e61b-44d9-88ed-5944d1962f5e"
 SCOPES = "user:profile user:inference user:sessions:claude_code user:mcp_servers"
 REFRESH_BUFFER_MS = 5 * 60 * 1000
+KEYCHAIN_SERVICE = "Claude Code-credentials"
+
+
+class UsageError(Exception):
+    pass
 
 
 def fail(message: str) -> None:
-    print(message, file=sys.stderr)
-    raise SystemExit(1)
+    raise UsageError(message)
 
 
 def try_decode_hex(raw: str) -> str:
@@ -47,13 +62,16 @@ def try_decode_hex(raw: str) -> str:
 
 
 def keychain_read() -> Optional[dict]:
+    import subprocess
+
     try:
-        result = subprocess.run(
-            ["security", "find-generic-password", "-s", "Claude Code-credentials", "-w"],
-            check=False,
-            capture_output=True,
-            text=True,
-        )
+        with span("keychain.read"):
+            result = subprocess.run(
+                ["security", "find-generic-password", "-s", KEYCHAIN_SERVICE, "-w"],
+                check=False,
+                capture_output=True,
+                text=True,
+            )
         if result.returncode != 0:
             return None
         raw = result.stdout.strip()
@@ -66,9 +84,11 @@ def keychain_read() -> Optional[dict]:
 
 
 def keychain_write(payload: dict) -> None:
+    import subprocess
+
     try:
         subprocess.run(
-            ["security", "add-generic-password", "-s", "Claude Code-credentials", "-U", "-w",
+            ["security", "add-generic-password", "-s", KEYCHAIN_SERVICE, "-U", "-w",
              json.dumps(payload, separators=(",", ":"))],
             check=False,
             capture_output=True,
@@ -78,17 +98,27 @@ def keychain_write(payload: dict) -> None:
         pass
 
 
+def credentials_fresh(creds: dict) -> bool:
+    oauth = creds.get("claudeAiOauth")
+    return isinstance(oauth, dict) and not needs_refresh(oauth)
+
+
 def read_credentials() -> Tuple[dict, str, Optional[str]]:
     for path in CRED_PATHS:
         if not os.path.exists(path):
             continue
         try:
-            with open(path, "r", encoding="utf-8") as handle:
-                return json.load(handle), "file", path
+            with span("credentials.read", source="file"):
+                return usage_credentials.load_json(path, credentials_fresh), "file", path
         except Exception:
             fail("Failed to read Claude credentials.")
 
-    keychain_payload = keychain_read()
+    # The keychain costs a `security` fork; reuse it until the token nears expiry.
+    keychain_payload = usage_credentials.cached_secret(KEYCHAIN_SERVICE, credentials_fresh)
+    if keychain_payload is None:
+        keychain_payload = keychain_read()
+        if isinstance(keychain_payload, dict):
+            usage_credentials.remember_secret(KEYCHAIN_SERVICE, keychain_payload)
     if keychain_payload is not None:
         return keychain_payload, "keychain", None
 
@@ -99,14 +129,18 @@ def read_credentials() -> Tuple[dict, str, Optional[str]]:
 def write_credentials(payload: dict, source: str, path: Optional[str]) -> None:
     if source == "keychain":
         keychain_write(payload)
+        usage_credentials.remember_secret(KEYCHAIN_SERVICE, payload)
         return
     if not path:
         return
     try:
-        with open(path, "w", encoding="utf-8") as handle:
-            json.dump(payload, handle, separators=(",", ":"))
+        usage_credentials.write_json(path, payload)
     except Exception:
-        pass
+        usage_credentials.forget_json(path)
+
+
+def endpoint_name(url: str) -> str:
+    return "token" if url == TOKEN_URL else "usage"
 
 
 def request_json(
@@ -114,25 +148,44 @@ def request_json(
     method: str,
     headers: dict,
     body: Optional[dict],
-    timeout: int = 15
+    timeout: int = 15,
+    deadline: Optional[Deadline] = None,
 ) -> Tuple[int, Dict[str, Any], Dict[str, Any], Optional[str]]:
+    # http.client and ssl are the bulk of startup; only pay for them when a request is made.
+    with span("http.import"):
+        import usage_http
+    import usage_breaker
+    import usage_metrics
+
     data = None
     if body is not None:
         data = json.dumps(body).encode("utf-8")
-    req = urllib.request.Request(url, data=data, method=method)
-    for key, value in headers.items():
-        req.add_header(key, value)
+    requested = timeout
+    if deadline is not None:
+        timeout = deadline.timeout(timeout)
+    usage_breaker.check(url)
+    started = time.perf_counter()
     try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            status = resp.getcode()
-            raw = resp.read().decode("utf-8")
-            payload = json.loads(raw) if raw else {}
-            return status, payload, dict(resp.headers), None
-    except urllib.error.HTTPError as exc:
-        return exc.code, {}, {}, str(exc)
+        status, resp_headers, raw = usage_http.request(url, method, headers, data, timeout)
     except Exception as exc:
-        return 0, {}, {}, str(exc)
-    return 0, {}, {}, "Unknown error"
+        import socket
+
+        usage_metrics.record_request(PROVIDER, endpoint_name(url), 0, time.perf_counter() - started)
+        # A timeout cut short by our own deadline is not the endpoint's fault.
+        if not (timeout < requested and isinstance(exc, (TimeoutError, socket.timeout))):
+            usage_breaker.observe(url, 0)
+        raise usage_breaker.EndpointUnavailable(f"Request to {url} failed: {exc}") from exc
+    usage_metrics.record_request(PROVIDER, endpoint_name(url), status, time.perf_counter() - started)
+    usage_breaker.observe(url, status)
+    if status < 200 or status >= 300:
+        return status, {}, resp_headers, f"HTTP Error {status}"
+    try:
+        with span("json.decode", bytes=len(raw)):
+            text = raw.decode("utf-8")
+            payload = json.loads(text) if text else {}
+    except Exception as exc:
+        return 0, {}, resp_headers, str(exc)
+    return status, payload, resp_headers, None
 
 
 def needs_refresh(oauth: dict) -> bool:
@@ -142,7 +195,49 @@ def needs_refresh(oauth: dict) -> bool:
     return (int(time.time() * 1000) + REFRESH_BUFFER_MS) >= int(expires_at)
 
 
-def refresh_token(oauth: dict, creds: dict, source: str, path: Optional[str]) -> Optional[str]:
+def reread_credentials(source: str, path: Optional[str]) -> Optional[dict]:
+    if source == "keychain":
+        return keychain_read()
+    if not path:
+        return None
+    try:
+        return usage_credentials.load_json(path)
+    except Exception:
+        return None
+
+
+def refresh_token(
+    oauth: dict, creds: dict, source: str, path: Optional[str], deadline: Optional[Deadline] = None
+) -> Optional[str]:
+    lock_timeout = usage_credentials.LOCK_TIMEOUT_S
+    if deadline is not None:
+        lock_timeout = deadline.cap(lock_timeout)
+    with usage_credentials.refresh_lock("claude-refresh", lock_timeout):
+        # Another process may have refreshed while we waited for the lock.
+        latest = reread_credentials(source, path)
+        latest_oauth = latest.get("claudeAiOauth") if isinstance(latest, dict) else None
+        if (
+            isinstance(latest_oauth, dict)
+            and latest_oauth.get("accessToken") != oauth.get("accessToken")
+            and isinstance(latest_oauth.get("accessToken"), str)
+            and not needs_refresh(latest_oauth)
+        ):
+            debug("refresh_token: reusing token refreshed by another process")
+            oauth.clear()
+            oauth.update(latest_oauth)
+            creds.clear()
+            creds.update(latest)
+            creds["claudeAiOauth"] = oauth
+            if source == "keychain":
+                usage_credentials.remember_secret(KEYCHAIN_SERVICE, creds)
+            return oauth["accessToken"]
+        with span("token.refresh"):
+            return request_token_refresh(oauth, creds, source, path, deadline)
+
+
+def request_token_refresh(
+    oauth: dict, creds: dict, source: str, path: Optional[str], deadline: Optional[Deadline] = None
+) -> Optional[str]:
     refresh = oauth.get("refreshToken")
     if not isinstance(refresh, str) or not refresh.strip():
         return None
@@ -158,6 +253,7 @@ def refresh_token(oauth: dict, creds: dict, source: str, path: Optional[str]) ->
             "scope": SCOPES,
         },
         timeout=15,
+        deadline=deadline,
     )
     if status < 200 or status >= 300:
         return None
@@ -176,9 +272,9 @@ def refresh_token(oauth: dict, creds: dict, source: str, path: Optional[str]) ->
     return access
 
 
-def fetch_usage(token: str) -> Tuple[int, dict]:
+def fetch_usage(token: str, deadline: Optional[Deadline] = None) -> Tuple[int, dict, dict]:
     debug(f"fetch_usage: GET {USAGE_URL}")
-    status, payload, _, err = request_json(
+    status, payload, headers, err = request_json(
         USAGE_URL,
         "GET",
         {
@@ -190,33 +286,35 @@ def fetch_usage(token: str) -> Tuple[int, dict]:
         },
         None,
         timeout=10,
+        deadline=deadline,
     )
     debug(f"fetch_usage: HTTP {status}")
     debug(f"fetch_usage: raw payload = {json.dumps(payload, indent=2)}")
     if err:
         debug(f"fetch_usage: error = {err}")
-    return status, payload
+    return status, payload, headers
 
 
 def fetch_usage_with_retry(
-    token: str, oauth: dict, creds: dict, source: str, path: Optional[str]
+    token: str, oauth: dict, creds: dict, source: str, path: Optional[str], deadline: Optional[Deadline] = None
 ) -> Tuple[dict, str]:
-    status, payload = fetch_usage(token)
+    status, payload, headers = fetch_usage(token, deadline)
     if status in (401, 403):
         print(f"Got HTTP {status}, attempting token refresh...", file=sys.stderr)
-        refreshed = refresh_token(oauth, creds, source, path)
+        refreshed = refresh_token(oauth, creds, source, path, deadline)
         if refreshed:
-            status, payload = fetch_usage(refreshed)
-            if 200 <= status < 300:
-                return payload, refreshed
-    # Retry on 429 with exponential backoff
-    if status == 429:
-        for attempt, delay in enumerate([2, 5, 10], start=1):
-            debug(f"fetch_usage_with_retry: 429 rate limited, retry {attempt} after {delay}s")
-            time.sleep(delay)
-            status, payload = fetch_usage(token)
-            if status != 429:
-                break
+            token = refreshed
+            status, payload, headers = fetch_usage(token, deadline)
+    attempt = 0
+    while status == 429:
+        delay = usage_retry.retry_delay(headers, attempt)
+        out_of_budget = deadline is not None and not deadline.allows_sleep(delay)
+        if attempt >= usage_retry.MAX_RATE_LIMIT_RETRIES or out_of_budget:
+            raise usage_retry.RateLimited(delay, f"Usage request rate limited by {USAGE_URL}")
+        attempt += 1
+        debug(f"fetch_usage_with_retry: 429 rate limited, retry {attempt} after {delay:.1f}s")
+        time.sleep(delay)
+        status, payload, headers = fetch_usage(token, deadline)
     if 200 <= status < 300:
         return payload, token
     fail(f"Usage request failed: HTTP {status} from {USAGE_URL}")
@@ -239,7 +337,7 @@ def normalize_percent(value) -> float:
     return numeric
 
 
-def main() -> None:
+def collect_usage(deadline: Optional[Deadline] = None) -> dict:
     creds, source, path = read_credentials()
     oauth = creds.get("claudeAiOauth")
     if not isinstance(oauth, dict):
@@ -250,27 +348,32 @@ def main() -> None:
         fail("Claude access token missing. Run `claude` to log in.")
 
     if needs_refresh(oauth):
-        refreshed = refresh_token(oauth, creds, source, path)
+        refreshed = refresh_token(oauth, creds, source, path, deadline)
         if refreshed:
             access = refreshed
         else:
             fail("Token expired. Run `claude` to re-authenticate.")
 
-    data, access = fetch_usage_with_retry(access, oauth, creds, source, path)
+    data, access = fetch_usage_with_retry(access, oauth, creds, source, path, deadline)
+    with span("normalize"):
+        return normalize_usage(data)
+
+
+def normalize_usage(data: dict) -> dict:
     five_hour = data.get("five_hour", {}) if isinstance(data.get("five_hour"), dict) else {}
     seven_day = data.get("seven_day", {}) if isinstance(data.get("seven_day"), dict) else {}
 
-    debug(f"main: five_hour dict = {json.dumps(five_hour, indent=2)}")
-    debug(f"main: seven_day dict = {json.dumps(seven_day, indent=2)}")
+    debug(f"collect_usage: five_hour dict = {json.dumps(five_hour, indent=2)}")
+    debug(f"collect_usage: seven_day dict = {json.dumps(seven_day, indent=2)}")
 
     raw_session = five_hour.get("utilization", 0.0)
     raw_weekly = seven_day.get("utilization", 0.0)
-    debug(f"main: raw utilization session={raw_session!r} (type={type(raw_session).__name__})")
-    debug(f"main: raw utilization weekly={raw_weekly!r} (type={type(raw_weekly).__name__})")
+    debug(f"collect_usage: raw utilization session={raw_session!r} (type={type(raw_session).__name__})")
+    debug(f"collect_usage: raw utilization weekly={raw_weekly!r} (type={type(raw_weekly).__name__})")
 
     session_percent = normalize_percent(raw_session)
     weekly_percent = normalize_percent(raw_weekly)
-    debug(f"main: normalized session_percent={session_percent}, weekly_percent={weekly_percent}")
+    debug(f"collect_usage: normalized session_percent={session_percent}, weekly_percent={weekly_percent}")
 
     payload = {
         "sessionPercent": session_percent,
@@ -280,7 +383,232 @@ def main() -> None:
         "updatedAt": datetime.now(timezone.utc).isoformat(),
     }
 
-    debug(f"main: final payload = {json.dumps(payload, indent=2)}")
+    debug(f"collect_usage: final payload = {json.dumps(payload, indent=2)}")
+    return payload
+
+
+def account_uuid() -> str:
+    """The signed-in account's uuid from Claude Code's config, or "" if unknown.
+
+    The config can run to several MB, so the answer is memoized in the state
+    dir against the file's signature and only re-parsed when the file changes.
+    """
+    from usage_state import read_json_file, state_path, write_json_atomic
+
+    try:
+        signature = list(usage_credentials.file_signature(CLAUDE_CONFIG_PATH))
+    except OSError:
+        return ""
+    memo_path = state_path(ACCOUNT_MEMO_NAME)
+    memo = read_json_file(memo_path)
+    if isinstance(memo, dict) and memo.get("signature") == signature and isinstance(memo.get("uuid"), str):
+        return memo["uuid"]
+    try:
+        with open(CLAUDE_CONFIG_PATH, "r", encoding="utf-8") as handle:
+            account = json.load(handle).get("oauthAccount")
+    except Exception:
+        account = None
+    uuid = account.get("accountUuid") if isinstance(account, dict) else None
+    uuid = uuid if isinstance(uuid, str) else ""
+    try:
+        write_json_atomic(memo_path, {"signature": signature, "uuid": uuid})
+    except OSError:
+        pass
+    return uuid
+
+
+def account_key() -> str:
+    """Key for per-account state: where the credentials live, plus the account uuid when known.
+
+    Nothing here changes when a token is refreshed, and the keychain is not
+    read, so a cached run does not have to fork `security`.
+    """
+    source = next((path for path in CRED_PATHS if os.path.exists(path)), "keychain")
+    uuid = account_uuid()
+    return f"{source}#{uuid}" if uuid else source
+
+
+def fetch_and_cache(deadline_s: Optional[float] = None) -> dict:
+    import usage_breaker
+
+    account = account_key()
+    try:
+        waiting = usage_retry.rate_limited_for(PROVIDER, account)
+        if waiting > 0:
+            raise usage_retry.RateLimited(waiting, "Usage endpoint is rate limiting requests")
+        try:
+            payload = collect_usage(Deadline(deadline_s))
+        except usage_retry.RateLimited as exc:
+            usage_retry.note_rate_limit(PROVIDER, account, exc.retry_after)
+            raise
+    except usage_retry.RateLimited as exc:
+        entry = usage_cache.load(PROVIDER, account)
+        if entry is None:
+            fail(f"{exc} (retry in {exc.retry_after:.0f}s).")
+        return usage_retry.mark_rate_limited(entry["payload"], exc.retry_after)
+    except (usage_breaker.EndpointUnavailable, usage_retry.DeadlineExceeded) as exc:
+        # Offline or out of time: answer at once with the last good payload instead of blanking the meter.
+        entry = usage_cache.load(PROVIDER, account)
+        if entry is None:
+            fail(str(exc))
+        return usage_breaker.mark_stale(entry["payload"], usage_cache.age_of(entry), getattr(exc, "retry_after", 0.0))
+    usage_retry.clear_rate_limit(PROVIDER, account)
+    import usage_forecast
+    import usage_history
+    import usage_metrics
+    import usage_snapshot
+
+    with span("forecast"):
+        payload = usage_forecast.annotate(PROVIDER, payload)
+    usage_metrics.observe_usage(PROVIDER, payload)
+    with span("cache.store"):
+        usage_cache.store(PROVIDER, account, payload)
+    with span("history.record"):
+        usage_history.record_poll(PROVIDER, payload)
+    with span("snapshot.write"):
+        usage_snapshot.record_poll(PROVIDER, payload)
+    return payload
+
+
+def read_usage(
+    ttl: float, max_stale: float, in_process: bool = False, deadline_s: Optional[float] = None
+) -> dict:
+    """Cached usage for this account; `in_process` revalidates on a thread instead of a child process."""
+    account = account_key()
+
+    def fetch() -> dict:
+        return fetch_and_cache(deadline_s)
+
+    if in_process:
+        background = usage_cache.revalidate_in_thread(PROVIDER, account, fetch)
+    else:
+        background = usage_cache.revalidate_detached([os.path.abspath(__file__), "--revalidate"])
+    return usage_cache.read_through(PROVIDER, account, fetch, ttl, max_stale, background)
+
+
+def read_local_usage(source: str, session_budget: Optional[float], weekly_budget: Optional[float]) -> dict:
+    """Usage derived from files Claude Code keeps locally; no network involved."""
+    if source == "stats-cache":
+        import usage_stats_cache
+
+        try:
+            return usage_stats_cache.collect_usage(session_budget, weekly_budget)
+        except usage_stats_cache.StatsCacheError as exc:
+            fail(str(exc))
+    if source == "session-logs":
+        import usage_windows
+
+        try:
+            return usage_windows.collect_usage(session_budget, weekly_budget)
+        except OSError as exc:
+            fail(f"Failed to read Claude session logs: {exc}")
+    fail(f"Unknown usage source: {source}")
+    return {}
+
+
+def cached_fast_path() -> Optional[dict]:
+    """Answer a plain invocation from a --socket server or the cache before argparse, ssl or http.client are imported."""
+    if len(sys.argv) > 1:
+        return None
+    from usage_state import socket_path
+
+    # Only pay for importing the client when a --socket server may be listening.
+    if os.path.exists(socket_path(PROVIDER)):
+        import usage_socket
+
+        snapshot = usage_socket.get_snapshot(socket_path(PROVIDER))
+        if snapshot is not None:
+            return snapshot
+    revalidate = usage_cache.revalidate_detached([os.path.abspath(__file__), "--revalidate"])
+    try:
+        return usage_cache.lookup(
+            PROVIDER, account_key(), usage_cache.default_ttl(), usage_cache.default_max_stale(), revalidate
+        )
+    except Exception:
+        return None
+
+
+def main() -> None:
+    trace = usage_trace.options(PROVIDER)
+    cached = cached_fast_path()
+    if cached is not None:
+        print(json.dumps(usage_trace.finish(usage_schedule.annotate(cached), trace)))
+        return
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print Claude usage as ModelMeter JSON.")
+    parser.add_argument("--serve", action="store_true", help="Answer JSON-lines refresh requests on stdin/stdout")
+    parser.add_argument("--cache-ttl", type=float, help="Serve cached usage younger than this many seconds (0 disables)")
+    parser.add_argument("--max-stale", type=float, help="Seconds past the TTL a stale value is served while revalidating")
+    parser.add_argument("--deadline", type=float, help="Overall seconds budget for refresh, fetch and retries")
+    parser.add_argument("--source", choices=["api", "stats-cache", "session-logs"], default="api",
+                        help="Where usage comes from: the OAuth usage API or local Claude Code files")
+    parser.add_argument("--session-token-budget", type=float, help="Tokens treated as 100%% session usage for local sources")
+    parser.add_argument("--weekly-token-budget", type=float, help="Tokens treated as 100%% weekly usage for local sources")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep polling, printing one JSON line per poll and waiting nextPollAfter seconds between them")
+    parser.add_argument("--socket", nargs="?", const="", metavar="PATH",
+                        help="Own fetching and serve snapshots to local clients on a Unix socket "
+                             "(default ~/.modelmeter/run/<provider>.sock)")
+    parser.add_argument("--timings", action="store_true", help="Add per-phase milliseconds as a `timings` object")
+    parser.add_argument("--trace", metavar="PATH", help="Write a Chrome trace-event file for the run")
+    parser.add_argument("--revalidate", action="store_true", help=argparse.SUPPRESS)
+    args, _ = parser.parse_known_args()
+    ttl = usage_cache.default_ttl() if args.cache_ttl is None else max(0.0, args.cache_ttl)
+    max_stale = usage_cache.default_max_stale() if args.max_stale is None else max(0.0, args.max_stale)
+    deadline_s = usage_retry.default_deadline() if args.deadline is None else max(0.0, args.deadline)
+    long_running = args.serve or args.watch or args.socket is not None
+    if args.watch or args.socket is not None:
+        # A self-scheduled poll wants current data, not a stale value plus a background refresh.
+        max_stale = 0.0
+
+    if args.revalidate:
+        try:
+            fetch_and_cache(deadline_s)
+        except UsageError:
+            pass
+        finally:
+            usage_cache.release_revalidation(PROVIDER, account_key())
+        return
+
+    if args.source != "api":
+        def poll() -> dict:
+            return read_local_usage(args.source, args.session_token_budget, args.weekly_token_budget)
+    else:
+        def poll() -> dict:
+            return read_usage(ttl, max_stale, in_process=long_running, deadline_s=deadline_s)
+
+    def refresh() -> dict:
+        import usage_metrics
+
+        trace = usage_trace.options(PROVIDER, args.timings, args.trace)
+        usage_trace.reset()
+        try:
+            with span("poll", source=args.source):
+                payload = usage_schedule.annotate(poll())
+        finally:
+            usage_metrics.flush()
+        return usage_trace.finish(payload, trace)
+
+    if args.serve:
+        from usage_daemon import serve
+        raise SystemExit(serve(refresh))
+
+    if args.watch:
+        raise SystemExit(usage_schedule.watch(refresh, (UsageError,)))
+
+    if args.socket is not None:
+        import usage_socket
+
+        path = args.socket or usage_socket.default_path(PROVIDER)
+        raise SystemExit(usage_socket.serve(refresh, (UsageError,), path))
+
+    try:
+        payload = refresh()
+    except UsageError as exc:
+        print(str(exc), file=sys.stderr)
+        raise SystemExit(1)
     print(json.dumps(payload))
 
 
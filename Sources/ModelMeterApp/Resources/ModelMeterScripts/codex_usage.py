@@ -3,29 +3,41 @@ import json
 import os
 import sys
 import time
-import urllib.parse
-import urllib.request
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any, Tuple
 
+import usage_cache
+import usage_credentials
+import usage_retry
+import usage_schedule
+import usage_trace
+from usage_retry import Deadline
+from usage_trace import span
+
 AUTH_PATH = os.path.expanduser("~/.codex/auth.json")
-USAGE_URL = "https://chatgpt.com/backend-api/wham/usage"
-TOKEN_URL = "https://auth.openai.com/oauth/token"
+USAGE_URL = os.environ.get("CODEX_USAGE_URL", "").strip() or "https://chatgpt.com/backend-api/wham/usage"
+TOKEN_URL = os.environ.get("CODEX_TOKEN_URL", "").strip() or "https://auth.openai.com/oauth/token"
+PROVIDER = "codex"
 CLIENT_ID = "app_EMoamEEZ73f0CkXaXp7hrann"
+# Only used for access tokens whose `exp` claim cannot be read.
 REFRESH_AGE_MS = 8 * 24 * 60 * 60 * 1000
+REFRESH_BUFFER_MS = 5 * 60 * 1000
+
+
+class UsageError(Exception):
+    pass
 
 
 def fail(message: str) -> None:
-    print(message, file=sys.stderr)
-    raise SystemExit(1)
+    raise UsageError(message)
 
 
 def read_json(path: str) -> dict:
     if not os.path.exists(path):
         fail("Codex auth not found. Run `codex` to log in.")
     try:
-        with open(path, "r", encoding="utf-8") as handle:
-            return json.load(handle)
+        with span("credentials.read", source="file"):
+            return usage_credentials.load_json(path)
     except Exception:
         fail("Failed to read Codex auth file.")
     return {}
@@ -33,10 +45,13 @@ def read_json(path: str) -> dict:
 
 def write_json(path: str, payload: dict) -> None:
     try:
-        with open(path, "w", encoding="utf-8") as handle:
-            json.dump(payload, handle, indent=2)
+        usage_credentials.write_json(path, payload, indent=2)
     except Exception:
-        pass
+        usage_credentials.forget_json(path)
+
+
+def endpoint_name(url: str) -> str:
+    return "token" if url == TOKEN_URL else "usage"
 
 
 def request_json(
@@ -44,23 +59,71 @@ def request_json(
     method: str,
     headers: dict,
     body: Optional[bytes],
-    timeout: int = 15
-) -> Tuple[int, Dict[str, Any], Dict[str, Any]]:
-    req = urllib.request.Request(url, data=body, method=method)
-    for key, value in headers.items():
-        req.add_header(key, value)
+    timeout: int = 15,
+    deadline: Optional[Deadline] = None,
+) -> Tuple[int, Dict[str, Any], Dict[str, Any], Optional[str]]:
+    # http.client and ssl are the bulk of startup; only pay for them when a request is made.
+    with span("http.import"):
+        import usage_http
+    import usage_breaker
+    import usage_metrics
+
+    requested = timeout
+    if deadline is not None:
+        timeout = deadline.timeout(timeout)
+    usage_breaker.check(url)
+    started = time.perf_counter()
     try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            status = resp.getcode()
-            raw = resp.read().decode("utf-8")
-            payload = json.loads(raw) if raw else {}
-            return status, payload, dict(resp.headers)
+        status, resp_headers, raw = usage_http.request(url, method, headers, body, timeout)
     except Exception as exc:
-        fail(f"Request failed: {exc}")
-    return 0, {}, {}
+        import socket
+
+        usage_metrics.record_request(PROVIDER, endpoint_name(url), 0, time.perf_counter() - started)
+        # A timeout cut short by our own deadline is not the endpoint's fault.
+        if not (timeout < requested and isinstance(exc, (TimeoutError, socket.timeout))):
+            usage_breaker.observe(url, 0)
+        raise usage_breaker.EndpointUnavailable(f"Request to {url} failed: {exc}") from exc
+    usage_metrics.record_request(PROVIDER, endpoint_name(url), status, time.perf_counter() - started)
+    usage_breaker.observe(url, status)
+    if status < 200 or status >= 300:
+        return status, {}, resp_headers, f"HTTP Error {status}"
+    try:
+        with span("json.decode", bytes=len(raw)):
+            text = raw.decode("utf-8")
+            payload = json.loads(text) if text else {}
+    except Exception as exc:
+        return 0, {}, resp_headers, str(exc)
+    return status, payload, resp_headers, None
+
+
+def token_expires_at(access: Any) -> Optional[int]:
+    """Expiry of a JWT access token in epoch milliseconds, from its unverified `exp` claim."""
+    if not isinstance(access, str) or access.count(".") != 2:
+        return None
+    import base64
+
+    segment = access.split(".")[1]
+    try:
+        claims = json.loads(base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4)))
+    except Exception:
+        return None
+    exp = claims.get("exp") if isinstance(claims, dict) else None
+    if isinstance(exp, bool) or not isinstance(exp, (int, float)):
+        return None
+    return int(exp * 1000)
+
+
+def token_expired(auth: dict) -> bool:
+    tokens = auth.get("tokens") if isinstance(auth.get("tokens"), dict) else {}
+    expires_at = token_expires_at(tokens.get("access_token"))
+    return expires_at is not None and int(time.time() * 1000) >= expires_at
 
 
 def needs_refresh(auth: dict) -> bool:
+    tokens = auth.get("tokens") if isinstance(auth.get("tokens"), dict) else {}
+    expires_at = token_expires_at(tokens.get("access_token"))
+    if expires_at is not None:
+        return (int(time.time() * 1000) + REFRESH_BUFFER_MS) >= expires_at
     last_refresh = auth.get("last_refresh")
     if not isinstance(last_refresh, str):
         return True
@@ -71,7 +134,33 @@ def needs_refresh(auth: dict) -> bool:
     return (int(time.time() * 1000) - last_ms) > REFRESH_AGE_MS
 
 
-def refresh_token(auth: dict) -> Optional[str]:
+def refresh_token(auth: dict, deadline: Optional[Deadline] = None) -> Optional[str]:
+    lock_timeout = usage_credentials.LOCK_TIMEOUT_S
+    if deadline is not None:
+        lock_timeout = deadline.cap(lock_timeout)
+    with usage_credentials.refresh_lock("codex-refresh", lock_timeout):
+        # Another process (or the Codex CLI) may have refreshed while we waited.
+        try:
+            latest = usage_credentials.load_json(AUTH_PATH)
+        except Exception:
+            latest = {}
+        current = auth.get("tokens") if isinstance(auth.get("tokens"), dict) else {}
+        latest_tokens = latest.get("tokens") if isinstance(latest.get("tokens"), dict) else {}
+        latest_access = latest_tokens.get("access_token")
+        if (
+            isinstance(latest_access, str)
+            and latest_access.strip()
+            and latest_access != current.get("access_token")
+            and not needs_refresh(latest)
+        ):
+            auth.clear()
+            auth.update(latest)
+            return latest_access
+        with span("token.refresh"):
+            return request_token_refresh(auth, deadline)
+
+
+def request_token_refresh(auth: dict, deadline: Optional[Deadline] = None) -> Optional[str]:
     tokens = auth.get("tokens") if isinstance(auth.get("tokens"), dict) else None
     if not tokens:
         return None
@@ -79,21 +168,24 @@ def refresh_token(auth: dict) -> Optional[str]:
     if not isinstance(refresh, str) or not refresh.strip():
         return None
 
-    body = urllib.parse.urlencode({
+    from urllib.parse import urlencode
+
+    body = urlencode({
         "grant_type": "refresh_token",
         "client_id": CLIENT_ID,
         "refresh_token": refresh,
     }).encode("utf-8")
 
-    status, payload, _ = request_json(
+    status, payload, _, _ = request_json(
         TOKEN_URL,
         "POST",
         {"Content-Type": "application/x-www-form-urlencoded"},
         body,
         timeout=15,
+        deadline=deadline,
     )
 
-    if status >= 400:
+    if status < 200 or status >= 300:
         return None
 
     access = payload.get("access_token")
@@ -111,7 +203,9 @@ def refresh_token(auth: dict) -> Optional[str]:
     return access
 
 
-def fetch_usage(token: str, account_id: Optional[str]) -> Tuple[dict, dict]:
+def fetch_usage(
+    token: str, account_id: Optional[str], deadline: Optional[Deadline] = None
+) -> Tuple[int, dict, dict, Optional[str]]:
     headers = {
         "Authorization": f"Bearer {token}",
         "Accept": "application/json",
@@ -119,10 +213,36 @@ def fetch_usage(token: str, account_id: Optional[str]) -> Tuple[dict, dict]:
     }
     if account_id:
         headers["ChatGPT-Account-Id"] = account_id
-    status, payload, resp_headers = request_json(USAGE_URL, "GET", headers, None, timeout=10)
-    if status < 200 or status >= 300:
-        fail(f"Usage request failed (HTTP {status}).")
-    return payload, resp_headers
+    return request_json(USAGE_URL, "GET", headers, None, timeout=10, deadline=deadline)
+
+
+def fetch_usage_with_retry(token: str, auth: dict, deadline: Optional[Deadline] = None) -> Tuple[dict, dict]:
+    tokens = auth.get("tokens") if isinstance(auth.get("tokens"), dict) else {}
+    status, payload, headers, err = fetch_usage(token, tokens.get("account_id"), deadline)
+    if status in (401, 403):
+        print(f"Got HTTP {status}, attempting token refresh...", file=sys.stderr)
+        refreshed = refresh_token(auth, deadline)
+        if refreshed:
+            token = refreshed
+            tokens = auth.get("tokens") if isinstance(auth.get("tokens"), dict) else {}
+            status, payload, headers, err = fetch_usage(token, tokens.get("account_id"), deadline)
+    attempt = 0
+    while status == 429:
+        delay = usage_retry.retry_delay(headers, attempt)
+        out_of_budget = deadline is not None and not deadline.allows_sleep(delay)
+        if attempt >= usage_retry.MAX_RATE_LIMIT_RETRIES or out_of_budget:
+            raise usage_retry.RateLimited(delay, "Usage request rate limited")
+        attempt += 1
+        time.sleep(delay)
+        status, payload, headers, err = fetch_usage(token, tokens.get("account_id"), deadline)
+    if 200 <= status < 300:
+        return payload, headers
+    if status == 0:
+        fail(f"Usage request failed: {err}")
+    if status in (401, 403):
+        fail(f"Usage request failed (HTTP {status}). Run `codex` to log in again.")
+    fail(f"Usage request failed (HTTP {status}).")
+    return {}, {}
 
 
 def read_number(value) -> Optional[float]:
@@ -143,7 +263,7 @@ def reset_from_window(window: Optional[dict]) -> Optional[str]:
     return None
 
 
-def main() -> None:
+def collect_usage(deadline: Optional[Deadline] = None) -> dict:
     auth = read_json(AUTH_PATH)
     tokens = auth.get("tokens") if isinstance(auth.get("tokens"), dict) else None
     if not tokens:
@@ -154,12 +274,18 @@ def main() -> None:
         fail("Codex access token missing. Run `codex` to log in.")
 
     if needs_refresh(auth):
-        refreshed = refresh_token(auth)
+        refreshed = refresh_token(auth, deadline)
         if refreshed:
             access = refreshed
+        elif token_expired(auth):
+            fail("Codex token expired. Run `codex` to log in again.")
 
-    data, headers = fetch_usage(access, tokens.get("account_id"))
+    data, headers = fetch_usage_with_retry(access, auth, deadline)
+    with span("normalize"):
+        return normalize_usage(data, headers)
 
+
+def normalize_usage(data: dict, headers: dict) -> dict:
     header_primary = read_number(headers.get("x-codex-primary-used-percent"))
     header_secondary = read_number(headers.get("x-codex-secondary-used-percent"))
 
@@ -180,7 +306,170 @@ def main() -> None:
         "weeklyResetAt": reset_from_window(secondary_window),
         "updatedAt": datetime.now(timezone.utc).isoformat(),
     }
+    return payload
+
+
+def account_key() -> str:
+    try:
+        auth = usage_credentials.load_json(AUTH_PATH)
+    except Exception:
+        return AUTH_PATH
+    tokens = auth.get("tokens") if isinstance(auth.get("tokens"), dict) else {}
+    account_id = tokens.get("account_id")
+    return account_id if isinstance(account_id, str) and account_id else AUTH_PATH
+
+
+def fetch_and_cache(deadline_s: Optional[float] = None) -> dict:
+    import usage_breaker
+
+    account = account_key()
+    try:
+        waiting = usage_retry.rate_limited_for(PROVIDER, account)
+        if waiting > 0:
+            raise usage_retry.RateLimited(waiting, "Usage endpoint is rate limiting requests")
+        try:
+            payload = collect_usage(Deadline(deadline_s))
+        except usage_retry.RateLimited as exc:
+            usage_retry.note_rate_limit(PROVIDER, account, exc.retry_after)
+            raise
+    except usage_retry.RateLimited as exc:
+        entry = usage_cache.load(PROVIDER, account)
+        if entry is None:
+            fail(f"{exc} (retry in {exc.retry_after:.0f}s).")
+        return usage_retry.mark_rate_limited(entry["payload"], exc.retry_after)
+    except (usage_breaker.EndpointUnavailable, usage_retry.DeadlineExceeded) as exc:
+        # Offline or out of time: answer at once with the last good payload instead of blanking the meter.
+        entry = usage_cache.load(PROVIDER, account)
+        if entry is None:
+            fail(str(exc))
+        return usage_breaker.mark_stale(entry["payload"], usage_cache.age_of(entry), getattr(exc, "retry_after", 0.0))
+    usage_retry.clear_rate_limit(PROVIDER, account)
+    import usage_forecast
+    import usage_history
+    import usage_metrics
+    import usage_snapshot
+
+    with span("forecast"):
+        payload = usage_forecast.annotate(PROVIDER, payload)
+    usage_metrics.observe_usage(PROVIDER, payload)
+    with span("cache.store"):
+        usage_cache.store(PROVIDER, account, payload)
+    with span("history.record"):
+        usage_history.record_poll(PROVIDER, payload)
+    with span("snapshot.write"):
+        usage_snapshot.record_poll(PROVIDER, payload)
+    return payload
+
+
+def read_usage(
+    ttl: float, max_stale: float, in_process: bool = False, deadline_s: Optional[float] = None
+) -> dict:
+    """Cached usage for this account; `in_process` revalidates on a thread instead of a child process."""
+    account = account_key()
+
+    def fetch() -> dict:
+        return fetch_and_cache(deadline_s)
+
+    if in_process:
+        background = usage_cache.revalidate_in_thread(PROVIDER, account, fetch)
+    else:
+        background = usage_cache.revalidate_detached([os.path.abspath(__file__), "--revalidate"])
+    return usage_cache.read_through(PROVIDER, account, fetch, ttl, max_stale, background)
+
+
+def cached_fast_path() -> Optional[dict]:
+    """Answer a plain invocation from a --socket server or the cache before argparse, ssl or http.client are imported."""
+    if len(sys.argv) > 1:
+        return None
+    from usage_state import socket_path
+
+    # Only pay for importing the client when a --socket server may be listening.
+    if os.path.exists(socket_path(PROVIDER)):
+        import usage_socket
 
+        snapshot = usage_socket.get_snapshot(socket_path(PROVIDER))
+        if snapshot is not None:
+            return snapshot
+    revalidate = usage_cache.revalidate_detached([os.path.abspath(__file__), "--revalidate"])
+    try:
+        return usage_cache.lookup(
+            PROVIDER, account_key(), usage_cache.default_ttl(), usage_cache.default_max_stale(), revalidate
+        )
+    except Exception:
+        return None
+
+
+def main() -> None:
+    trace = usage_trace.options(PROVIDER)
+    cached = cached_fast_path()
+    if cached is not None:
+        print(json.dumps(usage_trace.finish(usage_schedule.annotate(cached), trace)))
+        return
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print Codex usage as ModelMeter JSON.")
+    parser.add_argument("--serve", action="store_true", help="Answer JSON-lines refresh requests on stdin/stdout")
+    parser.add_argument("--cache-ttl", type=float, help="Serve cached usage younger than this many seconds (0 disables)")
+    parser.add_argument("--max-stale", type=float, help="Seconds past the TTL a stale value is served while revalidating")
+    parser.add_argument("--deadline", type=float, help="Overall seconds budget for refresh, fetch and retries")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep polling, printing one JSON line per poll and waiting nextPollAfter seconds between them")
+    parser.add_argument("--socket", nargs="?", const="", metavar="PATH",
+                        help="Own fetching and serve snapshots to local clients on a Unix socket "
+                             "(default ~/.modelmeter/run/<provider>.sock)")
+    parser.add_argument("--timings", action="store_true", help="Add per-phase milliseconds as a `timings` object")
+    parser.add_argument("--trace", metavar="PATH", help="Write a Chrome trace-event file for the run")
+    parser.add_argument("--revalidate", action="store_true", help=argparse.SUPPRESS)
+    args, _ = parser.parse_known_args()
+    ttl = usage_cache.default_ttl() if args.cache_ttl is None else max(0.0, args.cache_ttl)
+    max_stale = usage_cache.default_max_stale() if args.max_stale is None else max(0.0, args.max_stale)
+    deadline_s = usage_retry.default_deadline() if args.deadline is None else max(0.0, args.deadline)
+    long_running = args.serve or args.watch or args.socket is not None
+    if args.watch or args.socket is not None:
+        # A self-scheduled poll wants current data, not a stale value plus a background refresh.
+        max_stale = 0.0
+
+    if args.revalidate:
+        try:
+            fetch_and_cache(deadline_s)
+        except UsageError:
+            pass
+        finally:
+            usage_cache.release_revalidation(PROVIDER, account_key())
+        return
+
+    def refresh() -> dict:
+        import usage_metrics
+
+        trace = usage_trace.options(PROVIDER, args.timings, args.trace)
+        usage_trace.reset()
+        try:
+            with span("poll"):
+                payload = read_usage(ttl, max_stale, in_process=long_running, deadline_s=deadline_s)
+                payload = usage_schedule.annotate(payload)
+        finally:
+            usage_metrics.flush()
+        return usage_trace.finish(payload, trace)
+
+    if args.serve:
+        from usage_daemon import serve
+        raise SystemExit(serve(refresh))
+
+    if args.watch:
+        raise SystemExit(usage_schedule.watch(refresh, (UsageError,)))
+
+    if args.socket is not None:
+        import usage_socket
+
+        path = args.socket or usage_socket.default_path(PROVIDER)
+        raise SystemExit(usage_socket.serve(refresh, (UsageError,), path))
+
+    try:
+        payload = refresh()
+    except UsageError as exc:
+        print(str(exc), file=sys.stderr)
+        raise SystemExit(1)
     print(json.dumps(payload))
 
 
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Fetch usage for several providers concurrently in one process.
+
+Prints one JSON document keyed by provider. Each value is either the
+provider's usual payload or {"error": "..."}, so one provider failing never
+hides the others. Every value carries `nextPollAfter` like the single-provider
+scripts print, and request metrics are flushed before exiting.
+"""
+import argparse
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import claude_usage
+import codex_usage
+import usage_cache
+import usage_retry
+import usage_schedule
+
+PROVIDERS = {
+    "claude": claude_usage,
+    "codex": codex_usage,
+}
+
+
+def parse_providers(raw: str) -> List[str]:
+    names = [name.strip().lower() for name in raw.split(",") if name.strip()]
+    unknown = [name for name in names if name not in PROVIDERS]
+    if unknown:
+        raise ValueError(f"Unknown provider(s): {', '.join(unknown)}")
+    return list(dict.fromkeys(names))
+
+
+def fetch_one(name: str, ttl: float, max_stale: float, deadline_s: float) -> dict:
+    try:
+        return usage_schedule.annotate(PROVIDERS[name].read_usage(ttl, max_stale, deadline_s=deadline_s))
+    except Exception as exc:
+        delay = max(usage_schedule.bounds()[0], usage_schedule.ERROR_RETRY_S)
+        return {"error": str(exc) or exc.__class__.__name__, "nextPollAfter": delay}
+
+
+def fetch_all(names: List[str], ttl: float, max_stale: float, deadline_s: float) -> Dict[str, dict]:
+    with ThreadPoolExecutor(max_workers=max(1, len(names))) as executor:
+        futures = {name: executor.submit(fetch_one, name, ttl, max_stale, deadline_s) for name in names}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Print usage for several providers as one JSON document.")
+    parser.add_argument("--providers", default=",".join(PROVIDERS), help="Comma-separated providers (default: all)")
+    parser.add_argument("--cache-ttl", type=float, help="Serve cached usage younger than this many seconds (0 disables)")
+    parser.add_argument("--max-stale", type=float, help="Seconds past the TTL a stale value is served while revalidating")
+    parser.add_argument("--deadline", type=float, help="Overall seconds budget per provider")
+    args = parser.parse_args()
+
+    try:
+        names = parse_providers(args.providers)
+    except ValueError as exc:
+        print(str(exc), file=sys.stderr)
+        return 2
+    if not names:
+        print("No providers selected.", file=sys.stderr)
+        return 2
+
+    ttl = usage_cache.default_ttl() if args.cache_ttl is None else max(0.0, args.cache_ttl)
+    max_stale = usage_cache.default_max_stale() if args.max_stale is None else max(0.0, args.max_stale)
+    deadline_s = usage_retry.default_deadline() if args.deadline is None else max(0.0, args.deadline)
+    import usage_metrics
+
+    try:
+        results = fetch_all(names, ttl, max_stale, deadline_s)
+    finally:
+        usage_metrics.flush()
+    print(json.dumps(results))
+    return 0 if any("error" not in result for result in results.values()) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
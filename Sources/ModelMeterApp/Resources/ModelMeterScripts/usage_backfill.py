@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""Parallel cold-start backfill of Claude Code session logs.
+
+When the window rings or their offset index are missing, every
+~/.claude/projects/*/*.jsonl file has to be parsed, which is several GB for
+heavy users. The backfill spreads the files over a process pool, largest
+first. Each worker turns one file into a partial aggregate: tokens per model
+per minute, plus the message keys it saw. The parent merges the partials in
+sorted path order, the same order `usage_sessions.tail` reads them in, and
+replays every message key through the same bounded OffsetIndex.first_sighting
+window that `usage_sessions.tail` uses, dropping messages already counted
+(resumed sessions copy their history into the new log). The result is
+identical to a sequential rebuild whatever the pool size or completion order.
+
+    usage_backfill.py                      # rebuild ~/.modelmeter/windows-claude.bin
+    usage_backfill.py --jobs 4 --output minutes.json
+
+Progress goes to stderr. Small trees (under POOL_MIN_BYTES) are parsed in
+process, since starting the pool would cost more than it saves.
+"""
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from usage_sessions import PROJECTS_DIR, OffsetIndex, consumed_until, read_appended, session_log_files
+
+POOL_MIN_BYTES = 64 << 20
+PROGRESS_INTERVAL_S = 0.5
+
+# (minute, model) -> [input, output, cache creation, cache read]
+MinuteTotals = Dict[Tuple[int, str], List[int]]
+Progress = Callable[[int, int, int, int], None]
+
+
+class FilePartial(NamedTuple):
+    path: str
+    inode: int
+    size: int
+    offset: int
+    minutes: MinuteTotals
+    # Every keyed message in this file, in file order; duplicates are dropped at merge time.
+    keyed: List[Tuple[str, int, str, Tuple[int, int, int, int]]]
+
+
+class Backfill(NamedTuple):
+    minutes: MinuteTotals
+    index: OffsetIndex
+    files: int
+    bytes: int
+
+
+def parse_file(task: Tuple[str, Optional[float]]) -> Optional[FilePartial]:
+    """Worker: aggregate one log file. Files last written before `since` are only indexed."""
+    path, since = task
+    try:
+        st = os.stat(path)
+        if since is not None and st.st_mtime < since:
+            return FilePartial(path, st.st_ino, st.st_size, consumed_until(path, 0, st.st_size), {}, [])
+        events, offset = read_appended(path, 0, st.st_size)
+    except OSError:
+        return None
+    minutes: MinuteTotals = {}
+    keyed = []
+    for event in events:
+        minute = int(event.timestamp // 60)
+        counts = (event.input_tokens, event.output_tokens, event.cache_creation_tokens, event.cache_read_tokens)
+        totals = minutes.setdefault((minute, event.model), [0, 0, 0, 0])
+        for position, value in enumerate(counts):
+            totals[position] += value
+        if event.message_key:
+            keyed.append((event.message_key, minute, event.model, counts))
+    return FilePartial(path, st.st_ino, st.st_size, offset, minutes, keyed)
+
+
+def _parse_all(tasks: List[Tuple[str, Optional[float]]], jobs: int) -> Iterable[Optional[FilePartial]]:
+    if jobs <= 1:
+        for task in tasks:
+            yield parse_file(task)
+        return
+    import multiprocessing
+
+    # spawn rather than fork: the caller may be a threaded --serve/--socket process.
+    with multiprocessing.get_context("spawn").Pool(jobs) as pool:
+        yield from pool.imap_unordered(parse_file, tasks, chunksize=1)
+
+
+def merge(partials: Iterable[FilePartial]) -> Tuple[MinuteTotals, OffsetIndex]:
+    """Fold partials in the order given, deduplicating message keys exactly as `usage_sessions.tail` does."""
+    minutes: MinuteTotals = {}
+    index = OffsetIndex()
+    for partial in partials:
+        index.files[partial.path] = {"inode": partial.inode, "size": partial.size, "offset": partial.offset}
+        file_minutes = partial.minutes
+        for key, minute, model, counts in partial.keyed:
+            if not index.first_sighting(key):
+                totals = file_minutes[(minute, model)]
+                for position, value in enumerate(counts):
+                    totals[position] -= value
+        for bucket, counts in file_minutes.items():
+            totals = minutes.setdefault(bucket, [0, 0, 0, 0])
+            for position, value in enumerate(counts):
+                totals[position] += value
+    return minutes, index
+
+
+def backfill(
+    projects_dir: str = PROJECTS_DIR,
+    jobs: Optional[int] = None,
+    since: Optional[float] = None,
+    progress: Optional[Progress] = None,
+) -> Backfill:
+    """Parse every session log under `projects_dir` into per-minute, per-model token totals."""
+    sized = []
+    for path in session_log_files(projects_dir):
+        try:
+            sized.append((os.path.getsize(path), path))
+        except OSError:
+            continue
+    total_bytes = sum(size for size, _ in sized)
+    if jobs is None:
+        jobs = (os.cpu_count() or 1) if total_bytes >= POOL_MIN_BYTES else 1
+    jobs = max(1, min(jobs, len(sized)))
+    # Largest first so one big log does not start last and hold up the whole pool.
+    tasks = [(path, since) for _, path in sorted(sized, key=lambda item: (-item[0], item[1]))]
+    sizes = {path: size for size, path in sized}
+
+    partials: Dict[str, FilePartial] = {}
+    done_bytes = 0
+    for done, partial in enumerate(_parse_all(tasks, jobs), 1):
+        if partial is not None:
+            partials[partial.path] = partial
+            done_bytes += sizes.get(partial.path, 0)
+        if progress is not None:
+            progress(done, len(tasks), done_bytes, total_bytes)
+    minutes, index = merge(partials[path] for path in sorted(partials))
+    return Backfill(minutes, index, len(partials), done_bytes)
+
+
+def windows_from(result: Backfill):
+    """usage_windows rings holding a backfill's totals; cache reads are left out as in counted_tokens."""
+    import usage_windows
+
+    windows = usage_windows.UsageWindows()
+    for (minute, _), counts in sorted(result.minutes.items()):
+        windows.add(minute * 60, counts[0] + counts[1] + counts[2])
+    return windows
+
+
+def rebuild_windows(projects_dir: str = PROJECTS_DIR, jobs: Optional[int] = None, progress: Optional[Progress] = None):
+    """Fresh usage_windows rings and offset index; logs untouched for a week are indexed without parsing."""
+    import usage_windows
+
+    result = backfill(projects_dir, jobs, time.time() - usage_windows.WEEKLY_MINUTES * 60, progress)
+    return windows_from(result), result.index
+
+
+def _progress_printer(stream) -> Progress:
+    interactive = stream.isatty()
+    last = [0.0]
+
+    def report(done: int, total: int, done_bytes: int, total_bytes: int) -> None:
+        now = time.monotonic()
+        if done < total and now - last[0] < PROGRESS_INTERVAL_S:
+            return
+        last[0] = now
+        line = f"backfill: {done}/{total} files, {done_bytes / 1e6:.0f}/{total_bytes / 1e6:.0f} MB"
+        stream.write(("\r" + line + ("\n" if done == total else "")) if interactive else line + "\n")
+        stream.flush()
+
+    return report
+
+
+def main() -> int:
+    import argparse
+
+    from usage_state import file_lock
+
+    import usage_windows
+
+    parser = argparse.ArgumentParser(description="Rebuild Claude token windows from every session log in parallel.")
+    parser.add_argument("--projects-dir", default=PROJECTS_DIR)
+    parser.add_argument("--jobs", type=int, help="Worker processes (default: one per core for large trees)")
+    parser.add_argument("--output", help="Also write per-minute, per-model totals for all history to this JSON file")
+    parser.add_argument("--quiet", action="store_true", help="No progress on stderr")
+    args = parser.parse_args()
+    progress = None if args.quiet else _progress_printer(sys.stderr)
+    started = time.monotonic()
+
+    with file_lock(usage_windows.LOCK_NAME, usage_windows.LOCK_TIMEOUT_S):
+        if args.output:
+            result = backfill(args.projects_dir, args.jobs, None, progress)
+            windows, index = windows_from(result), result.index
+            rows = [[minute, model, *counts] for (minute, model), counts in sorted(result.minutes.items())]
+            with open(args.output, "w", encoding="utf-8") as handle:
+                columns = ["minute", "model", "input", "output", "cacheCreation", "cacheRead"]
+                json.dump({"columns": columns, "rows": rows}, handle)
+        else:
+            windows, index = rebuild_windows(args.projects_dir, args.jobs, progress)
+        windows.save()
+        index.save(usage_windows.WINDOWS_INDEX_PATH)
+    session_total, weekly_total = windows.totals(time.time())
+    if not args.quiet:
+        print(
+            f"backfill: {len(index.files)} files in {time.monotonic() - started:.1f}s; "
+            f"session {session_total} tokens, weekly {weekly_total} tokens",
+            file=sys.stderr,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Per-endpoint circuit breaker shared by every run (~/.modelmeter/breakers.json).
+
+An endpoint is a scheme://host:port. Network errors (DNS, connect, TLS,
+timeouts) and 5xx answers count as failures; any other answer, even 401 or
+429, proves the endpoint is reachable and closes the circuit again.
+
+    closed     requests go through; FAILURE_THRESHOLD failures in a row open it
+    open       requests fail at once with EndpointUnavailable until the
+               backoff (30s doubling to 15 min, jittered) has passed
+    half-open  one run gets to probe; success closes the circuit, failure
+               reopens it with the next backoff step
+
+The provider scripts answer EndpointUnavailable with the last good cached
+payload marked `stale: true` and its `ageSeconds`, so a dead network costs
+no blocked processes and does not blank the meter.
+"""
+import random
+import time
+from urllib.parse import urlsplit
+
+from usage_state import file_lock, read_json_file, state_path, write_json_atomic
+
+BREAKERS_PATH = state_path("breakers.json")
+LOCK_NAME = "breakers"
+LOCK_TIMEOUT_S = 2.0
+FAILURE_THRESHOLD = 2
+BACKOFF_BASE_S = 30.0
+BACKOFF_CAP_S = 15 * 60.0
+# How long a half-open probe may take before another run is allowed to try.
+PROBE_TIMEOUT_S = 30.0
+
+
+class EndpointUnavailable(Exception):
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = max(0.0, retry_after)
+
+
+def endpoint_key(url: str) -> str:
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    port = parts.port or (443 if scheme == "https" else 80)
+    return f"{scheme}://{parts.hostname or ''}:{port}"
+
+
+def _well_formed(breaker) -> bool:
+    if not isinstance(breaker, dict) or breaker.get("state") not in ("closed", "open", "half-open"):
+        return False
+    return all(
+        isinstance(breaker.get(field, 0), (int, float)) and not isinstance(breaker.get(field, 0), bool)
+        for field in ("failures", "opens", "retryAt")
+    )
+
+
+def _load() -> dict:
+    """Breakers by endpoint; a corrupt file or entry reads as closed rather than failing the poll."""
+    raw = read_json_file(BREAKERS_PATH)
+    if not isinstance(raw, dict):
+        return {}
+    return {key: breaker for key, breaker in raw.items() if _well_formed(breaker)}
+
+
+def _save(breakers: dict) -> None:
+    write_json_atomic(BREAKERS_PATH, breakers)
+
+
+def _backoff(opens: int) -> float:
+    base = min(BACKOFF_CAP_S, BACKOFF_BASE_S * (2 ** max(0, opens - 1)))
+    return base * random.uniform(0.9, 1.1)
+
+
+def check(url: str) -> None:
+    """Raise EndpointUnavailable unless a request to `url` may go out now."""
+    key = endpoint_key(url)
+    breaker = _load().get(key)
+    if not isinstance(breaker, dict) or breaker.get("state") == "closed":
+        return
+    now = time.time()
+    with file_lock(LOCK_NAME, LOCK_TIMEOUT_S) as acquired:
+        if not acquired:
+            return
+        breakers = _load()
+        breaker = breakers.get(key)
+        if not isinstance(breaker, dict) or breaker.get("state") == "closed":
+            return
+        retry_at = float(breaker.get("retryAt") or 0.0)
+        if now < retry_at:
+            state = "probing" if breaker.get("state") == "half-open" else "open"
+            raise EndpointUnavailable(f"{key} is unreachable (circuit {state})", retry_at - now)
+        # This run is the probe; hold others off until it reports back or times out.
+        breaker["state"] = "half-open"
+        breaker["retryAt"] = now + PROBE_TIMEOUT_S
+        breakers[key] = breaker
+        _save(breakers)
+
+
+def record_success(url: str) -> None:
+    key = endpoint_key(url)
+    if key not in _load():
+        return
+    with file_lock(LOCK_NAME, LOCK_TIMEOUT_S) as acquired:
+        if not acquired:
+            return
+        breakers = _load()
+        if breakers.pop(key, None) is not None:
+            _save(breakers)
+
+
+def record_failure(url: str) -> None:
+    key = endpoint_key(url)
+    now = time.time()
+    with file_lock(LOCK_NAME, LOCK_TIMEOUT_S) as acquired:
+        if not acquired:
+            return
+        breakers = _load()
+        breaker = breakers.get(key) if isinstance(breakers.get(key), dict) else {}
+        failures = int(breaker.get("failures") or 0) + 1
+        opens = int(breaker.get("opens") or 0)
+        if breaker.get("state") == "half-open" or failures >= FAILURE_THRESHOLD:
+            opens += 1
+            breaker = {"state": "open", "failures": failures, "opens": opens, "retryAt": now + _backoff(opens)}
+        else:
+            breaker = {"state": "closed", "failures": failures, "opens": opens}
+        breakers[key] = breaker
+        _save(breakers)
+
+
+def observe(url: str, status: int) -> None:
+    """Feed one request outcome (status 0: no response) to the breaker; never fails the request.
+
+    Callers skip timeouts caused by their own deadline running out: those say
+    nothing about the endpoint.
+    """
+    try:
+        if status == 0 or status >= 500:
+            record_failure(url)
+        else:
+            record_success(url)
+    except OSError:
+        pass
+
+
+def mark_stale(payload: dict, age: float, retry_after: float) -> dict:
+    marked = dict(payload)
+    marked["stale"] = True
+    marked["ageSeconds"] = round(age, 1)
+    marked["retryAfter"] = round(retry_after, 1)
+    return marked
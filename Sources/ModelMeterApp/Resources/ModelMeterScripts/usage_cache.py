@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""On-disk snapshot cache shared by every consumer of the provider scripts.
+
+Entries live in ~/.modelmeter/cache/<provider>-<account hash>.json and hold the
+normalized payload plus the epoch time it was fetched. Reads inside the TTL are
+served from disk; reads within the stale window after that return the stale
+payload immediately and kick off one background revalidation.
+
+Both windows scale with the app's poll interval (MODELMETER_POLL_INTERVAL,
+default 30s). The TTL is a little under one interval, so consumers between two
+app polls share one fetch, and each app poll finds the entry expired. The
+stale window is one more interval: that poll gets the previous poll's value,
+about one interval old, at once and starts the single upstream fetch for the
+interval. Nothing older than the TTL plus one interval is served; a reader
+that finds an older entry waits for a fresh fetch instead.
+"""
+import os
+import sys
+import threading
+import time
+import zlib
+from typing import Callable, List, Optional
+
+from usage_state import read_json_file, state_path, write_json_atomic
+from usage_trace import span
+
+CACHE_DIR = state_path("cache")
+# The app's shortest poll setting.
+DEFAULT_POLL_INTERVAL_S = 30.0
+TTL_POLLS = 0.8
+MAX_STALE_POLLS = 1.0
+REVALIDATE_MARKER_TTL_S = 30.0
+
+
+def env_seconds(name: str, default: float) -> float:
+    try:
+        return max(0.0, float(os.environ.get(name, "").strip()))
+    except ValueError:
+        return default
+
+
+def poll_interval() -> float:
+    return env_seconds("MODELMETER_POLL_INTERVAL", DEFAULT_POLL_INTERVAL_S) or DEFAULT_POLL_INTERVAL_S
+
+
+def default_ttl() -> float:
+    return env_seconds("MODELMETER_CACHE_TTL", poll_interval() * TTL_POLLS)
+
+
+def default_max_stale() -> float:
+    return env_seconds("MODELMETER_CACHE_MAX_STALE", poll_interval() * MAX_STALE_POLLS)
+
+
+def cache_path(provider: str, account: str) -> str:
+    # zlib rather than hashlib: hashlib loads OpenSSL, which costs more than a cached run does.
+    raw = account.encode("utf-8")
+    digest = f"{zlib.crc32(raw):08x}{zlib.adler32(raw):08x}"
+    return os.path.join(CACHE_DIR, f"{provider}-{digest}.json")
+
+
+def load(provider: str, account: str) -> Optional[dict]:
+    entry = read_json_file(cache_path(provider, account))
+    if not isinstance(entry, dict):
+        return None
+    if not isinstance(entry.get("payload"), dict) or not isinstance(entry.get("fetchedAt"), (int, float)):
+        return None
+    return entry
+
+
+def store(provider: str, account: str, payload: dict) -> None:
+    try:
+        write_json_atomic(cache_path(provider, account), {"payload": payload, "fetchedAt": time.time()})
+    except OSError:
+        pass
+
+
+def age_of(entry: dict) -> float:
+    return max(0.0, time.time() - float(entry["fetchedAt"]))
+
+
+def _claim_revalidation(provider: str, account: str) -> bool:
+    """Create the revalidation marker; False if another process already owns it."""
+    marker = cache_path(provider, account) + ".refreshing"
+    try:
+        if time.time() - os.stat(marker).st_mtime > REVALIDATE_MARKER_TTL_S:
+            os.unlink(marker)
+    except OSError:
+        pass
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd = os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+    except OSError:
+        return False
+    os.close(fd)
+    return True
+
+
+def release_revalidation(provider: str, account: str) -> None:
+    try:
+        os.unlink(cache_path(provider, account) + ".refreshing")
+    except OSError:
+        pass
+
+
+def revalidate_detached(argv: List[str]) -> Callable[[], None]:
+    """Background strategy for one-shot runs: re-run the script without waiting."""
+    def spawn() -> None:
+        import subprocess
+
+        subprocess.Popen(
+            [sys.executable] + argv,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+    return spawn
+
+
+def revalidate_in_thread(provider: str, account: str, fetch: Callable[[], dict]) -> Callable[[], None]:
+    """Background strategy for long-running processes."""
+    def run() -> None:
+        try:
+            fetch()
+        except Exception:
+            pass
+        finally:
+            release_revalidation(provider, account)
+
+    def start() -> None:
+        threading.Thread(target=run, daemon=True).start()
+    return start
+
+
+def lookup(
+    provider: str,
+    account: str,
+    ttl: float,
+    max_stale: float,
+    revalidate: Callable[[], None],
+) -> Optional[dict]:
+    """The cached payload if it is fresh, or stale enough to serve while `revalidate` runs; else None."""
+    if ttl <= 0:
+        return None
+    with span("cache.lookup", provider=provider):
+        entry = load(provider, account)
+    if entry is None:
+        return None
+    age = age_of(entry)
+    if age < ttl:
+        return entry["payload"]
+    if age < ttl + max_stale:
+        if _claim_revalidation(provider, account):
+            try:
+                revalidate()
+            except Exception:
+                release_revalidation(provider, account)
+        return entry["payload"]
+    return None
+
+
+def read_through(
+    provider: str,
+    account: str,
+    fetch: Callable[[], dict],
+    ttl: float,
+    max_stale: float,
+    revalidate: Callable[[], None],
+) -> dict:
+    """Return a cached payload when possible, otherwise `fetch()` one and store it.
+
+    `fetch` is expected to call `store()` itself so background revalidations
+    update the cache too.
+    """
+    payload = lookup(provider, account, ttl, max_stale, revalidate)
+    if payload is not None:
+        return payload
+    return fetch()
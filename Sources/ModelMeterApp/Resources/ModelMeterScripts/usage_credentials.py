@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""In-process credential cache for the provider scripts.
+
+Credential files are re-parsed only when their device/inode/mtime/size
+signature changes, and secrets read through a subprocess (the macOS keychain)
+are kept until the caller says the token inside is close to expiring. Callers
+always receive a deep copy, so mutating a refreshed token never leaks into the
+cache before it has been written back.
+
+Both caches live only as long as the process. The saving is for --serve,
+--watch and --socket, which poll many times from one process. A one-shot run
+or a --revalidate child still reads the keychain once, since copying the
+secret to disk would undo the reason it is in the keychain.
+
+Token refreshes are single-flighted across processes with an advisory lock,
+and credential files are replaced atomically (temp file + fsync + rename).
+"""
+import copy
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from usage_state import file_lock, write_bytes_atomic
+
+Signature = Tuple[int, int, int, int]
+LOCK_TIMEOUT_S = 30.0
+
+_lock = threading.Lock()
+_files: Dict[str, Tuple[Signature, dict]] = {}
+_secrets: Dict[str, dict] = {}
+
+
+def file_signature(path: str) -> Signature:
+    st = os.stat(path)
+    return st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def load_json(path: str, is_fresh: Optional[Callable[[dict], bool]] = None) -> dict:
+    """Return the parsed JSON object at `path`, reusing the last parse when unchanged.
+
+    Raises OSError/ValueError like a plain `json.load` would.
+    """
+    signature = file_signature(path)
+    with _lock:
+        cached = _files.get(path)
+    if cached is not None and cached[0] == signature and (is_fresh is None or is_fresh(cached[1])):
+        return copy.deepcopy(cached[1])
+
+    with open(path, "r", encoding="utf-8") as handle:
+        payload = json.load(handle)
+    if not isinstance(payload, dict):
+        raise ValueError(f"Expected a JSON object in {path}")
+    with _lock:
+        _files[path] = (signature, payload)
+    return copy.deepcopy(payload)
+
+
+def write_json(path: str, payload: dict, indent: Optional[int] = None) -> None:
+    """Atomically replace a credential file through any symlink; the result is always owner-only (0600)."""
+    target = os.path.realpath(path)
+    separators = None if indent else (",", ":")
+    data = json.dumps(payload, indent=indent, separators=separators).encode("utf-8")
+    write_bytes_atomic(target, data, 0o600)
+    remember_json(path, payload)
+
+
+def remember_json(path: str, payload: dict) -> None:
+    """Record what we just wrote to `path` so the next load skips the parse."""
+    try:
+        signature = file_signature(path)
+    except OSError:
+        forget_json(path)
+        return
+    with _lock:
+        _files[path] = (signature, copy.deepcopy(payload))
+
+
+def forget_json(path: str) -> None:
+    with _lock:
+        _files.pop(path, None)
+
+
+def cached_secret(name: str, is_fresh: Callable[[dict], bool]) -> Optional[dict]:
+    with _lock:
+        payload = _secrets.get(name)
+    if payload is None or not is_fresh(payload):
+        return None
+    return copy.deepcopy(payload)
+
+
+def remember_secret(name: str, payload: dict) -> None:
+    with _lock:
+        _secrets[name] = copy.deepcopy(payload)
+
+
+@contextmanager
+def refresh_lock(name: str, timeout: float = LOCK_TIMEOUT_S) -> Iterator[bool]:
+    """Serialize token refreshes across threads and processes.
+
+    Yields False if the lock could not be taken within `timeout`, in which case
+    the caller proceeds unserialized rather than blocking the poll indefinitely.
+    """
+    with file_lock(name, timeout) as acquired:
+        yield acquired
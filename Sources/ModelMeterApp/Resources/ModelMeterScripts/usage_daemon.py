@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""JSON-lines request loop shared by the provider scripts' `--serve` mode.
+
+Each request is one JSON object per line on stdin:
+
+    {"id": 1, "method": "refresh"}
+
+and each response is one JSON object per line on stdout:
+
+    {"id": 1, "result": {"sessionPercent": ..., "weeklyPercent": ..., ...}}
+    {"id": 1, "error": "Token expired. Run `claude` to re-authenticate."}
+
+Supported methods are `refresh` (the default when `method` is omitted),
+`ping` and `shutdown`. The loop exits cleanly on EOF.
+"""
+import json
+import sys
+from typing import Any, Callable, Dict, TextIO, Tuple
+
+
+def write_message(stream: TextIO, message: Dict[str, Any]) -> None:
+    stream.write(json.dumps(message) + "\n")
+    stream.flush()
+
+
+def handle_line(line: str, refresh: Callable[[], dict]) -> Tuple[Dict[str, Any], bool]:
+    """Answer one request line; the flag is False once the loop should stop."""
+    try:
+        request = json.loads(line)
+    except json.JSONDecodeError as exc:
+        return {"id": None, "error": f"Invalid request: {exc}"}, True
+    if not isinstance(request, dict):
+        return {"id": None, "error": "Invalid request: expected a JSON object."}, True
+
+    request_id = request.get("id")
+    method = request.get("method") or "refresh"
+    if method == "ping":
+        return {"id": request_id, "result": "pong"}, True
+    if method == "shutdown":
+        return {"id": request_id, "result": "bye"}, False
+    if method != "refresh":
+        return {"id": request_id, "error": f"Unknown method: {method}"}, True
+
+    try:
+        return {"id": request_id, "result": refresh()}, True
+    except Exception as exc:
+        return {"id": request_id, "error": str(exc) or exc.__class__.__name__}, True
+
+
+def serve(refresh: Callable[[], dict], stdin: TextIO = sys.stdin, stdout: TextIO = sys.stdout) -> int:
+    while True:
+        line = stdin.readline()
+        if not line:
+            return 0
+        line = line.strip()
+        if not line:
+            continue
+        response, keep_running = handle_line(line, refresh)
+        write_message(stdout, response)
+        if not keep_running:
+            return 0
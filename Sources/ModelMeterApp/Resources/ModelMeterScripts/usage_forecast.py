@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""Burn-rate and time-to-limit forecasts for the usage payload.
+
+Each poll folds the new session/weekly percent into a per-provider EWMA of the
+burn rate (percent per hour), kept in ~/.modelmeter/forecast-<provider>.json.
+The EWMA is time-weighted (alpha = 1 - exp(-dt/tau)), so irregular poll
+intervals are handled and an update is O(1). A window restarts when its
+percent drops or its reset time moves, since that means the provider rolled
+the window over.
+
+The payload gains `sessionBurnRate`, `weeklyBurnRate`,
+`projectedSessionExhaustAt` and `projectedWeeklyExhaustAt`. A projection is
+null when usage is not growing or the window resets first.
+
+The same state can be rebuilt from the usage history in one batch pass
+(vectorized with numpy when it is installed):
+
+    usage_forecast.py recompute --provider claude --since 7d
+"""
+import json
+import math
+import sys
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence
+
+from usage_state import read_json_file, state_path, write_json_atomic
+
+STATE_VERSION = 1
+SESSION_TAU_S = 15 * 60
+WEEKLY_TAU_S = 6 * 3600
+# A percent drop smaller than this is treated as provider rounding noise.
+DROP_TOLERANCE = 0.5
+RESET_MOVE_TOLERANCE_S = 300.0
+MIN_BURN_RATE = 1e-6
+
+WINDOWS = (
+    ("session", "sessionPercent", "sessionResetAt", SESSION_TAU_S),
+    ("weekly", "weeklyPercent", "weeklyResetAt", WEEKLY_TAU_S),
+)
+
+
+def forecast_path(provider: str) -> str:
+    return state_path(f"forecast-{provider}.json")
+
+
+def _epoch(raw) -> Optional[float]:
+    if not isinstance(raw, str) or not raw:
+        return None
+    try:
+        moment = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
+
+
+def restarted(window: dict, percent: float, reset_at: Optional[float]) -> bool:
+    if percent < window["percent"] - DROP_TOLERANCE:
+        return True
+    previous = window.get("resetAt")
+    return reset_at is not None and previous is not None and abs(reset_at - previous) > RESET_MOVE_TOLERANCE_S
+
+
+def advance(window: Optional[dict], t: float, percent: float, reset_at: Optional[float], tau: float) -> dict:
+    """Fold one sample into a window's EWMA state."""
+    if window is not None and t <= window["t"]:
+        return window
+    if window is None or restarted(window, percent, reset_at):
+        return {"t": t, "percent": percent, "resetAt": reset_at, "rate": None}
+    dt = t - window["t"]
+    instant = (percent - window["percent"]) / dt * 3600.0
+    rate = window["rate"]
+    if rate is None:
+        rate = instant
+    else:
+        rate += (1.0 - math.exp(-dt / tau)) * (instant - rate)
+    return {"t": t, "percent": percent, "resetAt": reset_at, "rate": rate}
+
+
+def projected_exhaust(window: Optional[dict]) -> Optional[float]:
+    if window is None:
+        return None
+    if window["percent"] >= 100.0:
+        return window["t"]
+    rate = window["rate"]
+    if rate is None or rate < MIN_BURN_RATE:
+        return None
+    at = window["t"] + (100.0 - window["percent"]) / rate * 3600.0
+    reset_at = window.get("resetAt")
+    if reset_at is not None and at >= reset_at:
+        return None
+    return at
+
+
+def load_state(provider: str) -> dict:
+    raw = read_json_file(forecast_path(provider))
+    if not isinstance(raw, dict) or raw.get("version") != STATE_VERSION:
+        return {}
+    return {name: raw.get(name) for name, _, _, _ in WINDOWS if isinstance(raw.get(name), dict)}
+
+
+def save_state(provider: str, state: dict) -> None:
+    write_json_atomic(forecast_path(provider), dict(state, version=STATE_VERSION))
+
+
+def apply(payload: dict, state: dict) -> dict:
+    annotated = dict(payload)
+    for name, _, _, _ in WINDOWS:
+        window = state.get(name)
+        rate = window.get("rate") if window else None
+        annotated[f"{name}BurnRate"] = None if rate is None else round(rate, 3)
+        exhaust = projected_exhaust(window)
+        annotated[f"projected{name.capitalize()}ExhaustAt"] = None if exhaust is None else _iso(exhaust)
+    return annotated
+
+
+def annotate(provider: str, payload: dict, now: Optional[float] = None) -> dict:
+    """Advance the provider's forecast with this payload and return it with forecast fields added.
+
+    Forecasting is advisory: if its state cannot be read or written, the
+    payload is returned unchanged.
+    """
+    t = time.time() if now is None else now
+    try:
+        state = load_state(provider)
+        for name, percent_key, reset_key, tau in WINDOWS:
+            percent = payload.get(percent_key)
+            if isinstance(percent, (int, float)):
+                state[name] = advance(state.get(name), t, float(percent), _epoch(payload.get(reset_key)), tau)
+        save_state(provider, state)
+    except Exception:
+        return payload
+    return apply(payload, state)
+
+
+def _batch_window(
+    times: Sequence[float], percents: Sequence[float], resets: Sequence[Optional[float]], tau: float
+) -> Optional[dict]:
+    try:
+        import numpy as np
+    except ImportError:
+        window = None
+        for t, percent, reset_at in zip(times, percents, resets):
+            window = advance(window, t, percent, reset_at, tau)
+        return window
+
+    if not len(times):
+        return None
+    t = np.asarray(times, dtype=float)
+    p = np.asarray(percents, dtype=float)
+    r = np.array([math.nan if x is None else x for x in resets], dtype=float)
+
+    # Drop samples that do not move time forward, as advance() would.
+    keep = np.ones(len(t), dtype=bool)
+    keep[1:] = t[1:] > np.maximum.accumulate(t)[:-1]
+    t, p, r = t[keep], p[keep], r[keep]
+
+    drops = p[1:] < p[:-1] - DROP_TOLERANCE
+    with np.errstate(invalid="ignore"):
+        # NaN (no reset time) never compares greater, matching restarted().
+        moved = np.abs(r[1:] - r[:-1]) > RESET_MOVE_TOLERANCE_S
+    restarts = np.flatnonzero(drops | moved) + 1
+    start = int(restarts[-1]) if len(restarts) else 0
+    t, p, r = t[start:], p[start:], r[start:]
+
+    last_reset = None if math.isnan(r[-1]) else float(r[-1])
+    window = {"t": float(t[-1]), "percent": float(p[-1]), "resetAt": last_reset, "rate": None}
+    if len(t) < 2:
+        return window
+    dt = np.diff(t)
+    instant = np.diff(p) / dt * 3600.0
+    # Closed form of the recursive EWMA: the first interval seeds it with weight 1.
+    alpha = 1.0 - np.exp(-dt / tau)
+    alpha[0] = 1.0
+    decay = np.exp(-(t[-1] - t[1:]) / tau)
+    window["rate"] = float(np.sum(alpha * decay * instant))
+    return window
+
+
+def recompute(records: List, provider: str) -> dict:
+    """Forecast state for `provider` rebuilt from usage_history records in time order."""
+    state = {}
+    times = [record.timestamp for record in records]
+    for name, _, _, tau in WINDOWS:
+        percents = [getattr(record, f"{name}_percent") for record in records]
+        resets = [getattr(record, f"{name}_reset_at") for record in records]
+        window = _batch_window(times, percents, resets, tau)
+        if window is not None:
+            state[name] = window
+    save_state(provider, state)
+    return state
+
+
+def main() -> int:
+    import argparse
+
+    import usage_history
+
+    parser = argparse.ArgumentParser(description="Rebuild burn-rate forecasts from the usage history.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    recompute_parser = sub.add_parser("recompute", help="Replace the forecast state from recorded history")
+    recompute_parser.add_argument("--provider", required=True)
+    recompute_parser.add_argument("--since", default="7d", help="Epoch, ISO time or span like 12h/7d (default 7d)")
+    args = parser.parse_args()
+
+    now = time.time()
+    try:
+        since = usage_history.parse_time(args.since, now)
+    except ValueError as exc:
+        parser.error(str(exc))
+    records = sorted(usage_history.query(since, now, args.provider), key=lambda record: record.timestamp)
+    state = recompute(records, args.provider)
+    sys.stdout.write(json.dumps(apply({}, state)) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
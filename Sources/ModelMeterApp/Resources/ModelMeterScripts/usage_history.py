@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""Fixed-size round-robin history of usage polls (~/.modelmeter/history.rrd).
+
+Every successful poll appends one struct-packed record (time, provider,
+session/weekly percent, session/weekly reset time) to the raw tier. Each
+coarser tier keeps one record per provider per step holding the highest
+percentages seen in that step and the latest reset times, consolidated in
+O(1) from small per-provider accumulators stored in the header. All tiers are
+rings, so the file never grows after it is created.
+
+Queries binary-search the ring on disk and read only the records in range:
+
+    usage_history.py query --since 24h --provider claude
+    usage_history.py query --since 2026-09-01 --until 2026-10-01 --tier 1h
+    usage_history.py info
+"""
+import json
+import math
+import os
+import re
+import struct
+import sys
+import time
+from datetime import datetime, timezone
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional, Tuple
+
+from usage_state import file_lock, state_path
+
+HISTORY_PATH = state_path("history.rrd")
+LOCK_NAME = "history"
+LOCK_TIMEOUT_S = 5.0
+
+# (label, step seconds, capacity). Step 0 is the raw tier.
+TIERS: Tuple[Tuple[str, int, int], ...] = (
+    ("raw", 0, 4096),
+    ("5m", 300, 4032),
+    ("1h", 3600, 8784),
+)
+MAX_PROVIDERS = 8
+
+_MAGIC = b"MMRH"
+_VERSION = 1
+_FILE_HEADER = struct.Struct("<4sHHH")
+_TIER_HEADER = struct.Struct("<IIII")
+_SLOT_NAME = struct.Struct("<8s")
+_ACCUMULATOR = struct.Struct("<dIffdd")
+_RECORD = struct.Struct("<d8sffdd")
+_TIME_ONLY = struct.Struct("<d")
+_RELATIVE = re.compile(r"^(\d+(?:\.\d+)?)([smhd])$")
+
+
+class HistoryRecord(NamedTuple):
+    timestamp: float
+    provider: str
+    session_percent: float
+    weekly_percent: float
+    session_reset_at: Optional[float]
+    weekly_reset_at: Optional[float]
+
+    def to_json(self) -> dict:
+        return {
+            "timestamp": _iso(self.timestamp),
+            "provider": self.provider,
+            "sessionPercent": round(self.session_percent, 2),
+            "weeklyPercent": round(self.weekly_percent, 2),
+            "sessionResetAt": _iso(self.session_reset_at),
+            "weeklyResetAt": _iso(self.weekly_reset_at),
+        }
+
+
+def _iso(epoch: Optional[float]) -> Optional[str]:
+    if epoch is None:
+        return None
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
+
+
+def _epoch(raw) -> Optional[float]:
+    if not isinstance(raw, str) or not raw:
+        return None
+    try:
+        moment = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _percent(raw) -> float:
+    return float(raw) if isinstance(raw, (int, float)) else 0.0
+
+
+def _pack_time(epoch: Optional[float]) -> float:
+    return math.nan if epoch is None else epoch
+
+
+def _unpack_time(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+def _pack_record(record: HistoryRecord) -> bytes:
+    return _RECORD.pack(
+        record.timestamp,
+        record.provider.encode("utf-8")[:8],
+        record.session_percent,
+        record.weekly_percent,
+        _pack_time(record.session_reset_at),
+        _pack_time(record.weekly_reset_at),
+    )
+
+
+def _unpack_record(data: bytes) -> HistoryRecord:
+    timestamp, provider, session, weekly, session_reset, weekly_reset = _RECORD.unpack(data)
+    return HistoryRecord(
+        timestamp,
+        provider.rstrip(b"\0").decode("utf-8", "replace"),
+        session,
+        weekly,
+        _unpack_time(session_reset),
+        _unpack_time(weekly_reset),
+    )
+
+
+def record_from_payload(provider: str, payload: dict, timestamp: Optional[float] = None) -> HistoryRecord:
+    return HistoryRecord(
+        time.time() if timestamp is None else timestamp,
+        provider,
+        _percent(payload.get("sessionPercent")),
+        _percent(payload.get("weeklyPercent")),
+        _epoch(payload.get("sessionResetAt")),
+        _epoch(payload.get("weeklyResetAt")),
+    )
+
+
+class _Layout:
+    """Byte offsets of every section; fixed for a given TIERS/MAX_PROVIDERS."""
+
+    def __init__(self) -> None:
+        self.tier_headers = _FILE_HEADER.size
+        self.slots = self.tier_headers + len(TIERS) * _TIER_HEADER.size
+        self.slot_size = _SLOT_NAME.size + (len(TIERS) - 1) * _ACCUMULATOR.size
+        offset = self.slots + MAX_PROVIDERS * self.slot_size
+        self.tier_data: List[int] = []
+        for _, _, capacity in TIERS:
+            self.tier_data.append(offset)
+            offset += capacity * _RECORD.size
+        self.size = offset
+
+    def tier_header(self, tier: int) -> int:
+        return self.tier_headers + tier * _TIER_HEADER.size
+
+    def slot(self, index: int) -> int:
+        return self.slots + index * self.slot_size
+
+    def accumulator(self, index: int, tier: int) -> int:
+        return self.slot(index) + _SLOT_NAME.size + (tier - 1) * _ACCUMULATOR.size
+
+    def record(self, tier: int, position: int) -> int:
+        return self.tier_data[tier] + position * _RECORD.size
+
+
+LAYOUT = _Layout()
+
+
+def _read_at(handle: BinaryIO, offset: int, size: int) -> bytes:
+    handle.seek(offset)
+    data = handle.read(size)
+    if len(data) != size:
+        raise ValueError("Truncated history file")
+    return data
+
+
+def _write_at(handle: BinaryIO, offset: int, data: bytes) -> None:
+    handle.seek(offset)
+    handle.write(data)
+
+
+def _create(path: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    header = bytearray(LAYOUT.tier_data[0])
+    _FILE_HEADER.pack_into(header, 0, _MAGIC, _VERSION, len(TIERS), MAX_PROVIDERS)
+    for tier, (_, step, capacity) in enumerate(TIERS):
+        _TIER_HEADER.pack_into(header, LAYOUT.tier_header(tier), step, capacity, 0, 0)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as handle:
+        handle.write(header)
+        handle.truncate(LAYOUT.size)
+    os.chmod(tmp_path, 0o600)
+    os.replace(tmp_path, path)
+
+
+def _valid(handle: BinaryIO) -> bool:
+    try:
+        magic, version, tiers, slots = _FILE_HEADER.unpack(_read_at(handle, 0, _FILE_HEADER.size))
+        if (magic, version, tiers, slots) != (_MAGIC, _VERSION, len(TIERS), MAX_PROVIDERS):
+            return False
+        for tier, (_, step, capacity) in enumerate(TIERS):
+            stored_step, stored_capacity, _, _ = _tier_state(handle, tier)
+            if (stored_step, stored_capacity) != (step, capacity):
+                return False
+        handle.seek(0, os.SEEK_END)
+        return handle.tell() == LAYOUT.size
+    except ValueError:
+        return False
+
+
+def _tier_state(handle: BinaryIO, tier: int) -> Tuple[int, int, int, int]:
+    return _TIER_HEADER.unpack(_read_at(handle, LAYOUT.tier_header(tier), _TIER_HEADER.size))
+
+
+def _append(handle: BinaryIO, tier: int, record: HistoryRecord) -> None:
+    step, capacity, head, count = _tier_state(handle, tier)
+    _write_at(handle, LAYOUT.record(tier, head), _pack_record(record))
+    _write_at(handle, LAYOUT.tier_header(tier), _TIER_HEADER.pack(step, capacity, (head + 1) % capacity, min(count + 1, capacity)))
+
+
+def _slot_for(handle: BinaryIO, provider: str) -> int:
+    name = provider.encode("utf-8")[:8]
+    free = -1
+    for index in range(MAX_PROVIDERS):
+        (stored,) = _SLOT_NAME.unpack(_read_at(handle, LAYOUT.slot(index), _SLOT_NAME.size))
+        stored = stored.rstrip(b"\0")
+        if stored == name:
+            return index
+        if not stored and free < 0:
+            free = index
+    if free < 0:
+        # Every slot is taken; recycle the last one rather than refusing to record.
+        free = MAX_PROVIDERS - 1
+    _write_at(handle, LAYOUT.slot(free), _SLOT_NAME.pack(name) + bytes(LAYOUT.slot_size - _SLOT_NAME.size))
+    return free
+
+
+def _consolidate(handle: BinaryIO, slot: int, tier: int, record: HistoryRecord) -> None:
+    step = TIERS[tier][1]
+    bucket = math.floor(record.timestamp / step) * step
+    offset = LAYOUT.accumulator(slot, tier)
+    start, count, session, weekly, session_reset, weekly_reset = _ACCUMULATOR.unpack(_read_at(handle, offset, _ACCUMULATOR.size))
+    if count and bucket > start:
+        _append(handle, tier, HistoryRecord(
+            start, record.provider, session, weekly, _unpack_time(session_reset), _unpack_time(weekly_reset),
+        ))
+        count = 0
+    if not count:
+        start, session, weekly = bucket, record.session_percent, record.weekly_percent
+    else:
+        session = max(session, record.session_percent)
+        weekly = max(weekly, record.weekly_percent)
+    _write_at(handle, offset, _ACCUMULATOR.pack(
+        start, count + 1, session, weekly, _pack_time(record.session_reset_at), _pack_time(record.weekly_reset_at),
+    ))
+
+
+def _open_for_append(path: str) -> BinaryIO:
+    try:
+        handle = open(path, "r+b")
+    except FileNotFoundError:
+        _create(path)
+        return open(path, "r+b")
+    if _valid(handle):
+        return handle
+    # Unknown layout or a torn file: start a fresh history rather than misread it.
+    handle.close()
+    _create(path)
+    return open(path, "r+b")
+
+
+def append(record: HistoryRecord, path: str = HISTORY_PATH) -> None:
+    with file_lock(LOCK_NAME, LOCK_TIMEOUT_S) as locked:
+        if not locked:
+            return
+        with _open_for_append(path) as handle:
+            _append(handle, 0, record)
+            slot = _slot_for(handle, record.provider)
+            for tier in range(1, len(TIERS)):
+                _consolidate(handle, slot, tier, record)
+
+
+def record_poll(provider: str, payload: dict, path: str = HISTORY_PATH) -> None:
+    """Append a successful poll; history is best effort and never fails the poll."""
+    try:
+        append(record_from_payload(provider, payload), path)
+    except Exception:
+        pass
+
+
+class _Ring:
+    def __init__(self, handle: BinaryIO, tier: int):
+        self.handle = handle
+        self.tier = tier
+        _, self.capacity, head, self.count = _tier_state(handle, tier)
+        self.oldest = (head - self.count) % self.capacity
+
+    def _offset(self, index: int) -> int:
+        return LAYOUT.record(self.tier, (self.oldest + index) % self.capacity)
+
+    def timestamp(self, index: int) -> float:
+        return _TIME_ONLY.unpack(_read_at(self.handle, self._offset(index), _TIME_ONLY.size))[0]
+
+    def record(self, index: int) -> HistoryRecord:
+        return _unpack_record(_read_at(self.handle, self._offset(index), _RECORD.size))
+
+    def first_at_or_after(self, moment: float) -> int:
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.timestamp(middle) < moment:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+
+def tier_index(label: str) -> int:
+    for index, (name, _, _) in enumerate(TIERS):
+        if name == label:
+            return index
+    raise ValueError(f"Unknown history tier: {label}")
+
+
+def choose_tier(handle: BinaryIO, since: float) -> int:
+    """The finest tier reaching back to `since`.
+
+    When no tier does, the finest one that is within a coarsest step of the
+    oldest data, since consolidated records are stamped at their step start.
+    """
+    oldest = []
+    for index in range(len(TIERS)):
+        ring = _Ring(handle, index)
+        oldest.append(ring.timestamp(0) if ring.count else math.inf)
+        if oldest[-1] <= since:
+            return index
+    earliest = min(oldest)
+    for index, start in enumerate(oldest):
+        if start - earliest <= TIERS[-1][1]:
+            return index
+    return 0
+
+
+def query(
+    since: float,
+    until: Optional[float] = None,
+    provider: Optional[str] = None,
+    tier: Optional[str] = None,
+    path: str = HISTORY_PATH,
+) -> Iterator[HistoryRecord]:
+    """Records with since <= timestamp <= until, from `tier` or the finest tier reaching back to `since`."""
+    until = time.time() if until is None else until
+    try:
+        handle = open(path, "rb")
+    except OSError:
+        return
+    with handle:
+        if not _valid(handle):
+            return
+        if tier is not None:
+            chosen = tier_index(tier)
+        else:
+            chosen = choose_tier(handle, since)
+        ring = _Ring(handle, chosen)
+        # Consolidated records of different providers can be a step out of order.
+        slack = TIERS[chosen][1]
+        for index in range(ring.first_at_or_after(since - slack), ring.count):
+            record = ring.record(index)
+            if record.timestamp > until + slack:
+                break
+            if since <= record.timestamp <= until and (provider is None or record.provider == provider):
+                yield record
+
+
+def info(path: str = HISTORY_PATH) -> dict:
+    tiers = []
+    try:
+        with open(path, "rb") as handle:
+            if _valid(handle):
+                for index, (label, step, capacity) in enumerate(TIERS):
+                    ring = _Ring(handle, index)
+                    tiers.append({
+                        "tier": label,
+                        "stepSeconds": step,
+                        "capacity": capacity,
+                        "records": ring.count,
+                        "oldest": _iso(ring.timestamp(0)) if ring.count else None,
+                        "newest": _iso(ring.timestamp(ring.count - 1)) if ring.count else None,
+                    })
+    except OSError:
+        pass
+    return {"path": path, "bytes": LAYOUT.size, "tiers": tiers}
+
+
+def parse_time(raw: str, now: float) -> float:
+    """An epoch, an ISO 8601 time, or a span before now such as "90m" or "7d"."""
+    value = raw.strip()
+    match = _RELATIVE.match(value)
+    if match:
+        scale = {"s": 1, "m": 60, "h": 3600, "d": 86400}[match.group(2)]
+        return now - float(match.group(1)) * scale
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    moment = _epoch(value)
+    if moment is None:
+        raise ValueError(f"Unrecognised time: {raw}")
+    return moment
+
+
+def main() -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Query the ModelMeter usage history.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    query_parser = sub.add_parser("query", help="Print records in a time range as JSON lines")
+    query_parser.add_argument("--since", default="24h", help="Start: epoch, ISO time or span like 90m/7d (default 24h)")
+    query_parser.add_argument("--until", help="End: epoch, ISO time or span (default now)")
+    query_parser.add_argument("--provider", help="Only this provider")
+    query_parser.add_argument("--tier", choices=[label for label, _, _ in TIERS], help="Force a tier instead of the finest that covers --since")
+    query_parser.add_argument("--path", default=HISTORY_PATH)
+    info_parser = sub.add_parser("info", help="Describe the tiers in the history file")
+    info_parser.add_argument("--path", default=HISTORY_PATH)
+    args = parser.parse_args()
+
+    if args.command == "info":
+        print(json.dumps(info(args.path)))
+        return 0
+
+    now = time.time()
+    try:
+        since = parse_time(args.since, now)
+        until = parse_time(args.until, now) if args.until else now
+    except ValueError as exc:
+        parser.error(str(exc))
+    for record in query(since, until, args.provider, args.tier, args.path):
+        sys.stdout.write(json.dumps(record.to_json()) + "\n")
+    sys.stdout.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
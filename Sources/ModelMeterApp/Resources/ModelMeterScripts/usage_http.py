@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""Keep-alive HTTP(S) transport shared by the provider scripts.
+
+Connections are pooled per (scheme, host, port) and reused across the token
+and usage endpoints for the lifetime of the process, which matters for
+`--serve` mode and for refresh-then-retry sequences. TLS sessions are kept
+per host so a reconnect can resume instead of doing a full handshake.
+
+Proxies come from urllib's getproxies()/proxy_bypass(), so the environment
+(http_proxy, https_proxy, no_proxy) and, on macOS, the system proxy settings
+apply as they did under urllib; credentials in the proxy URL are sent as
+Proxy-Authorization.
+
+When usage_trace is recording, DNS, connect, TLS, time to first byte and the
+body read are each recorded as their own span.
+"""
+import gzip
+import http.client
+import socket
+import ssl
+import threading
+import time
+import zlib
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+import usage_trace
+from usage_trace import span
+
+IDLE_TIMEOUT_S = 60.0
+MAX_IDLE_PER_HOST = 4
+STALE_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+    ConnectionAbortedError,
+)
+# Only these are resent after a dropped keep-alive connection; a token refresh POST must not be.
+IDEMPOTENT_METHODS = ("GET", "HEAD")
+
+HostKey = Tuple[str, str, int]
+
+
+class Proxy(NamedTuple):
+    host: str
+    port: int
+    headers: Dict[str, str]
+
+
+def _create_connection(address: Tuple[str, int], timeout: float, source_address=None) -> socket.socket:
+    """socket.create_connection with name resolution and connecting timed separately."""
+    if not usage_trace.enabled():
+        return socket.create_connection(address, timeout, source_address)
+    host, port = address
+    with span("http.dns", host=host):
+        infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+    with span("http.connect", host=host):
+        error: Optional[OSError] = None
+        for _, _, _, _, sockaddr in infos:
+            try:
+                return socket.create_connection(sockaddr[:2], timeout, source_address)
+            except OSError as exc:
+                error = exc
+        raise error or OSError(f"getaddrinfo returned no addresses for {host}")
+
+
+class _TimedHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, host: str, port: int, timeout: float):
+        super().__init__(host, port, timeout=timeout)
+        self._create_connection = _create_connection
+
+
+class _ResumingHTTPSConnection(http.client.HTTPSConnection):
+    """HTTPS connection that offers the last TLS session seen for its host."""
+
+    def __init__(self, host: str, port: int, timeout: float, context: ssl.SSLContext, pool: "ConnectionPool"):
+        super().__init__(host, port, timeout=timeout, context=context)
+        self._create_connection = _create_connection
+        self._pool = pool
+
+    def connect(self) -> None:
+        http.client.HTTPConnection.connect(self)
+        server_hostname = self._tunnel_host or self.host
+        session = self._pool.tls_session(server_hostname)
+        with span("http.tls", host=server_hostname, resumed=session is not None):
+            self.sock = self._context.wrap_socket(self.sock, server_hostname=server_hostname, session=session)
+        self._pool.store_tls_session(server_hostname, self.sock.session)
+
+
+class ConnectionPool:
+    def __init__(self, idle_timeout: float = IDLE_TIMEOUT_S, max_idle_per_host: int = MAX_IDLE_PER_HOST):
+        self.idle_timeout = idle_timeout
+        self.max_idle_per_host = max_idle_per_host
+        self._idle: Dict[HostKey, List[Tuple[http.client.HTTPConnection, float]]] = {}
+        self._tls_sessions: Dict[str, ssl.SSLSession] = {}
+        self._lock = threading.Lock()
+        self._context: Optional[ssl.SSLContext] = None
+        self._proxies: Dict[HostKey, Optional[Proxy]] = {}
+
+    def tls_session(self, host: str) -> Optional[ssl.SSLSession]:
+        with self._lock:
+            return self._tls_sessions.get(host)
+
+    def store_tls_session(self, host: str, session: Optional[ssl.SSLSession]) -> None:
+        if session is None:
+            return
+        with self._lock:
+            self._tls_sessions[host] = session
+
+    def _ssl_context(self) -> ssl.SSLContext:
+        if self._context is None:
+            self._context = ssl.create_default_context()
+        return self._context
+
+    def proxy(self, key: HostKey) -> Optional[Proxy]:
+        with self._lock:
+            if key in self._proxies:
+                return self._proxies[key]
+        proxy = proxy_for(key[0], key[1])
+        with self._lock:
+            self._proxies[key] = proxy
+        return proxy
+
+    def _new_connection(self, key: HostKey, timeout: float) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        proxy = self.proxy(key)
+        if scheme == "https":
+            if proxy:
+                conn = _ResumingHTTPSConnection(proxy.host, proxy.port, timeout, self._ssl_context(), self)
+                conn.set_tunnel(host, port, headers=proxy.headers or None)
+                return conn
+            return _ResumingHTTPSConnection(host, port, timeout, self._ssl_context(), self)
+        if proxy:
+            return _TimedHTTPConnection(proxy.host, proxy.port, timeout)
+        return _TimedHTTPConnection(host, port, timeout)
+
+    def _checkout(self, key: HostKey) -> Optional[http.client.HTTPConnection]:
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                conn, since = idle.pop()
+                if now - since <= self.idle_timeout:
+                    return conn
+                conn.close()
+        return None
+
+    def _checkin(self, key: HostKey, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) >= self.max_idle_per_host:
+                conn.close()
+                return
+            idle.append((conn, time.monotonic()))
+
+    def close(self) -> None:
+        with self._lock:
+            for idle in self._idle.values():
+                for conn, _ in idle:
+                    conn.close()
+            self._idle.clear()
+
+    def request(
+        self,
+        url: str,
+        method: str,
+        headers: Dict[str, str],
+        body: Optional[bytes],
+        timeout: float,
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        """Send one request and return (status, lower-cased headers, decoded body bytes).
+
+        Network failures raise; HTTP error statuses are returned like any other.
+        """
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme: {url}")
+        port = parts.port or (443 if scheme == "https" else 80)
+        key: HostKey = (scheme, parts.hostname or "", port)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+
+        send_headers = {"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"}
+        send_headers.update(headers)
+        if scheme == "http":
+            proxy = self.proxy(key)
+            if proxy:
+                # Plain HTTP through a proxy: absolute URI to the proxy, no tunnel.
+                target = url
+                send_headers.update(proxy.headers)
+
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        # An idle connection may have been dropped by the server; only requests that can be resent use one.
+        conn = self._checkout(key) if idempotent else None
+        reused = conn is not None
+        while True:
+            if conn is None:
+                conn = self._new_connection(key, timeout)
+            elif conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            try:
+                if conn.sock is None:
+                    # Connect outside the ttfb span so DNS, connect and TLS are not counted twice.
+                    conn.connect()
+                with span("http.ttfb", url=url, reused=reused):
+                    conn.request(method, target, body=body, headers=send_headers)
+                    resp = conn.getresponse()
+                with span("http.body", status=resp.status):
+                    raw = resp.read()
+            except STALE_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+                # The server dropped an idle keep-alive connection; retry once on a fresh one.
+                conn, reused = None, False
+                continue
+            except BaseException:
+                conn.close()
+                raise
+            break
+
+        resp_headers = {name.lower(): value for name, value in resp.getheaders()}
+        if isinstance(conn.sock, ssl.SSLSocket):
+            # TLS 1.3 tickets arrive after the handshake, so refresh the stored session here.
+            self.store_tls_session(conn._tunnel_host or conn.host, conn.sock.session)
+        if resp.will_close:
+            conn.close()
+        else:
+            self._checkin(key, conn)
+        with span("http.decompress"):
+            decoded = decode_body(raw, resp_headers.get("content-encoding", ""))
+        return resp.status, resp_headers, decoded
+
+
+def decode_body(raw: bytes, encoding: str) -> bytes:
+    encoding = encoding.strip().lower()
+    if not raw or not encoding or encoding == "identity":
+        return raw
+    if encoding == "gzip":
+        return gzip.decompress(raw)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(raw)
+        except zlib.error:
+            return zlib.decompress(raw, -zlib.MAX_WBITS)
+    return raw
+
+
+def proxy_for(scheme: str, host: str) -> Optional[Proxy]:
+    """The proxy urllib would use for `scheme://host`, or None for a direct connection."""
+    from urllib.request import getproxies, proxy_bypass
+
+    raw = getproxies().get(scheme) or ""
+    if not raw.strip() or proxy_bypass(host):
+        return None
+    parts = urlsplit(raw if "://" in raw else "http://" + raw)
+    if not parts.hostname:
+        return None
+    headers: Dict[str, str] = {}
+    if parts.username is not None:
+        import base64
+        from urllib.parse import unquote
+
+        credentials = f"{unquote(parts.username)}:{unquote(parts.password or '')}".encode("utf-8")
+        headers["Proxy-Authorization"] = "Basic " + base64.b64encode(credentials).decode("ascii")
+    return Proxy(parts.hostname, parts.port or 80, headers)
+
+
+_POOL = ConnectionPool()
+
+
+def request(
+    url: str,
+    method: str,
+    headers: Dict[str, str],
+    body: Optional[bytes],
+    timeout: float,
+) -> Tuple[int, Dict[str, str], bytes]:
+    return _POOL.request(url, method, headers, body, timeout)
+
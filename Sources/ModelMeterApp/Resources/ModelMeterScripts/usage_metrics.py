@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""Prometheus/OpenMetrics export of usage gauges and request health.
+
+The provider scripts count every usage and token request by provider,
+endpoint and HTTP status, time it into a fixed-bucket latency histogram, and
+keep the latest session/weekly percent and reset times per provider. Counts
+are kept in memory and merged into ~/.modelmeter/metrics.json when the
+process exits (and after every refresh in `--serve` mode), so one-shot runs
+accumulate like a long-running process would. Histograms are fixed-length
+arrays, so memory and the state file stay the same size however long this
+runs.
+
+Export either as a node-exporter textfile or over HTTP:
+
+    usage_metrics.py textfile /var/lib/node_exporter/textfile/modelmeter.prom
+    usage_metrics.py serve --port 9464
+    usage_metrics.py render --openmetrics
+
+Setting MODELMETER_METRICS_TEXTFILE makes the provider scripts rewrite that
+textfile themselves whenever they merge new counts.
+"""
+import atexit
+import math
+import os
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from usage_state import file_lock, read_json_file, state_path, write_bytes_atomic, write_json_atomic
+
+METRICS_PATH = state_path("metrics.json")
+LOCK_NAME = "metrics"
+LOCK_TIMEOUT_S = 2.0
+STATE_VERSION = 1
+# Upper bounds in seconds; one more slot counts everything slower (+Inf).
+BUCKETS: Tuple[float, ...] = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+USAGE_GAUGES = (
+    ("sessionPercent", "modelmeter_session_percent", "Session (5 hour) window usage in percent"),
+    ("weeklyPercent", "modelmeter_weekly_percent", "Weekly window usage in percent"),
+    ("sessionResetAt", "modelmeter_session_reset_timestamp_seconds", "When the session window resets"),
+    ("weeklyResetAt", "modelmeter_weekly_reset_timestamp_seconds", "When the weekly window resets"),
+    ("updatedAt", "modelmeter_last_update_timestamp_seconds", "When usage was last fetched from the provider"),
+)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+RequestKey = Tuple[str, str, str]
+LatencyKey = Tuple[str, str]
+
+
+class Histogram:
+    __slots__ = ("counts", "total")
+
+    def __init__(self, counts: Optional[List[int]] = None, total: float = 0.0):
+        self.counts = array("Q", bytes(8 * (len(BUCKETS) + 1)))
+        if counts is not None and len(counts) == len(self.counts):
+            for index, count in enumerate(counts):
+                self.counts[index] = max(0, int(count))
+        self.total = float(total)
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+
+    def merge(self, other: "Histogram") -> None:
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.total += other.total
+
+    def to_json(self) -> dict:
+        return {"counts": list(self.counts), "sum": self.total}
+
+    @classmethod
+    def from_json(cls, raw) -> "Histogram":
+        if not isinstance(raw, dict) or not isinstance(raw.get("counts"), list):
+            return cls()
+        total = raw.get("sum")
+        return cls(raw["counts"], total if isinstance(total, (int, float)) else 0.0)
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.requests: Dict[RequestKey, int] = {}
+        self.latency: Dict[LatencyKey, Histogram] = {}
+        self.usage: Dict[str, Dict[str, Optional[float]]] = {}
+
+    def empty(self) -> bool:
+        return not (self.requests or self.latency or self.usage)
+
+    def merge(self, other: "Metrics") -> None:
+        for key, count in other.requests.items():
+            self.requests[key] = self.requests.get(key, 0) + count
+        for key, histogram in other.latency.items():
+            self.latency.setdefault(key, Histogram()).merge(histogram)
+        self.usage.update(other.usage)
+
+    def to_json(self) -> dict:
+        return {
+            "version": STATE_VERSION,
+            "requests": [[*key, count] for key, count in sorted(self.requests.items())],
+            "latency": [[*key, histogram.to_json()] for key, histogram in sorted(self.latency.items())],
+            "usage": self.usage,
+        }
+
+    @classmethod
+    def from_json(cls, raw) -> "Metrics":
+        metrics = cls()
+        if not isinstance(raw, dict) or raw.get("version") != STATE_VERSION:
+            return metrics
+        for row in raw.get("requests") or []:
+            if isinstance(row, list) and len(row) == 4 and isinstance(row[3], int):
+                metrics.requests[(str(row[0]), str(row[1]), str(row[2]))] = row[3]
+        for row in raw.get("latency") or []:
+            if isinstance(row, list) and len(row) == 3:
+                metrics.latency[(str(row[0]), str(row[1]))] = Histogram.from_json(row[2])
+        usage = raw.get("usage")
+        if isinstance(usage, dict):
+            metrics.usage = {str(k): v for k, v in usage.items() if isinstance(v, dict)}
+        return metrics
+
+
+_lock = threading.Lock()
+_pending = Metrics()
+_flush_registered = False
+
+
+def _epoch(raw) -> Optional[float]:
+    if not isinstance(raw, str) or not raw:
+        return None
+    try:
+        moment = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _number(raw) -> Optional[float]:
+    if isinstance(raw, bool) or not isinstance(raw, (int, float)) or math.isnan(raw):
+        return None
+    return float(raw)
+
+
+def _flush_at_exit() -> None:
+    global _flush_registered
+    if not _flush_registered:
+        _flush_registered = True
+        atexit.register(flush)
+
+
+def record_request(provider: str, endpoint: str, status: int, seconds: float) -> None:
+    """Count one HTTP request; `status` 0 means it failed before a response arrived."""
+    key = (provider, endpoint, str(status) if status else "error")
+    with _lock:
+        _pending.requests[key] = _pending.requests.get(key, 0) + 1
+        _pending.latency.setdefault((provider, endpoint), Histogram()).observe(max(0.0, seconds))
+        _flush_at_exit()
+
+
+def observe_usage(provider: str, payload: dict) -> None:
+    gauges = {
+        "sessionPercent": _number(payload.get("sessionPercent")),
+        "weeklyPercent": _number(payload.get("weeklyPercent")),
+        "sessionResetAt": _epoch(payload.get("sessionResetAt")),
+        "weeklyResetAt": _epoch(payload.get("weeklyResetAt")),
+        "updatedAt": _epoch(payload.get("updatedAt")) or time.time(),
+    }
+    with _lock:
+        _pending.usage[provider] = gauges
+        _flush_at_exit()
+
+
+def load(path: str = METRICS_PATH) -> Metrics:
+    return Metrics.from_json(read_json_file(path))
+
+
+def flush(path: str = METRICS_PATH) -> None:
+    """Merge pending counts into the state file; metrics are best effort and never fail a poll."""
+    global _pending
+    with _lock:
+        pending, _pending = _pending, Metrics()
+    if pending.empty():
+        return
+    try:
+        with file_lock(LOCK_NAME, LOCK_TIMEOUT_S) as acquired:
+            if not acquired:
+                raise OSError("metrics lock busy")
+            merged = load(path)
+            merged.merge(pending)
+            write_json_atomic(path, merged.to_json())
+    except Exception:
+        # Keep the counts for the next flush rather than losing them.
+        with _lock:
+            pending.merge(_pending)
+            _pending = pending
+        return
+    textfile = os.environ.get("MODELMETER_METRICS_TEXTFILE", "").strip()
+    if textfile:
+        try:
+            write_textfile(textfile, merged)
+        except Exception:
+            pass
+
+
+def _labels(**labels: str) -> str:
+    inner = ",".join(
+        '{}="{}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels.items()
+    )
+    return "{" + inner + "}"
+
+
+def _value(number: float) -> str:
+    if math.isinf(number):
+        return "+Inf" if number > 0 else "-Inf"
+    return repr(float(number))
+
+
+def render(metrics: Metrics, openmetrics: bool = False) -> str:
+    """Prometheus text format 0.0.4, or OpenMetrics 1.0 when `openmetrics` is set."""
+    lines: List[str] = []
+
+    def family(name: str, kind: str, help_text: str) -> None:
+        # OpenMetrics names a counter family without its _total suffix.
+        if openmetrics and kind == "counter" and name.endswith("_total"):
+            name = name[: -len("_total")]
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    for key, name, help_text in USAGE_GAUGES:
+        samples = [
+            (provider, gauges[key]) for provider, gauges in sorted(metrics.usage.items())
+            if isinstance(gauges.get(key), (int, float))
+        ]
+        if not samples:
+            continue
+        family(name, "gauge", help_text)
+        for provider, value in samples:
+            lines.append(f"{name}{_labels(provider=provider)} {_value(value)}")
+
+    if metrics.requests:
+        family("modelmeter_requests_total", "counter", "Usage and token requests by HTTP status (error: no response)")
+        for (provider, endpoint, status), count in sorted(metrics.requests.items()):
+            lines.append(
+                f"modelmeter_requests_total{_labels(provider=provider, endpoint=endpoint, status=status)} {count}"
+            )
+
+    if metrics.latency:
+        name = "modelmeter_request_duration_seconds"
+        family(name, "histogram", "Usage and token request latency including retries of stale connections")
+        for (provider, endpoint), histogram in sorted(metrics.latency.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS + (math.inf,), histogram.counts):
+                cumulative += count
+                labels = _labels(provider=provider, endpoint=endpoint, le=_value(bound))
+                lines.append(f"{name}_bucket{labels} {cumulative}")
+            labels = _labels(provider=provider, endpoint=endpoint)
+            lines.append(f"{name}_sum{labels} {_value(histogram.total)}")
+            lines.append(f"{name}_count{labels} {cumulative}")
+
+    if openmetrics:
+        lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path: str, metrics: Metrics) -> None:
+    # node-exporter reads *.prom files as they are; the rename keeps it from seeing half a file.
+    write_bytes_atomic(path, render(metrics).encode("utf-8"), mode=0o644)
+
+
+def serve(host: str, port: int, path: str = METRICS_PATH) -> int:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+            body = render(load(path), openmetrics).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def main() -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export ModelMeter usage and request metrics.")
+    parser.add_argument("--state", default=METRICS_PATH, help="Metrics state file written by the provider scripts")
+    sub = parser.add_subparsers(dest="command", required=True)
+    render_parser = sub.add_parser("render", help="Print the metrics to stdout")
+    render_parser.add_argument("--openmetrics", action="store_true", help="OpenMetrics 1.0 instead of Prometheus text")
+    textfile_parser = sub.add_parser("textfile", help="Write a node-exporter textfile collector file")
+    textfile_parser.add_argument("path")
+    serve_parser = sub.add_parser("serve", help="Serve /metrics over HTTP")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=9464)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        return serve(args.host, args.port, args.state)
+    if args.command == "textfile":
+        try:
+            write_textfile(args.path, load(args.state))
+        except OSError as exc:
+            print(f"Failed to write {args.path}: {exc}", file=sys.stderr)
+            return 1
+        return 0
+    sys.stdout.write(render(load(args.state), args.openmetrics))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
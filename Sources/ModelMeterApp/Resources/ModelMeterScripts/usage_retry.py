@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Retry timing for the provider scripts: deadlines, rate-limit hints and backoff.
+
+A poll gets one overall `Deadline` that every request timeout and retry sleep
+is carved from. When a provider answers 429 the delay comes from
+`Retry-After` or the provider's rate-limit reset headers, with jitter, and
+the "rate limited until" time is recorded next to the usage cache so
+overlapping polls answer from the last good snapshot instead of stacking
+their own backoff on top.
+"""
+import os
+import re
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from usage_cache import cache_path, env_seconds
+from usage_state import read_json_file, write_json_atomic
+
+DEFAULT_DEADLINE_S = 20.0
+MAX_RATE_LIMIT_RETRIES = 3
+BACKOFF_BASE_S = 1.0
+BACKOFF_CAP_S = 60.0
+# Leave room for the request itself after sleeping.
+MIN_REQUEST_BUDGET_S = 1.0
+RESET_HEADERS = (
+    "anthropic-ratelimit-requests-reset",
+    "anthropic-ratelimit-tokens-reset",
+    "x-ratelimit-reset-requests",
+    "x-ratelimit-reset-tokens",
+    "x-ratelimit-reset",
+    "ratelimit-reset",
+)
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float, message: str = "Rate limited"):
+        super().__init__(message)
+        self.retry_after = max(0.0, retry_after)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    def __init__(self, seconds: Optional[float]):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds if seconds and seconds > 0 else None
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def cap(self, seconds: float) -> float:
+        """`seconds`, shortened to what is left of the budget (for lock waits and the like)."""
+        remaining = self.remaining()
+        return seconds if remaining is None else min(seconds, remaining)
+
+    def timeout(self, default: float) -> float:
+        """Timeout for the next request; raises DeadlineExceeded instead of sending one that cannot finish."""
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        if remaining < MIN_REQUEST_BUDGET_S:
+            raise DeadlineExceeded(f"Deadline of {self.seconds:g}s spent before the request could be sent")
+        return min(default, remaining)
+
+    def allows_sleep(self, seconds: float) -> bool:
+        remaining = self.remaining()
+        return remaining is None or seconds + MIN_REQUEST_BUDGET_S <= remaining
+
+
+def default_deadline() -> float:
+    return env_seconds("MODELMETER_DEADLINE", DEFAULT_DEADLINE_S)
+
+
+def parse_duration(raw: str) -> Optional[float]:
+    """Parse seconds, an HTTP date, an RFC 3339 time or a Go-style "1m30s" duration."""
+    value = raw.strip()
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+        # Some providers send an absolute epoch rather than a delta.
+        return seconds - time.time() if seconds > 1e9 else seconds
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if parts and "".join(n + u for n, u in parts) == value:
+        scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+        return sum(float(n) * scale[u] for n, u in parts)
+    try:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        from email.utils import parsedate_to_datetime
+        try:
+            moment = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp() - time.time()
+
+
+def server_delay(headers: Dict[str, str]) -> Optional[float]:
+    for name in ("retry-after",) + RESET_HEADERS:
+        raw = headers.get(name)
+        if raw is None:
+            continue
+        seconds = parse_duration(str(raw))
+        if seconds is not None:
+            return max(0.0, seconds)
+    return None
+
+
+def retry_delay(headers: Dict[str, str], attempt: int) -> float:
+    """Seconds to wait before retry number `attempt` (0-based), jittered."""
+    import random
+
+    hinted = server_delay(headers)
+    if hinted is not None:
+        return min(BACKOFF_CAP_S * 10, hinted + random.uniform(0.0, min(1.0, 0.1 * hinted + 0.1)))
+    ceiling = min(BACKOFF_CAP_S, BACKOFF_BASE_S * (2 ** attempt))
+    return ceiling / 2 + random.uniform(0.0, ceiling / 2)
+
+
+def _marker_path(provider: str, account: str) -> str:
+    return cache_path(provider, account) + ".ratelimit"
+
+
+def note_rate_limit(provider: str, account: str, retry_after: float) -> None:
+    try:
+        write_json_atomic(_marker_path(provider, account), {"until": time.time() + max(1.0, retry_after)})
+    except OSError:
+        pass
+
+
+def clear_rate_limit(provider: str, account: str) -> None:
+    try:
+        os.unlink(_marker_path(provider, account))
+    except OSError:
+        pass
+
+
+def rate_limited_for(provider: str, account: str) -> float:
+    """Seconds left on a previously recorded rate limit, or 0."""
+    marker = read_json_file(_marker_path(provider, account))
+    if not isinstance(marker, dict) or not isinstance(marker.get("until"), (int, float)):
+        return 0.0
+    return max(0.0, float(marker["until"]) - time.time())
+
+
+def mark_rate_limited(payload: dict, retry_after: float) -> dict:
+    marked = dict(payload)
+    marked["rateLimited"] = True
+    marked["retryAfter"] = round(retry_after, 1)
+    return marked
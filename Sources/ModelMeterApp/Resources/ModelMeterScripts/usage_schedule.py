@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Adaptive poll interval: when the next poll is worth making.
+
+`next_poll_after(payload)` turns the burn rates from usage_forecast, the
+distance to the app's alert thresholds and the window reset times into a
+delay in seconds:
+
+* flat usage backs off to MODELMETER_POLL_MAX (default 10 minutes);
+* climbing usage is polled at least four times before it can reach the next
+  threshold (60/80/90/100%), and every minute at 90% and above;
+* a window that just restarted (no burn rate yet) is polled every minute
+  until a rate is known;
+* a poll is always scheduled just after the next reset, so a new window is
+  picked up promptly;
+* a rate-limited payload is not polled before its `retryAfter`;
+* a stale payload (endpoint unreachable) is polled again as soon as the
+  circuit breaker lets a probe through.
+
+Provider scripts add the result to their output as `nextPollAfter`; their
+`--watch` mode schedules itself from it.
+"""
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional, Tuple, Type
+
+from usage_cache import env_seconds
+
+DEFAULT_MIN_S = 15.0
+DEFAULT_MAX_S = 600.0
+THRESHOLDS = (60.0, 80.0, 90.0, 100.0)
+NEAR_LIMIT_PERCENT = 90.0
+NEAR_LIMIT_S = 60.0
+LEARNING_S = 60.0
+# Polls before usage can reach the next threshold, so a crossing is seen within a quarter of the time to it.
+POLLS_PER_CROSSING = 4.0
+RESET_SETTLE_S = 5.0
+FLAT_RATE = 0.05
+ERROR_RETRY_S = 60.0
+
+WINDOWS = (
+    ("sessionPercent", "sessionBurnRate", "sessionResetAt"),
+    ("weeklyPercent", "weeklyBurnRate", "weeklyResetAt"),
+)
+
+
+def bounds() -> Tuple[float, float]:
+    low = env_seconds("MODELMETER_POLL_MIN", DEFAULT_MIN_S)
+    high = env_seconds("MODELMETER_POLL_MAX", DEFAULT_MAX_S)
+    return low, max(low, high)
+
+
+def _epoch(raw) -> Optional[float]:
+    if not isinstance(raw, str) or not raw:
+        return None
+    try:
+        moment = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _number(raw) -> Optional[float]:
+    if isinstance(raw, bool) or not isinstance(raw, (int, float)) or raw != raw:
+        return None
+    return float(raw)
+
+
+def window_delay(percent: Optional[float], rate: Optional[float], has_forecast: bool, high: float) -> float:
+    if percent is None:
+        return high
+    if percent >= NEAR_LIMIT_PERCENT:
+        return NEAR_LIMIT_S
+    if rate is None:
+        # No forecast at all (local sources) says nothing; a missing rate after a restart means "still learning".
+        return LEARNING_S if has_forecast else high
+    if rate <= FLAT_RATE:
+        return high
+    upcoming = next((t for t in THRESHOLDS if t > percent), 100.0)
+    return (upcoming - percent) / rate * 3600.0 / POLLS_PER_CROSSING
+
+
+def next_poll_after(payload: dict, now: Optional[float] = None) -> float:
+    now = time.time() if now is None else now
+    low, high = bounds()
+    delay = high
+    for percent_key, rate_key, reset_key in WINDOWS:
+        percent = _number(payload.get(percent_key))
+        delay = min(delay, window_delay(percent, _number(payload.get(rate_key)), rate_key in payload, high))
+        reset_at = _epoch(payload.get(reset_key))
+        if reset_at is not None and reset_at > now:
+            delay = min(delay, reset_at - now + RESET_SETTLE_S)
+    retry_after = _number(payload.get("retryAfter"))
+    if payload.get("stale") and retry_after is not None:
+        delay = retry_after
+    delay = max(low, delay)
+    if payload.get("rateLimited") and retry_after is not None:
+        delay = max(delay, retry_after)
+    return round(delay, 1)
+
+
+def annotate(payload: dict, now: Optional[float] = None) -> dict:
+    annotated = dict(payload)
+    annotated["nextPollAfter"] = next_poll_after(payload, now)
+    return annotated
+
+
+def watch(
+    refresh: Callable[[], dict],
+    errors: Tuple[Type[BaseException], ...],
+    sleep: Callable[[float], None] = time.sleep,
+) -> int:
+    """Print one payload per line, each time waiting as long as its `nextPollAfter` says.
+
+    `refresh` is expected to return payloads already passed through annotate().
+    Failures in `errors` are reported on stderr and retried after ERROR_RETRY_S.
+    """
+    try:
+        while True:
+            try:
+                payload = refresh()
+            except errors as exc:
+                print(str(exc), file=sys.stderr)
+                delay = max(bounds()[0], ERROR_RETRY_S)
+            else:
+                sys.stdout.write(json.dumps(payload) + "\n")
+                sys.stdout.flush()
+                delay = payload.get("nextPollAfter") or bounds()[1]
+            sleep(delay)
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        # The reader went away; stop quietly and keep Python from complaining at exit.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
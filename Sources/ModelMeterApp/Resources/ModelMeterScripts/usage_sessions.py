@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""Incremental reader for Claude Code session logs (~/.claude/projects/*/*.jsonl).
+
+An offset index in ~/.modelmeter/session-offsets.json remembers, per log file,
+its inode, the size seen and the byte offset consumed so far. Each poll reads
+only the complete lines appended since then and turns assistant messages that
+carry `usage` into `UsageEvent`s. Truncated or replaced files (inode change or
+shrink) are re-read from the start, and streamed messages that Claude Code logs
+more than once are de-duplicated by message and request id.
+
+    usage_sessions.py tail            # print new events as JSON lines
+    usage_sessions.py tail --from-end # start tracking without reading history
+"""
+import glob
+import json
+import os
+import sys
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from usage_state import file_lock, read_json_file, state_path, write_json_atomic
+
+CLAUDE_DIR = os.environ.get("CLAUDE_CONFIG_DIR", "").strip() or os.path.expanduser("~/.claude")
+PROJECTS_DIR = os.path.join(CLAUDE_DIR, "projects")
+OFFSETS_PATH = state_path("session-offsets.json")
+INDEX_VERSION = 1
+READ_CHUNK_BYTES = 1 << 20
+SEEN_KEYS_LIMIT = 20000
+LOCK_TIMEOUT_S = 30.0
+
+
+class UsageEvent(NamedTuple):
+    timestamp: float
+    model: str
+    input_tokens: int
+    output_tokens: int
+    cache_creation_tokens: int
+    cache_read_tokens: int
+    session_id: str
+    message_key: str
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens + self.cache_creation_tokens + self.cache_read_tokens
+
+    def to_json(self) -> dict:
+        data = self._asdict()
+        data["totalTokens"] = self.total_tokens
+        return data
+
+
+def _int(value) -> int:
+    return int(value) if isinstance(value, (int, float)) and value > 0 else 0
+
+
+def parse_timestamp(raw) -> Optional[float]:
+    if not isinstance(raw, str) or not raw:
+        return None
+    try:
+        return datetime.fromisoformat(raw.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def parse_line(raw: bytes) -> Optional[UsageEvent]:
+    # Most lines are user turns or tool output; skip them before paying for json.loads.
+    if b'"usage"' not in raw:
+        return None
+    try:
+        record = json.loads(raw)
+    except ValueError:
+        return None
+    if not isinstance(record, dict):
+        return None
+    message = record.get("message")
+    if not isinstance(message, dict) or not isinstance(message.get("usage"), dict):
+        return None
+    timestamp = parse_timestamp(record.get("timestamp"))
+    if timestamp is None:
+        return None
+    usage = message["usage"]
+    model = message.get("model") if isinstance(message.get("model"), str) else "unknown"
+    message_id = message.get("id") if isinstance(message.get("id"), str) else ""
+    request_id = record.get("requestId") if isinstance(record.get("requestId"), str) else ""
+    return UsageEvent(
+        timestamp=timestamp,
+        model=model,
+        input_tokens=_int(usage.get("input_tokens")),
+        output_tokens=_int(usage.get("output_tokens")),
+        cache_creation_tokens=_int(usage.get("cache_creation_input_tokens")),
+        cache_read_tokens=_int(usage.get("cache_read_input_tokens")),
+        session_id=record.get("sessionId") if isinstance(record.get("sessionId"), str) else "",
+        message_key=f"{message_id}:{request_id}" if message_id or request_id else "",
+    )
+
+
+def session_log_files(projects_dir: str = PROJECTS_DIR) -> List[str]:
+    return sorted(glob.glob(os.path.join(glob.escape(projects_dir), "*", "*.jsonl")))
+
+
+def read_appended(path: str, offset: int, end: int) -> Tuple[List[UsageEvent], int]:
+    """Parse complete lines in [offset, end); returns the events and the offset consumed up to."""
+    events: List[UsageEvent] = []
+    with open(path, "rb") as handle:
+        handle.seek(offset)
+        pending = b""
+        position = offset
+        while position < end:
+            chunk = handle.read(min(READ_CHUNK_BYTES, end - position))
+            if not chunk:
+                break
+            position += len(chunk)
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                event = parse_line(line)
+                if event is not None:
+                    events.append(event)
+    return events, position - len(pending)
+
+
+def consumed_until(path: str, offset: int, end: int) -> int:
+    """Offset just past the last newline in [offset, end)."""
+    if end <= offset:
+        return offset
+    with open(path, "rb") as handle:
+        position = end
+        while position > offset:
+            start = max(offset, position - READ_CHUNK_BYTES)
+            handle.seek(start)
+            chunk = handle.read(position - start)
+            newline = chunk.rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            position = start
+    return offset
+
+
+class OffsetIndex:
+    def __init__(self, files: Optional[Dict[str, dict]] = None, seen: Optional[List[str]] = None):
+        self.files: Dict[str, dict] = files or {}
+        self.seen: "OrderedDict[str, None]" = OrderedDict((key, None) for key in (seen or []))
+
+    @classmethod
+    def load(cls, path: str = OFFSETS_PATH) -> "OffsetIndex":
+        raw = read_json_file(path)
+        if not isinstance(raw, dict) or raw.get("version") != INDEX_VERSION:
+            return cls()
+        files = raw.get("files") if isinstance(raw.get("files"), dict) else {}
+        seen = raw.get("seen") if isinstance(raw.get("seen"), list) else []
+        return cls(files, [key for key in seen if isinstance(key, str)])
+
+    def save(self, path: str = OFFSETS_PATH) -> None:
+        write_json_atomic(path, {"version": INDEX_VERSION, "files": self.files, "seen": list(self.seen)})
+
+    def first_sighting(self, key: str) -> bool:
+        if not key:
+            return True
+        if key in self.seen:
+            return False
+        self.seen[key] = None
+        while len(self.seen) > SEEN_KEYS_LIMIT:
+            self.seen.popitem(last=False)
+        return True
+
+    def start_offset(self, path: str, st: os.stat_result) -> int:
+        entry = self.files.get(path)
+        if not isinstance(entry, dict) or entry.get("inode") != st.st_ino:
+            return 0
+        offset = entry.get("offset")
+        if not isinstance(offset, int) or offset > st.st_size:
+            return 0
+        return offset
+
+    def record(self, path: str, st: os.stat_result, offset: int) -> None:
+        self.files[path] = {"inode": st.st_ino, "size": st.st_size, "offset": offset}
+
+    def prune(self, live_paths: List[str]) -> None:
+        live = set(live_paths)
+        for path in [p for p in self.files if p not in live]:
+            del self.files[path]
+
+
+def tail(index: OffsetIndex, projects_dir: str = PROJECTS_DIR) -> Iterator[UsageEvent]:
+    """Yield usage events appended since the offsets in `index`, advancing it as files are finished."""
+    paths = session_log_files(projects_dir)
+    index.prune(paths)
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        offset = index.start_offset(path, st)
+        if offset == st.st_size:
+            continue
+        try:
+            events, consumed = read_appended(path, offset, st.st_size)
+        except OSError:
+            continue
+        index.record(path, st, consumed)
+        for event in events:
+            if index.first_sighting(event.message_key):
+                yield event
+
+
+def seek_to_end(index: OffsetIndex, projects_dir: str = PROJECTS_DIR) -> None:
+    paths = session_log_files(projects_dir)
+    index.prune(paths)
+    for path in paths:
+        try:
+            st = os.stat(path)
+            index.record(path, st, consumed_until(path, 0, st.st_size))
+        except OSError:
+            continue
+
+
+def poll(projects_dir: str = PROJECTS_DIR, index_path: str = OFFSETS_PATH) -> List[UsageEvent]:
+    """Read new events and persist the advanced offsets, serialized across processes."""
+    with file_lock("session-tail", LOCK_TIMEOUT_S):
+        index = OffsetIndex.load(index_path)
+        events = list(tail(index, projects_dir))
+        index.save(index_path)
+    return events
+
+
+def main() -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tail Claude Code session logs for token usage events.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    tail_parser = sub.add_parser("tail", help="Print usage events appended since the last run")
+    tail_parser.add_argument("--projects-dir", default=PROJECTS_DIR)
+    tail_parser.add_argument("--index", default=OFFSETS_PATH, help="Offset index path")
+    tail_parser.add_argument("--from-end", action="store_true", help="Mark existing content as read without emitting it")
+    args = parser.parse_args()
+
+    if args.from_end:
+        with file_lock("session-tail", LOCK_TIMEOUT_S):
+            index = OffsetIndex.load(args.index)
+            seek_to_end(index, args.projects_dir)
+            index.save(args.index)
+        return 0
+
+    for event in poll(args.projects_dir, args.index):
+        sys.stdout.write(json.dumps(event.to_json()) + "\n")
+    sys.stdout.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""Fixed-layout binary snapshot of the latest usage per provider (~/.modelmeter/snapshot.bin).
+
+Meant for readers that run on every prompt: reading maps the file and
+unpacks a few doubles, with no JSON, network or typing imports. Every
+successful fetch updates its provider's slot in place.
+
+Layout (little endian, 400 bytes):
+
+    header  magic "MMSS", u16 version, u16 slot count, u64 sequence
+    slots   8 x (8s provider, f64 session %, f64 weekly %,
+                 f64 session reset, f64 weekly reset, f64 updatedAt)
+
+Times are epoch seconds; NaN marks a missing value. Writers hold a file lock
+and bump the sequence to odd before touching a slot and to even after, so a
+reader that sees an odd or changed sequence retries instead of returning a
+torn slot (a seqlock). Updates go through pwrite() on the same inode, so file
+watchers such as the app's UsageFileWatcher keep firing.
+
+    usage_snapshot.py                       # claude 12% 40%
+    usage_snapshot.py --provider codex --format '{weekly:.0f}% (resets {weekly_reset})'
+
+For the fastest prompt, run it as `python3 -S usage_snapshot.py`.
+"""
+# typing is deliberately not imported: it costs more than the whole read.
+from __future__ import annotations
+
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+
+# Same location rule as usage_state.state_path(), without importing it on the read path.
+SNAPSHOT_PATH = os.path.join(
+    os.environ.get("MODELMETER_STATE_DIR", "").strip() or os.path.expanduser("~/.modelmeter"),
+    "snapshot.bin",
+)
+MAGIC = b"MMSS"
+VERSION = 1
+MAX_PROVIDERS = 8
+HEADER = struct.Struct("<4sHHQ")
+SEQUENCE = struct.Struct("<Q")
+SEQUENCE_OFFSET = 8
+SLOT = struct.Struct("<8sddddd")
+FILE_SIZE = HEADER.size + MAX_PROVIDERS * SLOT.size
+READ_RETRIES = 100
+LOCK_TIMEOUT_S = 2.0
+DEFAULT_FORMAT = "{provider} {session:.0f}% {weekly:.0f}%"
+
+
+class Snapshot:
+    __slots__ = ("provider", "session_percent", "weekly_percent", "session_reset_at", "weekly_reset_at", "updated_at")
+
+    def __init__(self, provider: str, values: list[float]):
+        session_percent, weekly_percent, session_reset_at, weekly_reset_at, updated_at = (
+            None if math.isnan(value) else value for value in values
+        )
+        self.provider = provider
+        self.session_percent = session_percent
+        self.weekly_percent = weekly_percent
+        self.session_reset_at = session_reset_at
+        self.weekly_reset_at = weekly_reset_at
+        self.updated_at = updated_at
+
+
+def _empty_file() -> bytes:
+    return HEADER.pack(MAGIC, VERSION, MAX_PROVIDERS, 0) + bytes(MAX_PROVIDERS * SLOT.size)
+
+
+def _valid(header: bytes) -> bool:
+    magic, version, slots, _ = HEADER.unpack_from(header)
+    return magic == MAGIC and version == VERSION and slots == MAX_PROVIDERS
+
+
+def read_all(path: str = SNAPSHOT_PATH) -> dict[str, Snapshot] | None:
+    """Every provider's slot, or None if the file is missing, foreign or kept busy by writers."""
+    try:
+        with open(path, "rb") as handle:
+            if os.fstat(handle.fileno()).st_size != FILE_SIZE:
+                return None
+            view = mmap.mmap(handle.fileno(), FILE_SIZE, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        if not _valid(view):
+            return None
+        for _ in range(READ_RETRIES):
+            before = SEQUENCE.unpack_from(view, SEQUENCE_OFFSET)[0]
+            if before & 1:
+                time.sleep(0)
+                continue
+            slots = view[HEADER.size:FILE_SIZE]
+            if SEQUENCE.unpack_from(view, SEQUENCE_OFFSET)[0] != before:
+                continue
+            snapshots = {}
+            for index in range(MAX_PROVIDERS):
+                raw_name, *values = SLOT.unpack_from(slots, index * SLOT.size)
+                name = raw_name.rstrip(b"\0").decode("utf-8", "replace")
+                if name:
+                    snapshots[name] = Snapshot(name, values)
+            return snapshots
+        return None
+    finally:
+        view.close()
+
+
+def read(provider: str, path: str = SNAPSHOT_PATH) -> Snapshot | None:
+    snapshots = read_all(path)
+    return snapshots.get(provider) if snapshots else None
+
+
+def _epoch(raw) -> float:
+    if not isinstance(raw, str) or not raw:
+        return math.nan
+    from datetime import datetime, timezone
+
+    try:
+        moment = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    except ValueError:
+        return math.nan
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _number(raw) -> float:
+    if isinstance(raw, bool) or not isinstance(raw, (int, float)):
+        return math.nan
+    return float(raw)
+
+
+def write(provider: str, payload: dict, path: str = SNAPSHOT_PATH) -> None:
+    """Store `payload` in the provider's slot under the seqlock."""
+    from usage_state import file_lock, write_bytes_atomic
+
+    name = provider.encode("utf-8")[:8]
+    slot = SLOT.pack(
+        name,
+        _number(payload.get("sessionPercent")),
+        _number(payload.get("weeklyPercent")),
+        _epoch(payload.get("sessionResetAt")),
+        _epoch(payload.get("weeklyResetAt")),
+        _epoch(payload.get("updatedAt")) if payload.get("updatedAt") else time.time(),
+    )
+    with file_lock("snapshot", LOCK_TIMEOUT_S) as acquired:
+        if not acquired:
+            return
+        try:
+            fd = os.open(path, os.O_RDWR)
+        except FileNotFoundError:
+            write_bytes_atomic(path, _empty_file())
+            fd = os.open(path, os.O_RDWR)
+        try:
+            header = os.pread(fd, FILE_SIZE, 0)
+            if len(header) != FILE_SIZE or not _valid(header):
+                # Foreign or truncated file: replace it rather than patch it.
+                os.close(fd)
+                fd = -1
+                write_bytes_atomic(path, _empty_file())
+                fd = os.open(path, os.O_RDWR)
+                header = _empty_file()
+            index = None
+            for candidate in range(MAX_PROVIDERS):
+                existing = SLOT.unpack_from(header, HEADER.size + candidate * SLOT.size)[0].rstrip(b"\0")
+                if existing == name:
+                    index = candidate
+                    break
+                if not existing and index is None:
+                    index = candidate
+            if index is None:
+                return
+            sequence = SEQUENCE.unpack_from(header, SEQUENCE_OFFSET)[0]
+            sequence += 1 if sequence % 2 == 0 else 0
+            os.pwrite(fd, SEQUENCE.pack(sequence), SEQUENCE_OFFSET)
+            os.pwrite(fd, slot, HEADER.size + index * SLOT.size)
+            os.pwrite(fd, SEQUENCE.pack(sequence + 1), SEQUENCE_OFFSET)
+        finally:
+            if fd >= 0:
+                os.close(fd)
+
+
+def record_poll(provider: str, payload: dict, path: str = SNAPSHOT_PATH) -> None:
+    """Update the snapshot after a successful poll; best effort, never fails the poll."""
+    try:
+        write(provider, payload, path)
+    except Exception:
+        pass
+
+
+def _duration(seconds: float | None) -> str:
+    if seconds is None:
+        return "-"
+    seconds = int(max(0.0, seconds))
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    if days:
+        return f"{days}d{hours}h"
+    if hours:
+        return f"{hours}h{seconds // 60:02d}m"
+    return f"{seconds // 60}m"
+
+
+def format_snapshot(snapshot: Snapshot, template: str, now: float | None = None) -> str:
+    now = time.time() if now is None else now
+    nan = math.nan
+    return template.format(
+        provider=snapshot.provider,
+        session=nan if snapshot.session_percent is None else snapshot.session_percent,
+        weekly=nan if snapshot.weekly_percent is None else snapshot.weekly_percent,
+        session_reset=_duration(None if snapshot.session_reset_at is None else snapshot.session_reset_at - now),
+        weekly_reset=_duration(None if snapshot.weekly_reset_at is None else snapshot.weekly_reset_at - now),
+        age=_duration(None if snapshot.updated_at is None else now - snapshot.updated_at),
+    )
+
+
+def main(argv: list[str]) -> int:
+    # Hand-rolled flags: argparse alone would double the start-up time of a prompt segment.
+    provider, template, path = "claude", DEFAULT_FORMAT, SNAPSHOT_PATH
+    args = iter(argv)
+    for arg in args:
+        if arg in ("-h", "--help"):
+            print("usage: usage_snapshot.py [--provider NAME] [--format TEMPLATE] [--path FILE]\n\n"
+                  "TEMPLATE fields: provider, session, weekly, session_reset, weekly_reset, age")
+            return 0
+        value = next(args, None)
+        if value is None or arg not in ("--provider", "--format", "--path"):
+            print(f"usage_snapshot.py: bad argument {arg}", file=sys.stderr)
+            return 2
+        if arg == "--provider":
+            provider = value
+        elif arg == "--format":
+            template = value
+        else:
+            path = value
+    snapshot = read(provider, path)
+    if snapshot is None:
+        return 1
+    try:
+        sys.stdout.write(format_snapshot(snapshot, template) + "\n")
+    except (KeyError, ValueError, IndexError) as exc:
+        print(f"usage_snapshot.py: bad format: {exc}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
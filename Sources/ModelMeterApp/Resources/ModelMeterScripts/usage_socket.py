@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""Unix-socket snapshot server: one upstream fetcher, any number of local readers.
+
+`claude_usage.py --socket` (likewise codex) polls the provider on its own
+`nextPollAfter` schedule and serves the latest payload on
+~/.modelmeter/run/<provider>.sock. Shell prompts, tmux and editor status
+lines can all read it without adding upstream requests. Plain invocations of
+the provider scripts ask a running server first.
+
+Clients send JSON lines, as in usage_daemon:
+
+    {"id": 1, "method": "get"}        -> {"id": 1, "result": {...}}
+    {"id": 2, "method": "subscribe"}  -> {"id": 2, "result": {...}}, then
+                                         {"id": 2, "event": "update", "result": {...}}
+                                         after every refresh until the client disconnects
+    {"id": 3, "method": "ping"}       -> {"id": 3, "result": "pong"}
+
+From a shell:
+
+    usage_socket.py get --provider claude
+    usage_socket.py subscribe --provider codex
+
+After a failed refresh the last good snapshot is still served, marked
+`stale: true` with its `ageSeconds`; once it is older than
+MODELMETER_SOCKET_MAX_STALE (default 15 minutes) the refresh error is
+returned instead.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+from usage_cache import env_seconds
+from usage_state import socket_path
+
+FIRST_SNAPSHOT_WAIT_S = 20.0
+DEFAULT_MAX_STALE_S = 15 * 60.0
+# How often an idle subscriber checks whether its client has gone away.
+SUBSCRIBER_CHECK_S = 30.0
+CLIENT_TIMEOUT_S = 1.0
+MAX_REQUEST_BYTES = 64 * 1024
+
+
+def default_path(provider: str) -> str:
+    return socket_path(provider)
+
+
+def max_stale() -> float:
+    return env_seconds("MODELMETER_SOCKET_MAX_STALE", DEFAULT_MAX_STALE_S)
+
+
+class SnapshotStore:
+    """Latest payload (or error) plus a version that subscribers wait on."""
+
+    def __init__(self) -> None:
+        self._changed = threading.Condition()
+        self.version = 0
+        self.payload: Optional[dict] = None
+        self.error: Optional[str] = None
+        self._fetched_at = 0.0
+
+    def publish(self, payload: Optional[dict], error: Optional[str] = None) -> None:
+        with self._changed:
+            if payload is not None:
+                self.payload = payload
+                # A payload the provider script already answered from cache carries its own age.
+                age = payload.get("ageSeconds") if payload.get("stale") else None
+                self._fetched_at = time.monotonic() - (age if isinstance(age, (int, float)) else 0.0)
+            self.error = error
+            self.version += 1
+            self._changed.notify_all()
+
+    def _served(self) -> Tuple[Optional[dict], Optional[str]]:
+        """The payload to hand out, marked stale after a failed refresh; withheld once too old."""
+        payload = self.payload
+        if payload is None:
+            return None, self.error or "No usage snapshot yet."
+        if self.error is None and not payload.get("stale"):
+            return payload, None
+        age = time.monotonic() - self._fetched_at
+        if age > max_stale():
+            return None, f"{self.error or 'No fresh usage snapshot'} (last good snapshot is {age:.0f}s old)"
+        marked = dict(payload)
+        marked["stale"] = True
+        marked["ageSeconds"] = round(age, 1)
+        return marked, None
+
+    def wait_newer(self, version: int, timeout: float) -> Tuple[int, Optional[dict], Optional[str]]:
+        with self._changed:
+            self._changed.wait_for(lambda: self.version > version, timeout)
+            payload, error = self._served()
+            return self.version, payload, error
+
+
+def _answer(request_id: Any, payload: Optional[dict], error: Optional[str]) -> Dict[str, Any]:
+    if payload is not None:
+        return {"id": request_id, "result": payload}
+    return {"id": request_id, "error": error}
+
+
+def _client_gone(sock) -> bool:
+    import select
+    import socket
+
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        return bool(readable) and not sock.recv(1, socket.MSG_PEEK)
+    except OSError:
+        return True
+
+
+def _make_handler(store: SnapshotStore):
+    import socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+        def send(self, message: Dict[str, Any]) -> None:
+            self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+        def handle(self) -> None:
+            try:
+                while True:
+                    line = self.rfile.readline(MAX_REQUEST_BYTES)
+                    if not line:
+                        return
+                    if not line.strip():
+                        continue
+                    try:
+                        request = json.loads(line)
+                    except ValueError as exc:
+                        self.send({"id": None, "error": f"Invalid request: {exc}"})
+                        continue
+                    if not isinstance(request, dict):
+                        self.send({"id": None, "error": "Invalid request: expected a JSON object."})
+                        continue
+                    request_id = request.get("id")
+                    method = request.get("method") or "get"
+                    if method == "ping":
+                        self.send({"id": request_id, "result": "pong"})
+                    elif method == "get":
+                        _, payload, error = store.wait_newer(0, FIRST_SNAPSHOT_WAIT_S)
+                        self.send(_answer(request_id, payload, error))
+                    elif method == "subscribe":
+                        self.subscribe(request_id)
+                        return
+                    else:
+                        self.send({"id": request_id, "error": f"Unknown method: {method}"})
+            except (BrokenPipeError, ConnectionResetError):
+                return
+
+        def subscribe(self, request_id: Any) -> None:
+            version, payload, error = store.wait_newer(0, FIRST_SNAPSHOT_WAIT_S)
+            self.send(_answer(request_id, payload, error))
+            while True:
+                latest, payload, error = store.wait_newer(version, SUBSCRIBER_CHECK_S)
+                if latest == version:
+                    if _client_gone(self.connection):
+                        return
+                    continue
+                version = latest
+                message = _answer(request_id, payload, error)
+                message["event"] = "update"
+                self.send(message)
+
+    return Handler
+
+
+def _claim_path(path: str) -> bool:
+    """Remove a socket left by a dead server; False if a live one is listening."""
+    import socket
+
+    if not os.path.exists(path):
+        return True
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.settimeout(CLIENT_TIMEOUT_S)
+        probe.connect(path)
+        return False
+    except OSError:
+        os.unlink(path)
+        return True
+    finally:
+        probe.close()
+
+
+def serve(
+    refresh: Callable[[], dict],
+    errors: Tuple[Type[BaseException], ...],
+    path: str,
+) -> int:
+    """Poll with `refresh` on its nextPollAfter schedule and serve snapshots on `path` until stopped."""
+    import signal
+    import socketserver
+
+    import usage_schedule
+
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    if not _claim_path(path):
+        print(f"A snapshot server is already listening on {path}.", file=sys.stderr)
+        return 1
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    store = SnapshotStore()
+    server = Server(path, _make_handler(store))
+    os.chmod(path, 0o600)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        while not stop.is_set():
+            try:
+                payload = refresh()
+            except errors as exc:
+                print(str(exc), file=sys.stderr)
+                store.publish(None, str(exc))
+                delay = max(usage_schedule.bounds()[0], usage_schedule.ERROR_RETRY_S)
+            else:
+                store.publish(payload)
+                delay = payload.get("nextPollAfter") or usage_schedule.bounds()[1]
+            stop.wait(delay)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+    return 0
+
+
+def request(path: str, method: str = "get", timeout: float = CLIENT_TIMEOUT_S) -> Optional[dict]:
+    """One request/response round trip; None when no server answers."""
+    if not os.path.exists(path):
+        return None
+    import socket
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            sock.sendall((json.dumps({"id": 1, "method": method}) + "\n").encode("utf-8"))
+            with sock.makefile("rb") as stream:
+                line = stream.readline()
+        response = json.loads(line)
+    except (OSError, ValueError):
+        return None
+    return response if isinstance(response, dict) else None
+
+
+def get_snapshot(path: str, timeout: float = CLIENT_TIMEOUT_S) -> Optional[dict]:
+    response = request(path, "get", timeout)
+    result = response.get("result") if response else None
+    return result if isinstance(result, dict) else None
+
+
+def subscribe(path: str, emit: Callable[[dict], None]) -> int:
+    import socket
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(b'{"id": 1, "method": "subscribe"}\n')
+        with sock.makefile("rb") as stream:
+            for line in stream:
+                message = json.loads(line)
+                if "error" in message:
+                    print(message["error"], file=sys.stderr)
+                    continue
+                emit(message["result"])
+    return 0
+
+
+def main() -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Read usage snapshots from a running --socket server.")
+    parser.add_argument("command", choices=["get", "subscribe"])
+    parser.add_argument("--provider", default="claude")
+    parser.add_argument("--path", help="Socket path (default ~/.modelmeter/run/<provider>.sock)")
+    args = parser.parse_args()
+    path = args.path or default_path(args.provider)
+
+    if args.command == "get":
+        response = request(path, "get", FIRST_SNAPSHOT_WAIT_S + CLIENT_TIMEOUT_S)
+        if response is None:
+            print(f"No snapshot server on {path}.", file=sys.stderr)
+            return 1
+        if "error" in response:
+            print(response["error"], file=sys.stderr)
+            return 1
+        print(json.dumps(response["result"]))
+        return 0
+
+    def emit(payload: dict) -> None:
+        sys.stdout.write(json.dumps(payload) + "\n")
+        sys.stdout.flush()
+
+    try:
+        return subscribe(path, emit)
+    except OSError as exc:
+        if isinstance(exc, BrokenPipeError):
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 0
+        print(f"No snapshot server on {path}: {exc}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Small helpers for files the scripts keep under ~/.modelmeter."""
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+STATE_DIR = os.environ.get("MODELMETER_STATE_DIR", "").strip() or os.path.expanduser("~/.modelmeter")
+LOCK_DIR = os.path.join(STATE_DIR, "locks")
+LOCK_POLL_S = 0.05
+
+_thread_locks_guard = threading.Lock()
+_thread_locks: Dict[str, threading.Lock] = {}
+
+
+def state_path(*parts: str) -> str:
+    return os.path.join(STATE_DIR, *parts)
+
+
+def socket_path(provider: str) -> str:
+    """Where `<provider>_usage.py --socket` listens by default."""
+    return state_path("run", f"{provider}.sock")
+
+
+def read_json_file(path: str) -> Optional[Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            return json.load(handle)
+    except Exception:
+        return None
+
+
+def write_bytes_atomic(path: str, data: bytes, mode: int = 0o600) -> None:
+    """Write via temp file + fsync + rename so readers never see a partial file."""
+    import tempfile
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix="." + os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_json_atomic(path: str, payload: Any, mode: int = 0o600) -> None:
+    write_bytes_atomic(path, json.dumps(payload, separators=(",", ":")).encode("utf-8"), mode)
+
+
+def _thread_lock(name: str) -> threading.Lock:
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(name, threading.Lock())
+
+
+@contextmanager
+def file_lock(name: str, timeout: float) -> Iterator[bool]:
+    """Hold ~/.modelmeter/locks/<name>.lock exclusively across threads and processes.
+
+    Yields whether the lock was actually taken within `timeout`.
+    """
+    deadline = time.monotonic() + timeout
+    thread_lock = _thread_lock(name)
+    if not thread_lock.acquire(timeout=timeout):
+        yield False
+        return
+    fd = -1
+    try:
+        try:
+            os.makedirs(LOCK_DIR, exist_ok=True)
+            fd = os.open(os.path.join(LOCK_DIR, f"{name}.lock"), os.O_CREAT | os.O_RDWR, 0o600)
+        except OSError:
+            fd = -1
+        acquired = False
+        while fd >= 0:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                acquired = True
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    break
+                time.sleep(LOCK_POLL_S)
+        yield acquired
+    finally:
+        if fd >= 0:
+            os.close(fd)
+        thread_lock.release()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Offline Claude usage computed from ~/.claude/stats-cache.json.
+
+Claude Code keeps per-day token totals in `dailyModelTokens[]`. This module
+folds them into per-model totals for today and the rolling seven days ending
+today, and reports them in the usual payload shape. The file only has daily
+granularity, so the "session" figure is today's calendar day. Percentages are
+relative to optional token budgets (`CLAUDE_SESSION_TOKEN_BUDGET`,
+`CLAUDE_WEEKLY_TOKEN_BUDGET`) and are 0 when no budget is set.
+
+The per-day summary is kept in ~/.modelmeter/stats-cache-summary.json together
+with the source file's inode/mtime/size, so runs while stats-cache.json is
+unchanged never re-parse it.
+"""
+import json
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from usage_state import read_json_file, state_path, write_json_atomic
+
+CLAUDE_DIR = os.environ.get("CLAUDE_CONFIG_DIR", "").strip() or os.path.expanduser("~/.claude")
+STATS_CACHE_PATH = os.path.join(CLAUDE_DIR, "stats-cache.json")
+SUMMARY_PATH = state_path("stats-cache-summary.json")
+SUMMARY_VERSION = 1
+WINDOW_DAYS = 7
+
+DailyTokens = Dict[str, Dict[str, int]]
+
+_memo: Optional[Tuple[List[int], DailyTokens]] = None
+
+
+class StatsCacheError(Exception):
+    pass
+
+
+def signature_of(path: str) -> List[int]:
+    st = os.stat(path)
+    return [st.st_ino, st.st_mtime_ns, st.st_size]
+
+
+def parse_daily_tokens(raw: dict) -> DailyTokens:
+    days: DailyTokens = {}
+    entries = raw.get("dailyModelTokens")
+    if not isinstance(entries, list):
+        return days
+    for entry in entries:
+        if not isinstance(entry, dict) or not isinstance(entry.get("date"), str):
+            continue
+        by_model = entry.get("tokensByModel")
+        if not isinstance(by_model, dict):
+            continue
+        day = days.setdefault(entry["date"][:10], {})
+        for model, tokens in by_model.items():
+            if isinstance(tokens, (int, float)) and tokens > 0:
+                day[str(model)] = day.get(str(model), 0) + int(tokens)
+    return days
+
+
+def load_daily_tokens(path: str = STATS_CACHE_PATH, summary_path: str = SUMMARY_PATH) -> DailyTokens:
+    global _memo
+    try:
+        signature = signature_of(path)
+    except OSError:
+        raise StatsCacheError(f"Claude stats cache not found at {path}.")
+
+    if _memo is not None and _memo[0] == signature:
+        return _memo[1]
+
+    summary = read_json_file(summary_path)
+    if (
+        isinstance(summary, dict)
+        and summary.get("version") == SUMMARY_VERSION
+        and summary.get("source") == path
+        and summary.get("signature") == signature
+        and isinstance(summary.get("days"), dict)
+    ):
+        _memo = (signature, summary["days"])
+        return summary["days"]
+
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            raw = json.load(handle)
+    except (OSError, ValueError) as exc:
+        raise StatsCacheError(f"Failed to read Claude stats cache: {exc}")
+    if not isinstance(raw, dict):
+        raise StatsCacheError("Claude stats cache is not a JSON object.")
+
+    days = parse_daily_tokens(raw)
+    _memo = (signature, days)
+    try:
+        write_json_atomic(summary_path, {
+            "version": SUMMARY_VERSION,
+            "source": path,
+            "signature": signature,
+            "days": days,
+        })
+    except OSError:
+        pass
+    return days
+
+
+def sum_days(days: DailyTokens, keys: List[str]) -> Dict[str, int]:
+    totals: Dict[str, int] = {}
+    for key in keys:
+        for model, tokens in days.get(key, {}).items():
+            totals[model] = totals.get(model, 0) + tokens
+    return totals
+
+
+def percent_of(total: int, budget: Optional[float]) -> float:
+    if not budget or budget <= 0:
+        return 0.0
+    return round(total / budget * 100.0, 2)
+
+
+def env_budget(name: str) -> Optional[float]:
+    try:
+        value = float(os.environ.get(name, "").strip())
+    except ValueError:
+        return None
+    return value if value > 0 else None
+
+
+def build_payload(
+    days: DailyTokens,
+    today: date,
+    mtime: float,
+    session_budget: Optional[float],
+    weekly_budget: Optional[float],
+) -> dict:
+    window = [(today - timedelta(days=offset)).isoformat() for offset in range(WINDOW_DAYS)]
+    today_by_model = sum_days(days, window[:1])
+    week_by_model = sum_days(days, window)
+    today_total = sum(today_by_model.values())
+    week_total = sum(week_by_model.values())
+    next_midnight = datetime.combine(today + timedelta(days=1), datetime.min.time()).astimezone()
+    return {
+        "sessionPercent": percent_of(today_total, session_budget),
+        "weeklyPercent": percent_of(week_total, weekly_budget),
+        "sessionResetAt": next_midnight.astimezone(timezone.utc).isoformat(),
+        "weeklyResetAt": None,
+        "updatedAt": datetime.fromtimestamp(mtime, tz=timezone.utc).isoformat(),
+        "source": "stats-cache",
+        "tokens": {
+            "today": {"total": today_total, "byModel": today_by_model},
+            "last7Days": {"total": week_total, "byModel": week_by_model},
+        },
+    }
+
+
+def collect_usage(
+    session_budget: Optional[float] = None,
+    weekly_budget: Optional[float] = None,
+    path: str = STATS_CACHE_PATH,
+) -> dict:
+    days = load_daily_tokens(path)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        raise StatsCacheError(f"Claude stats cache not found at {path}.")
+    if session_budget is None:
+        session_budget = env_budget("CLAUDE_SESSION_TOKEN_BUDGET")
+    if weekly_budget is None:
+        weekly_budget = env_budget("CLAUDE_WEEKLY_TOKEN_BUDGET")
+    return build_payload(days, date.today(), mtime, session_budget, weekly_budget)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Per-phase timings for one poll, as a `timings` object or a Chrome trace file.
+
+Phases are recorded with `span("name")` around credential reads, keychain
+forks, token refreshes, DNS/connect/TLS, time to first byte, body reads,
+JSON decoding, normalization and the cache/history writes after a fetch,
+all nested inside one `poll` span. Recording is off unless `--timings`,
+`--trace`, `MODELMETER_TIMINGS=1` or `MODELMETER_TRACE_DIR` asks for it, and
+`span()` is a shared no-op context manager while it is off.
+
+Trace files use the Chrome trace-event format and open in chrome://tracing
+or https://ui.perfetto.dev.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+_NOOP = nullcontext()
+_lock = threading.Lock()
+_events: Optional[List[dict]] = None
+_origin_ns = 0
+
+
+class TraceOptions(NamedTuple):
+    timings: bool
+    trace_path: Optional[str]
+
+    @property
+    def active(self) -> bool:
+        return self.timings or self.trace_path is not None
+
+
+def options(provider: str, timings: bool = False, trace_path: Optional[str] = None) -> TraceOptions:
+    """Merge command-line choices with the environment and start recording if anything is wanted."""
+    timings = timings or os.environ.get("MODELMETER_TIMINGS", "").strip() == "1"
+    if trace_path is None:
+        trace_dir = os.environ.get("MODELMETER_TRACE_DIR", "").strip()
+        if trace_dir:
+            trace_path = os.path.join(trace_dir, f"{provider}-{int(time.time() * 1000)}-{os.getpid()}.trace.json")
+    chosen = TraceOptions(timings, trace_path)
+    if chosen.active and not enabled():
+        enable()
+    return chosen
+
+
+def enable() -> None:
+    global _events, _origin_ns
+    with _lock:
+        _events = []
+        _origin_ns = time.perf_counter_ns()
+
+
+def enabled() -> bool:
+    return _events is not None
+
+
+def reset() -> None:
+    if enabled():
+        enable()
+
+
+def record(name: str, start_ns: int, end_ns: int, **args: Any) -> None:
+    if _events is None:
+        return
+    event = {
+        "name": name,
+        "ph": "X",
+        "ts": (start_ns - _origin_ns) / 1000.0,
+        "dur": (end_ns - start_ns) / 1000.0,
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+    }
+    if args:
+        event["args"] = args
+    with _lock:
+        _events.append(event)
+
+
+@contextmanager
+def _timed(name: str, args: Dict[str, Any]) -> Iterator[None]:
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        record(name, start, time.perf_counter_ns(), **args)
+
+
+def span(name: str, **args: Any):
+    if _events is None:
+        return _NOOP
+    return _timed(name, args)
+
+
+def timings() -> Dict[str, float]:
+    """Milliseconds per phase name, summed over repeats (retries, reconnects)."""
+    totals: Dict[str, float] = {}
+    with _lock:
+        for event in _events or []:
+            totals[event["name"]] = totals.get(event["name"], 0.0) + event["dur"] / 1000.0
+    return {name: round(ms, 3) for name, ms in totals.items()}
+
+
+def write_chrome_trace(path: str) -> None:
+    with _lock:
+        events = list(_events or [])
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, handle)
+
+
+def finish(payload: dict, chosen: TraceOptions) -> dict:
+    """Attach timings and write the trace file as requested; tracing never fails a poll."""
+    if not chosen.active:
+        return payload
+    if chosen.trace_path:
+        try:
+            write_chrome_trace(chosen.trace_path)
+        except OSError:
+            pass
+    if not chosen.timings:
+        return payload
+    annotated = dict(payload)
+    annotated["timings"] = timings()
+    return annotated
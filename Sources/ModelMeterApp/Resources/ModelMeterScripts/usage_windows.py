@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""Rolling five-hour and seven-day token windows built from session log events.
+
+Each window is a ring of per-minute int64 buckets plus a running total, so
+adding an event and reading a window sum are O(1) (amortized over elapsed
+minutes). Both rings are persisted to ~/.modelmeter/windows-claude.bin between
+runs, next to their own session-log offset index, and only events appended
+since the last run are read from disk. Without them, usage_backfill rebuilds
+both from every log in parallel.
+
+Cache reads are excluded from the totals: they dwarf every other count while
+costing a fraction of a fresh token, so including them would make the
+percentages track prompt caching rather than consumption.
+"""
+import json
+import struct
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from usage_sessions import PROJECTS_DIR, OffsetIndex, UsageEvent, tail
+from usage_state import file_lock, state_path, write_bytes_atomic
+from usage_stats_cache import env_budget, percent_of
+
+SESSION_MINUTES = 5 * 60
+WEEKLY_MINUTES = 7 * 24 * 60
+WINDOWS_PATH = state_path("windows-claude.bin")
+WINDOWS_INDEX_PATH = state_path("windows-claude-offsets.json")
+LOCK_NAME = "windows-claude"
+LOCK_TIMEOUT_S = 30.0
+
+_MAGIC = b"MMWR"
+_VERSION = 1
+_FILE_HEADER = struct.Struct("<4sHH")
+_RING_HEADER = struct.Struct("<Iqq")
+_NO_MINUTE = -1
+
+
+class MinuteRing:
+    __slots__ = ("size", "buckets", "head", "total")
+
+    def __init__(self, size: int):
+        self.size = size
+        self.buckets = array("q", bytes(8 * size))
+        self.head = _NO_MINUTE
+        self.total = 0
+
+    def _advance(self, minute: int) -> None:
+        if self.head == _NO_MINUTE:
+            self.head = minute
+            return
+        steps = minute - self.head
+        if steps <= 0:
+            return
+        if steps >= self.size:
+            self.buckets = array("q", bytes(8 * self.size))
+            self.total = 0
+        else:
+            buckets = self.buckets
+            for m in range(self.head + 1, minute + 1):
+                slot = m % self.size
+                self.total -= buckets[slot]
+                buckets[slot] = 0
+        self.head = minute
+
+    def add(self, minute: int, tokens: int) -> None:
+        if tokens <= 0:
+            return
+        if self.head != _NO_MINUTE and minute <= self.head - self.size:
+            return
+        self._advance(minute)
+        self.buckets[minute % self.size] += tokens
+        self.total += tokens
+
+    def sum(self, minute: int) -> int:
+        self._advance(minute)
+        return self.total
+
+    def pack(self) -> bytes:
+        return _RING_HEADER.pack(self.size, self.head, self.total) + self.buckets.tobytes()
+
+    @classmethod
+    def unpack(cls, data: memoryview, offset: int) -> "Tuple[MinuteRing, int]":
+        size, head, total = _RING_HEADER.unpack_from(data, offset)
+        offset += _RING_HEADER.size
+        ring = cls(size)
+        ring.buckets = array("q")
+        ring.buckets.frombytes(bytes(data[offset:offset + 8 * size]))
+        if len(ring.buckets) != size:
+            raise ValueError("Truncated window ring")
+        ring.head = head
+        ring.total = total
+        return ring, offset + 8 * size
+
+
+def counted_tokens(event: UsageEvent) -> int:
+    return event.input_tokens + event.output_tokens + event.cache_creation_tokens
+
+
+class UsageWindows:
+    __slots__ = ("session", "weekly")
+
+    def __init__(self) -> None:
+        self.session = MinuteRing(SESSION_MINUTES)
+        self.weekly = MinuteRing(WEEKLY_MINUTES)
+
+    def add(self, timestamp: float, tokens: int) -> None:
+        minute = int(timestamp // 60)
+        self.session.add(minute, tokens)
+        self.weekly.add(minute, tokens)
+
+    def totals(self, now: float) -> "Tuple[int, int]":
+        minute = int(now // 60)
+        return self.session.sum(minute), self.weekly.sum(minute)
+
+    def pack(self) -> bytes:
+        return _FILE_HEADER.pack(_MAGIC, _VERSION, 2) + self.session.pack() + self.weekly.pack()
+
+    @classmethod
+    def load(cls, path: str = WINDOWS_PATH) -> Optional["UsageWindows"]:
+        try:
+            with open(path, "rb") as handle:
+                data = memoryview(handle.read())
+            magic, version, count = _FILE_HEADER.unpack_from(data, 0)
+            if magic != _MAGIC or version != _VERSION or count != 2:
+                return None
+            windows = cls()
+            windows.session, offset = MinuteRing.unpack(data, _FILE_HEADER.size)
+            windows.weekly, _ = MinuteRing.unpack(data, offset)
+        except (OSError, ValueError, struct.error):
+            return None
+        if windows.session.size != SESSION_MINUTES or windows.weekly.size != WEEKLY_MINUTES:
+            return None
+        return windows
+
+    def save(self, path: str = WINDOWS_PATH) -> None:
+        write_bytes_atomic(path, self.pack())
+
+
+def update(projects_dir: str = PROJECTS_DIR) -> UsageWindows:
+    """Fold newly appended session-log events into the persisted windows."""
+    with file_lock(LOCK_NAME, LOCK_TIMEOUT_S):
+        windows = UsageWindows.load()
+        if windows is None:
+            # Without the rings the offsets are meaningless; rebuild from the start of every log.
+            import usage_backfill
+
+            windows, index = usage_backfill.rebuild_windows(projects_dir)
+        else:
+            index = OffsetIndex.load(WINDOWS_INDEX_PATH)
+        for event in tail(index, projects_dir):
+            windows.add(event.timestamp, counted_tokens(event))
+        windows.save()
+        index.save(WINDOWS_INDEX_PATH)
+    return windows
+
+
+def collect_usage(session_budget: Optional[float] = None, weekly_budget: Optional[float] = None) -> dict:
+    if session_budget is None:
+        session_budget = env_budget("CLAUDE_SESSION_TOKEN_BUDGET")
+    if weekly_budget is None:
+        weekly_budget = env_budget("CLAUDE_WEEKLY_TOKEN_BUDGET")
+    now = time.time()
+    session_total, weekly_total = update().totals(now)
+    return {
+        "sessionPercent": percent_of(session_total, session_budget),
+        "weeklyPercent": percent_of(weekly_total, weekly_budget),
+        "sessionResetAt": None,
+        "weeklyResetAt": None,
+        "updatedAt": datetime.fromtimestamp(now, tz=timezone.utc).isoformat(),
+        "source": "session-logs",
+        "tokens": {"session": session_total, "weekly": weekly_total},
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(collect_usage()))
@@ -0,0 +1,84 @@
+import XCTest
+
+final class BackfillParityTests: XCTestCase {
+    private static let harness = #"""
+    import json, os, sys, tempfile
+
+    sys.path.insert(0, sys.argv[1])
+    import usage_backfill
+    import usage_sessions
+
+
+    def write(root, relative, keys):
+        path = os.path.join(root, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as handle:
+            for number, key in enumerate(keys):
+                handle.write(json.dumps({
+                    "timestamp": f"2030-01-01T00:{number % 60:02d}:00Z",
+                    "requestId": key,
+                    "message": {"id": key, "model": "m", "usage": {"input_tokens": 1, "output_tokens": 2}},
+                }) + "\n")
+
+
+    def main():
+        root = tempfile.mkdtemp()
+        limit = usage_sessions.SEEN_KEYS_LIMIT
+        early = [f"k{n}" for n in range(10)]
+        flood = [f"n{n}" for n in range(limit + 50)]
+        write(root, "a/1.jsonl", early)
+        # Pushes every early key out of the bounded seen window; the last one repeats within the file.
+        write(root, "a/2.jsonl", flood + flood[-1:])
+        # Evicted early keys count again in a sequential tail, recent flood keys do not.
+        write(root, "b/3.jsonl", early[:5] + flood[-10:])
+
+        index = usage_sessions.OffsetIndex()
+        expected = {}
+        for event in usage_sessions.tail(index, root):
+            totals = expected.setdefault((int(event.timestamp // 60), event.model), [0, 0, 0, 0])
+            totals[0] += event.input_tokens
+            totals[1] += event.output_tokens
+        results = {}
+        for jobs in (1, 2):
+            result = usage_backfill.backfill(root, jobs)
+            results[jobs] = {
+                "minutes": result.minutes == expected,
+                "seen": list(result.index.seen) == list(index.seen),
+            }
+        print(json.dumps({"events": sum(totals[0] for totals in expected.values()), "results": results}))
+
+
+    if __name__ == "__main__":
+        main()
+    """#
+
+    func testBackfillMatchesSequentialTailPastSeenKeyLimit() throws {
+        let repoRoot = URL(fileURLWithPath: #filePath)
+            .deletingLastPathComponent()
+            .deletingLastPathComponent()
+            .deletingLastPathComponent()
+        let scripts = repoRoot.appendingPathComponent("Sources/ModelMeterApp/Resources/ModelMeterScripts")
+        let harness = FileManager.default.temporaryDirectory
+            .appendingPathComponent("backfill_parity_\(UUID().uuidString).py")
+        // A file rather than `-c`: the spawn pool re-imports the main module in its workers.
+        try Self.harness.write(to: harness, atomically: true, encoding: .utf8)
+        defer { try? FileManager.default.removeItem(at: harness) }
+
+        let process = Process()
+        process.executableURL = URL(fileURLWithPath: "/usr/bin/env")
+        process.arguments = ["python3", harness.path, scripts.path]
+        let output = Pipe()
+        process.standardOutput = output
+        try process.run()
+        process.waitUntilExit()
+
+        XCTAssertEqual(process.terminationStatus, 0)
+        let data = output.fileHandleForReading.readDataToEndOfFile()
+        let result = try XCTUnwrap(JSONSerialization.jsonObject(with: data) as? [String: Any])
+        XCTAssertEqual(result["events"] as? Int, 20065)
+        let runs = try XCTUnwrap(result["results"] as? [String: [String: Bool]])
+        for jobs in ["1", "2"] {
+            XCTAssertEqual(runs[jobs], ["minutes": true, "seen": true], "jobs=\(jobs)")
+        }
+    }
+}
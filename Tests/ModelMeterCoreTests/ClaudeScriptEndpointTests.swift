@@ -0,0 +1,113 @@
+import XCTest
+
+final class ClaudeScriptEndpointTests: XCTestCase {
+    private static let harness = #"""
+    import json, os, sys, tempfile, threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    os.environ["MODELMETER_STATE_DIR"] = tempfile.mkdtemp()
+    sys.path.insert(0, sys.argv[1])
+    import claude_usage
+
+    hits = {"bad": 0, "good": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            name = "bad" if self.path == "/bad-path" else "good"
+            hits[name] += 1
+            body = json.dumps({"five_hour": {"utilization": 12}, "seven_day": {"utilization": 34}}).encode()
+            self.send_response(404 if name == "bad" else 200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    claude_usage.USAGE_URLS = [f"{base}/bad-path", f"{base}/usage"]
+    payload = claude_usage.fetch_usage("token")
+    stats = claude_usage.EndpointStats.load().entries
+    print(json.dumps({
+        "session": payload["five_hour"]["utilization"],
+        "hits": hits,
+        "badFailures": stats[f"{base}/bad-path"]["failures"],
+        "order": claude_usage.EndpointStats.load().ordered(claude_usage.USAGE_URLS),
+    }))
+    """#
+
+    private static let hedgeHarness = #"""
+    import json, os, sys, tempfile, threading, time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    os.environ["MODELMETER_STATE_DIR"] = tempfile.mkdtemp()
+    sys.path.insert(0, sys.argv[1])
+    import claude_usage
+
+    hits = {"bad": 0, "slow": 0, "third": 0}
+
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            name = self.path.strip("/")
+            hits[name] += 1
+            if name == "slow":
+                time.sleep(0.5)
+            body = json.dumps({"five_hour": {"utilization": 12}, "seven_day": {"utilization": 34}}).encode()
+            self.send_response(404 if name == "bad" else 200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    claude_usage.USAGE_URLS = [f"{base}/bad", f"{base}/slow", f"{base}/third"]
+    # The first endpoint is quick but about to fail; the second is known to take about a second.
+    claude_usage.write_json_atomic(claude_usage.ENDPOINT_STATS_PATH, {
+        f"{base}/bad": {"latencyMs": 50.0, "failures": 0},
+        f"{base}/slow": {"latencyMs": 1000.0, "failures": 0},
+    })
+    payload = claude_usage.fetch_usage("token")
+    print(json.dumps({"session": payload["five_hour"]["utilization"], "hits": hits}))
+    """#
+
+    private func run(_ harness: String) throws -> [String: Any] {
+        let repoRoot = URL(fileURLWithPath: #filePath)
+            .deletingLastPathComponent()
+            .deletingLastPathComponent()
+            .deletingLastPathComponent()
+
+        let process = Process()
+        process.executableURL = URL(fileURLWithPath: "/usr/bin/env")
+        process.arguments = ["python3", "-c", harness, repoRoot.appendingPathComponent("scripts").path]
+        let output = Pipe()
+        process.standardOutput = output
+        try process.run()
+        process.waitUntilExit()
+
+        XCTAssertEqual(process.terminationStatus, 0)
+        let data = output.fileHandleForReading.readDataToEndOfFile()
+        return try XCTUnwrap(JSONSerialization.jsonObject(with: data) as? [String: Any])
+    }
+
+    func testFallsBackWhenFirstEndpointFailsFast() throws {
+        let result = try run(Self.harness)
+        XCTAssertEqual(result["session"] as? Int, 12)
+        XCTAssertEqual(result["hits"] as? [String: Int], ["bad": 1, "good": 1])
+        XCTAssertEqual(result["badFailures"] as? Int, 1)
+        XCTAssertEqual((result["order"] as? [String])?.last?.hasSuffix("/bad-path"), true)
+    }
+
+    func testHedgeWaitsOnTheLatencyOfTheEndpointLaunchedLast() throws {
+        let result = try run(Self.hedgeHarness)
+        XCTAssertEqual(result["session"] as? Int, 12)
+        XCTAssertEqual(result["hits"] as? [String: Int], ["bad": 1, "slow": 1, "third": 0])
+    }
+}
@@ -0,0 +1,161 @@
+import XCTest
+
+final class UsageBreakerScriptTests: XCTestCase {
+    private static let harness = #"""
+    import json, os, sys, tempfile, time
+
+    os.environ["MODELMETER_STATE_DIR"] = tempfile.mkdtemp()
+    sys.path.insert(0, sys.argv[1])
+    import usage_breaker
+
+    url = "https://api.example.test/usage"
+    other = "https://other.example.test/usage"
+
+    def breaker():
+        return json.load(open(usage_breaker.BREAKERS_PATH)).get(usage_breaker.endpoint_key(url))
+
+    def retry_after(target=url):
+        """Seconds the breaker turns `target` away for, or 0 when this run may send."""
+        try:
+            usage_breaker.check(target)
+        except usage_breaker.EndpointUnavailable as exc:
+            return exc.retry_after
+        return 0
+
+    def expire():
+        breakers = json.load(open(usage_breaker.BREAKERS_PATH))
+        breakers[usage_breaker.endpoint_key(url)]["retryAt"] = time.time() - 1
+        json.dump(breakers, open(usage_breaker.BREAKERS_PATH, "w"))
+
+    result = {}
+    usage_breaker.observe(url, 503)
+    result["oneFailure"] = [breaker()["state"], retry_after() == 0]
+    usage_breaker.observe(url, 0)
+    opened = breaker()
+    result["opened"] = [opened["state"], opened["opens"], 27 <= retry_after() <= 33, retry_after(other) == 0]
+    expire()
+    probing = retry_after() == 0
+    result["probe"] = [probing, breaker()["state"], 25 <= retry_after() <= 30]
+    usage_breaker.observe(url, 0)
+    reopened = breaker()
+    result["reopened"] = [reopened["state"], reopened["opens"], 54 <= retry_after() <= 66]
+    expire()
+    retry_after()
+    usage_breaker.observe(url, 401)
+    result["closed"] = [breaker() is None, retry_after() == 0]
+    with open(usage_breaker.BREAKERS_PATH, "w") as handle:
+        handle.write("{not json")
+    result["corrupt"] = retry_after() == 0
+    json.dump({usage_breaker.endpoint_key(url): {"state": "melted", "retryAt": time.time() + 60}},
+              open(usage_breaker.BREAKERS_PATH, "w"))
+    result["badEntry"] = retry_after() == 0
+    print(json.dumps(result))
+    """#
+
+    private static let staleHarness = #"""
+    import json, os, subprocess, sys, tempfile, threading, time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    os.environ["MODELMETER_STATE_DIR"] = tempfile.mkdtemp()
+    sys.path.insert(0, sys.argv[1])
+    import usage_breaker
+
+    # With the circuit open, a poll answers from the last good payload without sending anything.
+    hits = [0]
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            hits[0] += 1
+            body = json.dumps({"five_hour": {"utilization": 12}, "seven_day": {"utilization": 34}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    usage_url = f"http://127.0.0.1:{server.server_port}/usage"
+    home = tempfile.mkdtemp()
+    os.makedirs(os.path.join(home, ".claude"))
+    with open(os.path.join(home, ".claude", ".credentials.json"), "w") as handle:
+        oauth = {"accessToken": "a", "refreshToken": "r", "expiresAt": int(time.time() * 1000) + 86400000}
+        json.dump({"claudeAiOauth": oauth}, handle)
+    env = dict(os.environ, HOME=home, CLAUDE_USAGE_URL=usage_url, MODELMETER_CACHE_TTL="0")
+    env.pop("CLAUDE_CONFIG_DIR", None)
+
+    def poll():
+        run = subprocess.run([sys.executable, os.path.join(sys.argv[1], "claude_usage.py")],
+                             env=env, capture_output=True, text=True, timeout=60)
+        return json.loads(run.stdout) if run.returncode == 0 else run.stderr
+
+    fresh = poll()
+    usage_breaker.record_failure(usage_url)
+    usage_breaker.record_failure(usage_url)
+    stale = poll()
+    print(json.dumps({
+        "fresh": [fresh["sessionPercent"], fresh.get("stale")],
+        "stale": [stale["sessionPercent"], stale.get("stale"), stale.get("retryAfter", 0) > 20],
+        "hits": hits[0],
+    }))
+    """#
+
+    private func run(_ harness: String) throws -> [String: Any] {
+        let repoRoot = URL(fileURLWithPath: #filePath)
+            .deletingLastPathComponent()
+            .deletingLastPathComponent()
+            .deletingLastPathComponent()
+        let scripts = repoRoot.appendingPathComponent("Sources/ModelMeterApp/Resources/ModelMeterScripts")
+
+        let process = Process()
+        process.executableURL = URL(fileURLWithPath: "/usr/bin/env")
+        process.arguments = ["python3", "-c", harness, scripts.path]
+        let output = Pipe()
+        process.standardOutput = output
+        try process.run()
+        let data = output.fileHandleForReading.readDataToEndOfFile()
+        process.waitUntilExit()
+
+        XCTAssertEqual(process.terminationStatus, 0)
+        return try XCTUnwrap(JSONSerialization.jsonObject(with: data) as? [String: Any])
+    }
+
+    func testBreakerOpensProbesAndCloses() throws {
+        let result = try run(Self.harness)
+        let oneFailure = try XCTUnwrap(result["oneFailure"] as? [Any])
+        XCTAssertEqual(oneFailure[0] as? String, "closed")
+        XCTAssertEqual(oneFailure[1] as? Bool, true)
+
+        let opened = try XCTUnwrap(result["opened"] as? [Any])
+        XCTAssertEqual(opened[0] as? String, "open")
+        XCTAssertEqual(opened[1] as? Int, 1)
+        XCTAssertEqual(opened[2] as? Bool, true)
+        XCTAssertEqual(opened[3] as? Bool, true, "other hosts keep their own breaker")
+
+        // Once the backoff passes exactly one run probes; the next one is still turned away.
+        let probe = try XCTUnwrap(result["probe"] as? [Any])
+        XCTAssertEqual(probe[0] as? Bool, true)
+        XCTAssertEqual(probe[1] as? String, "half-open")
+        XCTAssertEqual(probe[2] as? Bool, true)
+
+        let reopened = try XCTUnwrap(result["reopened"] as? [Any])
+        XCTAssertEqual(reopened[0] as? String, "open")
+        XCTAssertEqual(reopened[1] as? Int, 2)
+        XCTAssertEqual(reopened[2] as? Bool, true)
+
+        XCTAssertEqual(result["closed"] as? [Bool], [true, true])
+        XCTAssertEqual(result["corrupt"] as? Bool, true)
+        XCTAssertEqual(result["badEntry"] as? Bool, true)
+    }
+
+    func testOpenCircuitAnswersFromLastGoodPayloadWithoutRequest() throws {
+        let result = try run(Self.staleHarness)
+        let stale = try XCTUnwrap(result["stale"] as? [Any])
+        XCTAssertEqual(stale[0] as? Double, 12)
+        XCTAssertEqual(stale[1] as? Bool, true)
+        XCTAssertEqual(stale[2] as? Bool, true)
+        XCTAssertEqual(result["hits"] as? Int, 1)
+    }
+}
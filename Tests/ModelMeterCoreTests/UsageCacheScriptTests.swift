@@ -0,0 +1,133 @@
+import XCTest
+
+final class UsageCacheScriptTests: XCTestCase {
+    private static let harness = #"""
+    import json, os, subprocess, sys, tempfile, threading, time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    scripts = sys.argv[1]
+    home = tempfile.mkdtemp()
+    state = tempfile.mkdtemp()
+    os.makedirs(os.path.join(home, ".claude"))
+    credentials = os.path.join(home, ".claude", ".credentials.json")
+    far = int(time.time() * 1000) + 86400000
+    with open(credentials, "w") as handle:
+        json.dump({"claudeAiOauth": {"accessToken": "a1", "refreshToken": "r", "expiresAt": far}}, handle)
+    hits = {"usage": 0, "token": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def reply(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            hits["usage"] += 1
+            if self.headers.get("Authorization") != "Bearer a2":
+                self.reply(401, {"error": "expired"})
+                return
+            self.reply(200, {"five_hour": {"utilization": 12}, "seven_day": {"utilization": 34}})
+
+        def do_POST(self):
+            hits["token"] += 1
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self.reply(200, {"access_token": "a2", "refresh_token": "r2", "expires_in": 3600})
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    env = dict(os.environ, HOME=home, MODELMETER_STATE_DIR=state, CLAUDE_USAGE_URL=f"{base}/usage",
+               CLAUDE_TOKEN_URL=f"{base}/token", MODELMETER_CACHE_TTL="30", MODELMETER_CACHE_MAX_STALE="60")
+    env.pop("CLAUDE_CONFIG_DIR", None)
+
+    def run(**extra):
+        result = subprocess.run([sys.executable, os.path.join(scripts, "claude_usage.py")],
+                                env=dict(env, **extra), capture_output=True, text=True, timeout=60)
+        return result.returncode, json.loads(result.stdout) if result.returncode == 0 else result.stderr
+
+    def wait_for(predicate):
+        for _ in range(100):
+            if predicate():
+                return True
+            time.sleep(0.05)
+        return False
+
+    code, first = run()
+    refreshed = json.load(open(credentials))["claudeAiOauth"]["refreshToken"]
+    after_first = dict(hits)
+    code_cached, _ = run()
+    after_cached = dict(hits)
+
+    # Age the entry past the TTL: the stale value is served at once and revalidated in the background.
+    entry_path = next(os.path.join(state, "cache", name) for name in os.listdir(os.path.join(state, "cache"))
+                      if name.startswith("claude-") and name.endswith(".json"))
+    entry = json.load(open(entry_path))
+    entry["fetchedAt"] -= 45
+    json.dump(entry, open(entry_path, "w"))
+    code_stale, stale = run()
+    revalidated = wait_for(lambda: hits["usage"] > after_cached["usage"]
+                           and json.load(open(entry_path))["fetchedAt"] > entry["fetchedAt"] + 30)
+
+    # Offline with the cache bypassed: the last good payload still has to be found after the refresh.
+    server.shutdown()
+    server.server_close()
+    code_offline, offline = run(MODELMETER_CACHE_TTL="0")
+    print(json.dumps({
+        "first": [code, first["sessionPercent"], after_first],
+        "refreshToken": refreshed,
+        "cached": [code_cached, after_cached == after_first],
+        "stale": [code_stale, stale["sessionPercent"], revalidated],
+        "offline": [code_offline, offline if code_offline else [offline["sessionPercent"], offline.get("stale")]],
+    }))
+    """#
+
+    private func run(_ harness: String) throws -> [String: Any] {
+        let repoRoot = URL(fileURLWithPath: #filePath)
+            .deletingLastPathComponent()
+            .deletingLastPathComponent()
+            .deletingLastPathComponent()
+        let scripts = repoRoot.appendingPathComponent("Sources/ModelMeterApp/Resources/ModelMeterScripts")
+
+        let process = Process()
+        process.executableURL = URL(fileURLWithPath: "/usr/bin/env")
+        process.arguments = ["python3", "-c", harness, scripts.path]
+        let output = Pipe()
+        process.standardOutput = output
+        try process.run()
+        let data = output.fileHandleForReading.readDataToEndOfFile()
+        process.waitUntilExit()
+
+        XCTAssertEqual(process.terminationStatus, 0)
+        return try XCTUnwrap(JSONSerialization.jsonObject(with: data) as? [String: Any])
+    }
+
+    func testRefreshKeepsTheCacheKeyAndServesStaleWhileRevalidating() throws {
+        let result = try run(Self.harness)
+        let first = try XCTUnwrap(result["first"] as? [Any])
+        XCTAssertEqual(first[0] as? Int, 0)
+        XCTAssertEqual(first[1] as? Double, 12)
+        XCTAssertEqual(first[2] as? [String: Int], ["usage": 2, "token": 1])
+        XCTAssertEqual(result["refreshToken"] as? String, "r2")
+
+        // Keyed by credential source rather than token, so the entry written after the refresh is found again.
+        let cached = try XCTUnwrap(result["cached"] as? [Any])
+        XCTAssertEqual(cached[0] as? Int, 0)
+        XCTAssertEqual(cached[1] as? Bool, true)
+
+        let stale = try XCTUnwrap(result["stale"] as? [Any])
+        XCTAssertEqual(stale[0] as? Int, 0)
+        XCTAssertEqual(stale[1] as? Double, 12)
+        XCTAssertEqual(stale[2] as? Bool, true)
+
+        let offline = try XCTUnwrap(result["offline"] as? [Any])
+        XCTAssertEqual(offline[0] as? Int, 0)
+        let lastGood = try XCTUnwrap(offline[1] as? [Any])
+        XCTAssertEqual(lastGood[0] as? Double, 12)
+        XCTAssertEqual(lastGood[1] as? Bool, true)
+    }
+}
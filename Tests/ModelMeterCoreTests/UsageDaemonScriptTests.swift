@@ -0,0 +1,138 @@
+import XCTest
+
+final class UsageDaemonScriptTests: XCTestCase {
+    private static let harness = #"""
+    import json, os, subprocess, sys, tempfile, threading, time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    scripts = sys.argv[1]
+    home = tempfile.mkdtemp()
+    os.makedirs(os.path.join(home, ".claude"))
+    with open(os.path.join(home, ".claude", ".credentials.json"), "w") as handle:
+        oauth = {"accessToken": "a", "refreshToken": "r", "expiresAt": int(time.time() * 1000) + 86400000}
+        json.dump({"claudeAiOauth": oauth}, handle)
+    hits = [0]
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            hits[0] += 1
+            body = json.dumps({"five_hour": {"utilization": 12}, "seven_day": {"utilization": 34}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    env = dict(os.environ, HOME=home, MODELMETER_STATE_DIR=tempfile.mkdtemp(),
+               CLAUDE_USAGE_URL=f"http://127.0.0.1:{server.server_port}/usage")
+    env.pop("CLAUDE_CONFIG_DIR", None)
+
+    def start(home_dir):
+        return subprocess.Popen([sys.executable, os.path.join(scripts, "claude_usage.py"), "--serve"],
+                                env=dict(env, HOME=home_dir), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True)
+
+    def ask(daemon, line):
+        daemon.stdin.write(line + "\n")
+        daemon.stdin.flush()
+        return json.loads(daemon.stdout.readline())
+
+    daemon = start(home)
+    first = ask(daemon, '{"id": 1}')
+    second = ask(daemon, '{"id": 2, "method": "refresh"}')
+    ping = ask(daemon, '{"id": "p", "method": "ping"}')
+    daemon.stdin.write("\n")
+    invalid = ask(daemon, "not json")
+    not_object = ask(daemon, "[1, 2]")
+    unknown = ask(daemon, '{"id": 3, "method": "nope"}')
+    bye = ask(daemon, '{"id": 4, "method": "shutdown"}')
+    daemon.stdin.write('{"id": 5, "method": "ping"}\n')
+    daemon.stdin.close()
+    after_shutdown = daemon.stdout.read()
+    shutdown_code = daemon.wait(timeout=30)
+
+    # A failing refresh is an error response, not the end of the loop; EOF then exits cleanly.
+    daemon = start(tempfile.mkdtemp())
+    failed = ask(daemon, '{"id": 6}')
+    still_alive = ask(daemon, '{"id": 7, "method": "ping"}')
+    daemon.stdin.close()
+    eof_code = daemon.wait(timeout=30)
+    server.shutdown()
+    print(json.dumps({
+        "refresh": [first["id"], first["result"]["sessionPercent"], second["id"], second["result"]["sessionPercent"]],
+        "hits": hits[0],
+        "ping": ping,
+        "invalid": [invalid["id"], invalid["error"].startswith("Invalid request:")],
+        "notObject": not_object,
+        "unknown": unknown,
+        "shutdown": [bye, after_shutdown, shutdown_code],
+        "failed": [failed["id"], "result" in failed, bool(failed.get("error"))],
+        "afterFailure": [still_alive, eof_code],
+    }))
+    """#
+
+    private func run(_ harness: String) throws -> [String: Any] {
+        let repoRoot = URL(fileURLWithPath: #filePath)
+            .deletingLastPathComponent()
+            .deletingLastPathComponent()
+            .deletingLastPathComponent()
+        let scripts = repoRoot.appendingPathComponent("Sources/ModelMeterApp/Resources/ModelMeterScripts")
+
+        let process = Process()
+        process.executableURL = URL(fileURLWithPath: "/usr/bin/env")
+        process.arguments = ["python3", "-c", harness, scripts.path]
+        let output = Pipe()
+        process.standardOutput = output
+        try process.run()
+        let data = output.fileHandleForReading.readDataToEndOfFile()
+        process.waitUntilExit()
+
+        XCTAssertEqual(process.terminationStatus, 0)
+        return try XCTUnwrap(JSONSerialization.jsonObject(with: data) as? [String: Any])
+    }
+
+    func testServeAnswersJSONLinesRequests() throws {
+        let result = try run(Self.harness)
+        let refresh = try XCTUnwrap(result["refresh"] as? [Any])
+        XCTAssertEqual(refresh[0] as? Int, 1)
+        XCTAssertEqual(refresh[1] as? Double, 12)
+        XCTAssertEqual(refresh[2] as? Int, 2)
+        XCTAssertEqual(refresh[3] as? Double, 12)
+        XCTAssertEqual(result["hits"] as? Int, 1, "the second refresh is answered from the cache")
+        XCTAssertEqual(result["ping"] as? [String: String], ["id": "p", "result": "pong"])
+
+        let invalid = try XCTUnwrap(result["invalid"] as? [Any])
+        XCTAssertTrue(invalid[0] is NSNull)
+        XCTAssertEqual(invalid[1] as? Bool, true)
+        let notObject = try XCTUnwrap(result["notObject"] as? [String: Any])
+        XCTAssertTrue(notObject["id"] is NSNull)
+        XCTAssertEqual(notObject["error"] as? String, "Invalid request: expected a JSON object.")
+        let unknown = try XCTUnwrap(result["unknown"] as? [String: Any])
+        XCTAssertEqual(unknown["id"] as? Int, 3)
+        XCTAssertEqual(unknown["error"] as? String, "Unknown method: nope")
+
+        // Nothing is answered after shutdown.
+        let shutdown = try XCTUnwrap(result["shutdown"] as? [Any])
+        let bye = try XCTUnwrap(shutdown[0] as? [String: Any])
+        XCTAssertEqual(bye["id"] as? Int, 4)
+        XCTAssertEqual(bye["result"] as? String, "bye")
+        XCTAssertEqual(shutdown[1] as? String, "")
+        XCTAssertEqual(shutdown[2] as? Int, 0)
+
+        // A failed refresh is an error response; the loop keeps serving until EOF.
+        let failed = try XCTUnwrap(result["failed"] as? [Any])
+        XCTAssertEqual(failed[0] as? Int, 6)
+        XCTAssertEqual(failed[1] as? Bool, false)
+        XCTAssertEqual(failed[2] as? Bool, true)
+
+        let afterFailure = try XCTUnwrap(result["afterFailure"] as? [Any])
+        let pong = try XCTUnwrap(afterFailure[0] as? [String: Any])
+        XCTAssertEqual(pong["id"] as? Int, 7)
+        XCTAssertEqual(pong["result"] as? String, "pong")
+        XCTAssertEqual(afterFailure[1] as? Int, 0)
+    }
+}
@@ -0,0 +1,198 @@
+import XCTest
+
+final class UsageRetryScriptTests: XCTestCase {
+    private static let harness = #"""
+    import json, os, sys, tempfile, time
+    from email.utils import formatdate
+
+    os.environ["MODELMETER_STATE_DIR"] = tempfile.mkdtemp()
+    sys.path.insert(0, sys.argv[1])
+    import usage_retry
+
+    def near(value, expected, slack=2.0):
+        return value is not None and abs(value - expected) <= slack
+
+    now = time.time()
+    parsed = {
+        "seconds": usage_retry.parse_duration("120") == 120,
+        "fraction": usage_retry.parse_duration("1.5") == 1.5,
+        "epoch": near(usage_retry.parse_duration(str(int(now) + 90)), 90),
+        "go": usage_retry.parse_duration("1m30s") == 90,
+        "millis": usage_retry.parse_duration("500ms") == 0.5,
+        "httpDate": near(usage_retry.parse_duration(formatdate(now + 60, usegmt=True)), 60),
+        "iso": near(usage_retry.parse_duration(time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now + 30))), 30),
+        "garbage": usage_retry.parse_duration("soon") is None and usage_retry.parse_duration("") is None,
+    }
+    delays = {
+        "retryAfterFirst": usage_retry.server_delay({"retry-after": "7", "x-ratelimit-reset": "60"}) == 7,
+        "resetFallback": usage_retry.server_delay({"anthropic-ratelimit-requests-reset": "2m"}) == 120,
+        "pastIsZero": usage_retry.server_delay({"retry-after": formatdate(now - 60, usegmt=True)}) == 0,
+        "none": usage_retry.server_delay({}) is None,
+        "hinted": all(10 <= usage_retry.retry_delay({"retry-after": "10"}, 0) <= 11.1 for _ in range(50)),
+        "backoff": all(2 <= usage_retry.retry_delay({}, 2) <= 4 for _ in range(50)),
+        "capped": all(usage_retry.retry_delay({}, 20) <= usage_retry.BACKOFF_CAP_S for _ in range(50)),
+    }
+    deadline = usage_retry.Deadline(5)
+    budget = [deadline.allows_sleep(3), deadline.allows_sleep(4.5), deadline.cap(60) <= 5]
+    try:
+        usage_retry.Deadline(0.5).timeout(10)
+        budget.append(False)
+    except usage_retry.DeadlineExceeded:
+        budget.append(True)
+
+    usage_retry.note_rate_limit("claude", "account", 120)
+    noted = usage_retry.rate_limited_for("claude", "account")
+    other = usage_retry.rate_limited_for("claude", "someone-else")
+    usage_retry.clear_rate_limit("claude", "account")
+    cleared = usage_retry.rate_limited_for("claude", "account")
+    marked = usage_retry.mark_rate_limited({"sessionPercent": 12}, 42.04)
+    print(json.dumps({
+        "parsed": parsed,
+        "delays": delays,
+        "budget": budget,
+        "marker": [118 <= noted <= 120, other, cleared],
+        "marked": [marked["rateLimited"], marked["retryAfter"], marked["sessionPercent"]],
+    }))
+    """#
+
+    private static let endToEndHarness = #"""
+    import json, os, subprocess, sys, tempfile, threading, time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    scripts = sys.argv[1]
+    home = tempfile.mkdtemp()
+    state = tempfile.mkdtemp()
+    os.makedirs(os.path.join(home, ".claude"))
+    with open(os.path.join(home, ".claude", ".credentials.json"), "w") as handle:
+        oauth = {"accessToken": "a", "refreshToken": "r", "expiresAt": int(time.time() * 1000) + 86400000}
+        json.dump({"claudeAiOauth": oauth}, handle)
+    hits = [0]
+    answers = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            hits[0] += 1
+            status, retry_after = answers.pop(0) if answers else (200, None)
+            body = json.dumps({"five_hour": {"utilization": 12}, "seven_day": {"utilization": 34}}).encode()
+            self.send_response(status)
+            if retry_after is not None:
+                self.send_header("Retry-After", retry_after)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    env = dict(os.environ, HOME=home, MODELMETER_STATE_DIR=state, MODELMETER_CACHE_TTL="0",
+               CLAUDE_USAGE_URL=f"http://127.0.0.1:{server.server_port}/usage")
+    env.pop("CLAUDE_CONFIG_DIR", None)
+
+    def poll():
+        started = time.monotonic()
+        run = subprocess.run([sys.executable, os.path.join(scripts, "claude_usage.py")],
+                             env=env, capture_output=True, text=True, timeout=60)
+        payload = json.loads(run.stdout) if run.returncode == 0 else {}
+        return run.returncode, payload, time.monotonic() - started
+
+    def markers():
+        return [name for name in os.listdir(os.path.join(state, "cache")) if name.endswith(".ratelimit")]
+
+    result = {}
+    # A short Retry-After is waited out inside the poll.
+    answers.append((429, "1"))
+    code, payload, took = poll()
+    result["shortWait"] = [code, payload.get("rateLimited", False), hits[0], took >= 1, markers()]
+
+    # A long one does not fit the deadline: the last good payload comes back marked and the limit is remembered.
+    answers.append((429, "120"))
+    code, payload, took = poll()
+    result["longWait"] = [code, payload.get("rateLimited"), 115 <= payload.get("retryAfter", 0) <= 122, hits[0],
+                          took < 10, len(markers())]
+
+    # Overlapping polls honour the marker instead of sending their own request.
+    code, payload, _ = poll()
+    result["remembered"] = [code, payload.get("rateLimited"), hits[0]]
+
+    # Once the limit has passed the next success clears it.
+    marker = os.path.join(state, "cache", markers()[0])
+    with open(marker, "w") as handle:
+        json.dump({"until": time.time() - 1}, handle)
+    code, payload, _ = poll()
+    result["recovered"] = [code, payload.get("rateLimited", False), hits[0], markers()]
+    print(json.dumps(result))
+    """#
+
+    private func run(_ harness: String) throws -> [String: Any] {
+        let repoRoot = URL(fileURLWithPath: #filePath)
+            .deletingLastPathComponent()
+            .deletingLastPathComponent()
+            .deletingLastPathComponent()
+        let scripts = repoRoot.appendingPathComponent("Sources/ModelMeterApp/Resources/ModelMeterScripts")
+
+        let process = Process()
+        process.executableURL = URL(fileURLWithPath: "/usr/bin/env")
+        process.arguments = ["python3", "-c", harness, scripts.path]
+        let output = Pipe()
+        process.standardOutput = output
+        try process.run()
+        let data = output.fileHandleForReading.readDataToEndOfFile()
+        process.waitUntilExit()
+
+        XCTAssertEqual(process.terminationStatus, 0)
+        return try XCTUnwrap(JSONSerialization.jsonObject(with: data) as? [String: Any])
+    }
+
+    func testParsesRateLimitHintsAndRecordsTheMarker() throws {
+        let result = try run(Self.harness)
+        for key in ["parsed", "delays"] {
+            let checks = try XCTUnwrap(result[key] as? [String: Bool])
+            XCTAssertFalse(checks.isEmpty)
+            for (name, passed) in checks {
+                XCTAssertTrue(passed, "\(key).\(name)")
+            }
+        }
+        XCTAssertEqual(result["budget"] as? [Bool], [true, false, true, true])
+
+        let marker = try XCTUnwrap(result["marker"] as? [Any])
+        XCTAssertEqual(marker[0] as? Bool, true)
+        XCTAssertEqual(marker[1] as? Double, 0)
+        XCTAssertEqual(marker[2] as? Double, 0)
+
+        let marked = try XCTUnwrap(result["marked"] as? [Any])
+        XCTAssertEqual(marked[0] as? Bool, true)
+        XCTAssertEqual(marked[1] as? Double, 42)
+        XCTAssertEqual(marked[2] as? Int, 12)
+    }
+
+    func testRateLimitedPollsFallBackToTheCacheUntilTheLimitPasses() throws {
+        let result = try run(Self.endToEndHarness)
+        let shortWait = try XCTUnwrap(result["shortWait"] as? [Any])
+        XCTAssertEqual(shortWait[0] as? Int, 0)
+        XCTAssertEqual(shortWait[1] as? Bool, false)
+        XCTAssertEqual(shortWait[2] as? Int, 2)
+        XCTAssertEqual(shortWait[3] as? Bool, true)
+        XCTAssertEqual((shortWait[4] as? [String])?.isEmpty, true)
+
+        let longWait = try XCTUnwrap(result["longWait"] as? [Any])
+        XCTAssertEqual(longWait[0] as? Int, 0)
+        XCTAssertEqual(longWait[1] as? Bool, true)
+        XCTAssertEqual(longWait[2] as? Bool, true)
+        XCTAssertEqual(longWait[3] as? Int, 3)
+        XCTAssertEqual(longWait[4] as? Bool, true, "a Retry-After beyond the deadline must not be slept on")
+        XCTAssertEqual(longWait[5] as? Int, 1)
+
+        let remembered = try XCTUnwrap(result["remembered"] as? [Any])
+        XCTAssertEqual(remembered[0] as? Int, 0)
+        XCTAssertEqual(remembered[1] as? Bool, true)
+        XCTAssertEqual(remembered[2] as? Int, 3, "no request while the marker is active")
+
+        let recovered = try XCTUnwrap(result["recovered"] as? [Any])
+        XCTAssertEqual(recovered[0] as? Int, 0)
+        XCTAssertEqual(recovered[1] as? Bool, false)
+        XCTAssertEqual(recovered[2] as? Int, 4)
+        XCTAssertEqual((recovered[3] as? [String])?.isEmpty, true)
+    }
+}
@@ -0,0 +1,157 @@
+import XCTest
+
+final class UsageSocketScriptTests: XCTestCase {
+    private static let harness = #"""
+    import json, os, socket, subprocess, sys, tempfile, time
+
+    scripts = sys.argv[1]
+    # Short directory: Unix socket paths are limited to ~104 bytes.
+    state = tempfile.mkdtemp(prefix="mm", dir="/tmp")
+    control = os.path.join(state, "control")
+    with open(control, "w") as handle:
+        handle.write("12")
+    env = dict(os.environ, MODELMETER_STATE_DIR=state, MODELMETER_SOCKET_MAX_STALE="1.5", HOME=tempfile.mkdtemp())
+    env.pop("CLAUDE_CONFIG_DIR", None)
+    server_code = """
+    import sys
+    sys.path.insert(0, sys.argv[1])
+    import usage_socket, usage_state
+
+    def refresh():
+        with open(sys.argv[2]) as handle:
+            value = handle.read()
+        if value == "fail":
+            raise RuntimeError("upstream down")
+        return {"sessionPercent": float(value), "nextPollAfter": 0.2}
+
+    raise SystemExit(usage_socket.serve(refresh, (RuntimeError,), usage_state.socket_path("claude")))
+    """
+
+    def start():
+        return subprocess.Popen([sys.executable, "-c", server_code, scripts, control], env=env,
+                                stderr=subprocess.PIPE, text=True)
+
+    server = start()
+    path = os.path.join(state, "run", "claude.sock")
+    for _ in range(200):
+        if os.path.exists(path):
+            break
+        time.sleep(0.05)
+    sys.path.insert(0, scripts)
+    os.environ["MODELMETER_STATE_DIR"] = state
+    import usage_socket
+
+    def conversation(*lines):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(10)
+            sock.connect(path)
+            sock.sendall("".join(line + "\n" for line in lines).encode())
+            with sock.makefile("rb") as stream:
+                return [json.loads(stream.readline()) for line in lines if line.strip()]
+
+    result = {"mode": oct(os.stat(path).st_mode & 0o777)}
+    result["get"] = usage_socket.get_snapshot(path)
+    result["session"] = conversation(
+        '{"id": 1, "method": "ping"}', "", "not json", "[1]", '{"id": 2, "method": "nope"}', '{"id": 3}'
+    )
+    # A plain invocation of the provider script is answered by the running server.
+    plain = subprocess.run([sys.executable, os.path.join(scripts, "claude_usage.py")], env=env,
+                           capture_output=True, text=True, timeout=30)
+    result["plain"] = [plain.returncode, json.loads(plain.stdout) if plain.returncode == 0 else plain.stderr]
+    second = subprocess.run([sys.executable, "-c", server_code, scripts, control], env=env,
+                            capture_output=True, text=True, timeout=30)
+    result["second"] = [second.returncode, "already listening" in second.stderr]
+
+    # Subscribers get the current snapshot, then one update per refresh; a failed refresh marks the last good one stale.
+    subscriber = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    subscriber.settimeout(10)
+    subscriber.connect(path)
+    subscriber.sendall(b'{"id": 9, "method": "subscribe"}\n')
+    stream = subscriber.makefile("rb")
+    initial = json.loads(stream.readline())
+    with open(control, "w") as handle:
+        handle.write("34")
+    update = json.loads(stream.readline())
+    while update.get("result", {}).get("sessionPercent") != 34:
+        update = json.loads(stream.readline())
+    with open(control, "w") as handle:
+        handle.write("fail")
+    failed = json.loads(stream.readline())
+    while not failed.get("result", {}).get("stale"):
+        failed = json.loads(stream.readline())
+    stream.close()
+    subscriber.close()
+    result["subscribe"] = {"initial": initial, "update": update, "failed": failed}
+    result["stale"] = usage_socket.get_snapshot(path)
+    time.sleep(1.6)
+    result["expired"] = usage_socket.request(path)
+
+    server.terminate()
+    result["stopped"] = [server.wait(timeout=30), os.path.exists(path)]
+    print(json.dumps(result))
+    """#
+
+    private func run(_ harness: String) throws -> [String: Any] {
+        let repoRoot = URL(fileURLWithPath: #filePath)
+            .deletingLastPathComponent()
+            .deletingLastPathComponent()
+            .deletingLastPathComponent()
+        let scripts = repoRoot.appendingPathComponent("Sources/ModelMeterApp/Resources/ModelMeterScripts")
+
+        let process = Process()
+        process.executableURL = URL(fileURLWithPath: "/usr/bin/env")
+        process.arguments = ["python3", "-c", harness, scripts.path]
+        let output = Pipe()
+        process.standardOutput = output
+        try process.run()
+        let data = output.fileHandleForReading.readDataToEndOfFile()
+        process.waitUntilExit()
+
+        XCTAssertEqual(process.terminationStatus, 0)
+        return try XCTUnwrap(JSONSerialization.jsonObject(with: data) as? [String: Any])
+    }
+
+    func testServesSnapshotsAndMarksThemStaleAfterAFailedRefresh() throws {
+        let result = try run(Self.harness)
+        XCTAssertEqual(result["mode"] as? String, "0o600")
+        XCTAssertEqual((result["get"] as? [String: Any])?["sessionPercent"] as? Double, 12)
+
+        let session = try XCTUnwrap(result["session"] as? [[String: Any]])
+        XCTAssertEqual(session.count, 5, "blank lines are skipped, every other line is answered")
+        XCTAssertEqual(session[0]["result"] as? String, "pong")
+        XCTAssertTrue(session[1]["id"] is NSNull)
+        XCTAssertEqual((session[1]["error"] as? String)?.hasPrefix("Invalid request:"), true)
+        XCTAssertEqual(session[2]["error"] as? String, "Invalid request: expected a JSON object.")
+        XCTAssertEqual(session[3]["error"] as? String, "Unknown method: nope")
+        XCTAssertEqual((session[4]["result"] as? [String: Any])?["sessionPercent"] as? Double, 12, "get is the default")
+
+        let plain = try XCTUnwrap(result["plain"] as? [Any])
+        XCTAssertEqual(plain[0] as? Int, 0)
+        XCTAssertEqual((plain[1] as? [String: Any])?["sessionPercent"] as? Double, 12)
+        let second = try XCTUnwrap(result["second"] as? [Any])
+        XCTAssertEqual(second[0] as? Int, 1)
+        XCTAssertEqual(second[1] as? Bool, true, "a second server refuses a live socket")
+
+        let subscribe = try XCTUnwrap(result["subscribe"] as? [String: [String: Any]])
+        XCTAssertNil(subscribe["initial"]?["event"])
+        XCTAssertEqual((subscribe["initial"]?["result"] as? [String: Any])?["sessionPercent"] as? Double, 12)
+        XCTAssertEqual(subscribe["update"]?["event"] as? String, "update")
+        XCTAssertEqual((subscribe["update"]?["result"] as? [String: Any])?["sessionPercent"] as? Double, 34)
+        let failed = try XCTUnwrap(subscribe["failed"]?["result"] as? [String: Any])
+        XCTAssertEqual(failed["sessionPercent"] as? Double, 34)
+        XCTAssertEqual(failed["stale"] as? Bool, true)
+        XCTAssertNotNil(failed["ageSeconds"] as? Double)
+
+        let stale = try XCTUnwrap(result["stale"] as? [String: Any])
+        XCTAssertEqual(stale["stale"] as? Bool, true)
+        XCTAssertLessThan(try XCTUnwrap(stale["ageSeconds"] as? Double), 1.5)
+
+        // Past MODELMETER_SOCKET_MAX_STALE the refresh error is returned instead.
+        let expired = try XCTUnwrap((result["expired"] as? [String: Any])?["error"] as? String)
+        XCTAssertTrue(expired.hasPrefix("upstream down (last good snapshot is"), expired)
+
+        let stopped = try XCTUnwrap(result["stopped"] as? [Any])
+        XCTAssertEqual(stopped[0] as? Int, 0)
+        XCTAssertEqual(stopped[1] as? Bool, false, "SIGTERM removes the socket")
+    }
+}
@@ -0,0 +1,218 @@
+import XCTest
+
+final class UsageStateScriptTests: XCTestCase {
+    private static let harness = #"""
+    import json, os, stat, subprocess, sys, tempfile, threading
+
+    scripts = sys.argv[1]
+    state = tempfile.mkdtemp()
+    os.environ["MODELMETER_STATE_DIR"] = state
+    sys.path.insert(0, scripts)
+    import usage_state
+
+    result = {}
+    target = os.path.join(state, "out", "payload.json")
+    usage_state.write_json_atomic(target, {"a": 1})
+    usage_state.write_json_atomic(target, {"a": 2}, mode=0o644)
+    usage_state.write_json_atomic(target, {"a": 3})
+    result["write"] = [usage_state.read_json_file(target), stat.S_IMODE(os.stat(target).st_mode) == 0o600,
+                       sorted(os.listdir(os.path.dirname(target)))]
+
+    # A replace that cannot happen (the target is a directory) must not leave its temp file behind.
+    blocked = os.path.join(state, "out", "blocked")
+    os.makedirs(os.path.join(blocked, "inside"))
+    try:
+        usage_state.write_json_atomic(blocked, {"a": 1})
+        failed = False
+    except OSError:
+        failed = True
+    result["failedWrite"] = [failed, os.path.isdir(blocked), sorted(os.listdir(os.path.dirname(target)))]
+
+    # Readers racing a writer only ever see whole documents.
+    big = os.path.join(state, "out", "big.json")
+    usage_state.write_json_atomic(big, {"n": 0, "fill": "x" * 200000})
+    writer = subprocess.Popen([sys.executable, "-c", """
+    import sys
+    sys.path.insert(0, sys.argv[1])
+    import usage_state
+    for n in range(1, 200):
+        usage_state.write_json_atomic(sys.argv[2], {"n": n, "fill": "x" * 200000})
+    """, scripts, big])
+    torn = 0
+    reads = 0
+    while writer.poll() is None or reads == 0:
+        with open(big, "rb") as handle:
+            try:
+                json.loads(handle.read())
+            except ValueError:
+                torn += 1
+        reads += 1
+    result["torn"] = torn
+
+    child = """
+    import json, sys, time
+    sys.path.insert(0, sys.argv[1])
+    import usage_state
+    mode = sys.argv[2]
+    if mode == "try":
+        with usage_state.file_lock("held", 0.3) as acquired:
+            print(json.dumps(acquired))
+    elif mode == "hold":
+        with usage_state.file_lock("held", 5) as acquired:
+            print(json.dumps(acquired), flush=True)
+            sys.stdin.readline()
+    else:
+        path = sys.argv[3]
+        for _ in range(20):
+            with usage_state.file_lock("counter", 30) as acquired:
+                assert acquired
+                with open(path) as handle:
+                    value = int(handle.read())
+                time.sleep(0.001)
+                with open(path, "w") as handle:
+                    handle.write(str(value + 1))
+    """
+
+    def attempt():
+        run = subprocess.run([sys.executable, "-c", child, scripts, "try"], capture_output=True, text=True, timeout=30)
+        return json.loads(run.stdout)
+
+    holder = subprocess.Popen([sys.executable, "-c", child, scripts, "hold"],
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    held = json.loads(holder.stdout.readline())
+    while_held = attempt()
+    holder.stdin.write("\n")
+    holder.stdin.flush()
+    holder.wait(timeout=30)
+    result["lock"] = [held, while_held, attempt()]
+
+    # Threads in one process are serialized too, not just separate processes.
+    def try_in_thread(found):
+        with usage_state.file_lock("held", 0.2) as acquired:
+            found.append(acquired)
+
+    with usage_state.file_lock("held", 1) as outer:
+        inner = []
+        thread = threading.Thread(target=try_in_thread, args=(inner,))
+        thread.start()
+        thread.join()
+    result["threads"] = [outer, inner]
+
+    counter = os.path.join(state, "counter")
+    with open(counter, "w") as handle:
+        handle.write("0")
+    workers = [subprocess.Popen([sys.executable, "-c", child, scripts, "count", counter]) for _ in range(6)]
+    codes = [worker.wait(timeout=120) for worker in workers]
+    with open(counter) as handle:
+        result["counter"] = [codes, int(handle.read())]
+    print(json.dumps(result))
+    """#
+
+    private static let refreshHarness = #"""
+    import json, os, stat, subprocess, sys, tempfile, threading, time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    scripts = sys.argv[1]
+    # Concurrent polls with an expired token refresh it once; the others pick up the new token.
+    home = tempfile.mkdtemp()
+    os.makedirs(os.path.join(home, ".claude"))
+    credentials = os.path.join(home, ".claude", ".credentials.json")
+    with open(credentials, "w") as handle:
+        json.dump({"claudeAiOauth": {"accessToken": "a1", "refreshToken": "r1", "expiresAt": 1000}}, handle)
+    os.chmod(credentials, 0o644)
+    hits = {"usage": 0, "token": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def reply(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            hits["usage"] += 1
+            ok = self.headers.get("Authorization") == "Bearer a2"
+            self.reply(200 if ok else 401, {"five_hour": {"utilization": 12}, "seven_day": {"utilization": 34}})
+
+        def do_POST(self):
+            hits["token"] += 1
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(0.3)
+            self.reply(200, {"access_token": "a2", "refresh_token": "r2", "expires_in": 3600})
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    env = dict(os.environ, HOME=home, MODELMETER_STATE_DIR=tempfile.mkdtemp(), MODELMETER_CACHE_TTL="0",
+               CLAUDE_USAGE_URL=f"{base}/usage", CLAUDE_TOKEN_URL=f"{base}/token")
+    env.pop("CLAUDE_CONFIG_DIR", None)
+    polls = [subprocess.Popen([sys.executable, os.path.join(scripts, "claude_usage.py")], env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True) for _ in range(4)]
+    sessions = [json.loads(poll.communicate(timeout=60)[0])["sessionPercent"] for poll in polls]
+    oauth = json.load(open(credentials))["claudeAiOauth"]
+    print(json.dumps({
+        "sessions": sessions,
+        "tokenRequests": hits["token"],
+        "refreshToken": oauth["refreshToken"],
+        "ownerOnly": stat.S_IMODE(os.stat(credentials).st_mode) == 0o600,
+        "leftovers": [name for name in os.listdir(os.path.dirname(credentials)) if name.endswith(".tmp")],
+    }))
+    server.shutdown()
+    """#
+
+    private func run(_ harness: String) throws -> [String: Any] {
+        let repoRoot = URL(fileURLWithPath: #filePath)
+            .deletingLastPathComponent()
+            .deletingLastPathComponent()
+            .deletingLastPathComponent()
+        let scripts = repoRoot.appendingPathComponent("Sources/ModelMeterApp/Resources/ModelMeterScripts")
+
+        let process = Process()
+        process.executableURL = URL(fileURLWithPath: "/usr/bin/env")
+        process.arguments = ["python3", "-c", harness, scripts.path]
+        let output = Pipe()
+        process.standardOutput = output
+        try process.run()
+        let data = output.fileHandleForReading.readDataToEndOfFile()
+        process.waitUntilExit()
+
+        XCTAssertEqual(process.terminationStatus, 0)
+        return try XCTUnwrap(JSONSerialization.jsonObject(with: data) as? [String: Any])
+    }
+
+    func testAtomicWritesAndFileLocks() throws {
+        let result = try run(Self.harness)
+        let write = try XCTUnwrap(result["write"] as? [Any])
+        XCTAssertEqual(write[0] as? [String: Int], ["a": 3])
+        XCTAssertEqual(write[1] as? Bool, true)
+        XCTAssertEqual(write[2] as? [String], ["payload.json"])
+
+        let failedWrite = try XCTUnwrap(result["failedWrite"] as? [Any])
+        XCTAssertEqual(failedWrite[0] as? Bool, true)
+        XCTAssertEqual(failedWrite[1] as? Bool, true)
+        XCTAssertEqual(failedWrite[2] as? [String], ["blocked", "payload.json"])
+        XCTAssertEqual(result["torn"] as? Int, 0)
+
+        XCTAssertEqual(result["lock"] as? [Bool], [true, false, true])
+        let threads = try XCTUnwrap(result["threads"] as? [Any])
+        XCTAssertEqual(threads[0] as? Bool, true)
+        XCTAssertEqual(threads[1] as? [Bool], [false])
+
+        let counter = try XCTUnwrap(result["counter"] as? [Any])
+        XCTAssertEqual(counter[0] as? [Int], [0, 0, 0, 0, 0, 0])
+        XCTAssertEqual(counter[1] as? Int, 120, "every increment made under the lock survives")
+    }
+
+    func testConcurrentPollsRefreshTheTokenOnce() throws {
+        let result = try run(Self.refreshHarness)
+        XCTAssertEqual(result["sessions"] as? [Double], [12, 12, 12, 12])
+        XCTAssertEqual(result["tokenRequests"] as? Int, 1)
+        XCTAssertEqual(result["refreshToken"] as? String, "r2")
+        XCTAssertEqual(result["ownerOnly"] as? Bool, true)
+        XCTAssertEqual(result["leftovers"] as? [String], [])
+    }
+}
@@ -1,13 +1,17 @@
 #!/usr/bin/env python3
+import fcntl
 import json
 import os
+import queue
 import subprocess
 import sys
+import threading
 import time
 import urllib.error
 import urllib.request
+from contextlib import contextmanager
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, Iterator, Tuple
 
 CRED_PATHS = [
     os.path.expanduser("~/.claude/.credentials.json"),
@@ -25,6 +29,21 @@ TOKEN_URLS = [
 CLIENT_ID = "9d1c250a-e61b-44d9-88ed-5944d1962f5e"
 SCOPES = "user:profile user:inference user:sessions:claude_code user:mcp_servers"
 REFRESH_BUFFER_MS = 5 * 60 * 1000
+# Standalone like usage_wrapper.py, but laid out as the bundled usage_state does it,
+# so both sides share the same state file and lock.
+STATE_DIR = os.environ.get("MODELMETER_STATE_DIR", "").strip() or os.path.expanduser("~/.modelmeter")
+ENDPOINT_STATS_PATH = os.path.join(STATE_DIR, "claude-endpoints.json")
+ENDPOINT_STATS_LOCK_PATH = os.path.join(STATE_DIR, "locks", "claude-endpoints.lock")
+ENDPOINT_STATS_LOCK_TIMEOUT_S = 2.0
+LOCK_POLL_S = 0.05
+# The next usage endpoint is started when the current one has not answered within
+# twice its usual latency, clamped to this range.
+HEDGE_DELAY_MIN_S = 0.15
+HEDGE_DELAY_MAX_S = 1.0
+HEDGE_DELAY_DEFAULT_S = 0.5
+LATENCY_SMOOTHING = 0.3
+# An endpoint that failed recently is tried after the healthy ones for this long.
+FAILURE_COOLDOWN_S = 10 * 60
 
 
 def fail(message: str) -> None:
@@ -119,6 +138,135 @@ def request_json(
     return 0, {}, {}, "Unknown error"
 
 
+def read_json_file(path: str) -> Optional[Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            return json.load(handle)
+    except Exception:
+        return None
+
+
+def write_json_atomic(path: str, payload: Any) -> None:
+    """Write via temp file + fsync + rename so readers never see a partial file."""
+    import tempfile
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix="." + os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump(payload, handle, separators=(",", ":"))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def file_lock(path: str, timeout: float) -> Iterator[bool]:
+    """Hold an advisory lock on `path`; yields whether it was taken within `timeout`."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o600)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    yield False
+                    return
+                time.sleep(LOCK_POLL_S)
+        yield True
+    finally:
+        os.close(fd)
+
+
+class EndpointStats:
+    """Smoothed latency and recent failures per endpoint URL, kept across runs."""
+
+    def __init__(self, entries: Dict[str, Dict[str, Any]]):
+        self.entries = entries
+        self.updated: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def load(cls) -> "EndpointStats":
+        raw = read_json_file(ENDPOINT_STATS_PATH)
+        return cls(raw if isinstance(raw, dict) else {})
+
+    def _healthy(self, entry: Dict[str, Any]) -> bool:
+        last_failure = entry.get("lastFailureAt")
+        return not entry.get("failures") or not isinstance(last_failure, (int, float)) or (
+            time.time() - last_failure > FAILURE_COOLDOWN_S
+        )
+
+    def ordered(self, urls: list) -> list:
+        """Configured URLs, healthy before recently failed, then fastest first; untried keep their place."""
+        candidates = list(dict.fromkeys(u for u in urls if u))
+
+        def key(item):
+            index, url = item
+            entry = self.entries.get(url)
+            if not isinstance(entry, dict):
+                return (0, float("inf"), index)
+            latency = entry.get("latencyMs")
+            return (
+                0 if self._healthy(entry) else 1,
+                latency if isinstance(latency, (int, float)) else float("inf"),
+                index,
+            )
+
+        return [url for _, url in sorted(enumerate(candidates), key=key)]
+
+    def hedge_delay(self, url: str) -> float:
+        entry = self.entries.get(url)
+        latency = entry.get("latencyMs") if isinstance(entry, dict) else None
+        if not isinstance(latency, (int, float)):
+            return HEDGE_DELAY_DEFAULT_S
+        return min(HEDGE_DELAY_MAX_S, max(HEDGE_DELAY_MIN_S, 2 * latency / 1000.0))
+
+    def record(self, url: str, elapsed: float, ok: Optional[bool]) -> None:
+        """Fold in one request; ok=None is a censored sample (still running when the race ended),
+        which moves the latency but neither clears nor adds a failure."""
+        entry = self.entries.get(url)
+        entry = dict(entry) if isinstance(entry, dict) else {}
+        latency_ms = elapsed * 1000.0
+        previous = entry.get("latencyMs")
+        if isinstance(previous, (int, float)):
+            latency_ms = previous + LATENCY_SMOOTHING * (latency_ms - previous)
+        entry["latencyMs"] = round(latency_ms, 1)
+        if ok:
+            entry["failures"] = 0
+            entry.pop("lastFailureAt", None)
+        elif ok is not None:
+            entry["failures"] = int(entry.get("failures") or 0) + 1
+            entry["lastFailureAt"] = time.time()
+        self.entries[url] = entry
+        self.updated[url] = entry
+
+    def save(self) -> None:
+        """Merge this run's updates into the shared file under its lock; best effort."""
+        if not self.updated:
+            return
+        try:
+            with file_lock(ENDPOINT_STATS_LOCK_PATH, ENDPOINT_STATS_LOCK_TIMEOUT_S) as acquired:
+                if not acquired:
+                    return
+                current = read_json_file(ENDPOINT_STATS_PATH)
+                current = current if isinstance(current, dict) else {}
+                current.update(self.updated)
+                write_json_atomic(ENDPOINT_STATS_PATH, current)
+        except OSError:
+            pass
+
+
 def needs_refresh(oauth: dict) -> bool:
     expires_at = oauth.get("expiresAt")
     if not isinstance(expires_at, (int, float)):
@@ -131,9 +279,13 @@ def refresh_token(oauth: dict, creds: dict, source: str, path: Optional[str]) ->
     if not isinstance(refresh, str) or not refresh.strip():
         return None
 
+    # Refresh tokens rotate, so token endpoints are tried one at a time (never hedged),
+    # fastest healthy one first.
+    stats = EndpointStats.load()
     payload = None
     access = None
-    for url in [u for u in TOKEN_URLS if u]:
+    for url in stats.ordered(TOKEN_URLS):
+        started = time.monotonic()
         status, body, _, _ = request_json(
             url,
             "POST",
@@ -146,12 +298,15 @@ def refresh_token(oauth: dict, creds: dict, source: str, path: Optional[str]) ->
             },
             timeout=15,
         )
-        if status < 200 or status >= 300:
-            continue
-        access = body.get("access_token")
+        elapsed = time.monotonic() - started
+        access = body.get("access_token") if 200 <= status < 300 else None
         if isinstance(access, str) and access.strip():
+            stats.record(url, elapsed, ok=True)
             payload = body
             break
+        # A 4xx says more about the refresh token than the endpoint; leave its health alone.
+        stats.record(url, elapsed, ok=None if 400 <= status < 500 else False)
+    stats.save()
 
     if payload is None or access is None:
         return None
@@ -167,33 +322,86 @@ def refresh_token(oauth: dict, creds: dict, source: str, path: Optional[str]) ->
     return access
 
 
+def fetch_usage_from(url: str, token: str) -> Tuple[Optional[dict], str]:
+    """One usage request; returns (payload, "") or (None, reason)."""
+    status, payload, _, err = request_json(
+        url,
+        "GET",
+        {
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/json",
+            "Content-Type": "application/json",
+            "anthropic-beta": "oauth-2025-04-20",
+            "User-Agent": "ModelMeter",
+        },
+        None,
+        timeout=10,
+    )
+    if status < 200 or status >= 300:
+        if status == 0 and err:
+            return None, f"Request failed: {err}"
+        return None, f"HTTP {status} from {url}"
+    five_hour = payload.get("five_hour", {}) if isinstance(payload.get("five_hour"), dict) else {}
+    seven_day = payload.get("seven_day", {}) if isinstance(payload.get("seven_day"), dict) else {}
+    if isinstance(five_hour.get("utilization"), (int, float)) and isinstance(seven_day.get("utilization"), (int, float)):
+        return payload, ""
+    return None, f"Missing usage fields from {url}"
+
+
 def fetch_usage(token: str) -> dict:
+    """Hedged fetch: start on the preferred endpoint and add the next one each time
+    the hedge delay passes (or at once when one fails); the first valid answer wins."""
+    stats = EndpointStats.load()
+    urls = stats.ordered(USAGE_URLS)
+    results: "queue.Queue[Tuple[str, Optional[dict], str, float]]" = queue.Queue()
+
+    def attempt(url: str) -> None:
+        begin = time.monotonic()
+        try:
+            payload, error = fetch_usage_from(url, token)
+        except Exception as exc:
+            payload, error = None, f"Request failed: {exc}"
+        results.put((url, payload, error, time.monotonic() - begin))
+
+    in_flight: Dict[str, float] = {}
+    next_index = 0
+
+    def launch() -> None:
+        nonlocal next_index
+        url = urls[next_index]
+        next_index += 1
+        in_flight[url] = time.monotonic()
+        threading.Thread(target=attempt, args=(url,), daemon=True).start()
+
+    winner = None
     last_error = None
-    for url in [u for u in USAGE_URLS if u]:
-        status, payload, _, err = request_json(
-            url,
-            "GET",
-            {
-                "Authorization": f"Bearer {token}",
-                "Accept": "application/json",
-                "Content-Type": "application/json",
-                "anthropic-beta": "oauth-2025-04-20",
-                "User-Agent": "ModelMeter",
-            },
-            None,
-            timeout=10,
-        )
-        if status < 200 or status >= 300:
-            if status == 0 and err:
-                last_error = f"Request failed: {err}"
-            else:
-                last_error = f"HTTP {status} from {url}"
+    if urls:
+        launch()
+    while in_flight:
+        can_hedge = next_index < len(urls)
+        # Give the endpoint launched last its own learned head start before adding the next one.
+        wait = stats.hedge_delay(urls[next_index - 1]) if can_hedge else None
+        try:
+            url, payload, error, elapsed = results.get(timeout=wait)
+        except queue.Empty:
+            launch()
             continue
-        five_hour = payload.get("five_hour", {}) if isinstance(payload.get("five_hour"), dict) else {}
-        seven_day = payload.get("seven_day", {}) if isinstance(payload.get("seven_day"), dict) else {}
-        if isinstance(five_hour.get("utilization"), (int, float)) and isinstance(seven_day.get("utilization"), (int, float)):
-            return payload
-        last_error = f"Missing usage fields from {url}"
+        del in_flight[url]
+        stats.record(url, elapsed, ok=payload is not None)
+        if payload is not None:
+            winner = payload
+            break
+        last_error = error
+        if can_hedge:
+            launch()
+    # Requests still in flight lost the race; count the time they have taken so far
+    # (a lower bound) so a hanging endpoint drops down the order.
+    now = time.monotonic()
+    for url, begin in in_flight.items():
+        stats.record(url, now - begin, ok=None)
+    stats.save()
+    if winner is not None:
+        return winner
     fail(f"Usage request failed: {last_error or 'No response.'}")
 
 
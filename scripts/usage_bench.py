@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""Benchmark the usage scripts against a local stand-in for the provider endpoints.
+
+A threaded HTTP(S) stub serves the Claude usage and token endpoints and the
+Codex wham/usage and token endpoints, with configurable latency and injected
+401/403/429 responses. Each script is run N times against it from a throwaway
+HOME and state directory with the usage cache disabled, so every poll does a
+real request. The report (JSON on stdout) has cold-start time, p50/p95/p99
+end-to-end latency, throughput and the stub's status counts per target.
+
+For the provider scripts it also times the imports of one run answered from
+the cache, lists any network or CLI modules that run pulled in, and fails the
+benchmark when the imports go over --import-budget-ms.
+
+    scripts/usage_bench.py --polls 50 --latency-ms 40 --inject 429:0.05,401:0.02
+    scripts/usage_bench.py --targets claude,codex --tls --output bench.json
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUNDLED_SCRIPTS = os.path.join(REPO_ROOT, "Sources", "ModelMeterApp", "Resources", "ModelMeterScripts")
+WRAPPER_SCRIPT = os.path.join(REPO_ROOT, "scripts", "usage_wrapper.py")
+TARGETS = ("claude", "codex", "wrapper")
+INJECTABLE = (401, 403, 429)
+RESET_EPOCH = 1900000000
+DEFAULT_IMPORT_BUDGET_MS = 40.0
+# Cached runs timed per target; the median is compared with the budget.
+FAST_PATH_SAMPLES = 5
+# A run answered from the cache should never need these.
+HEAVY_MODULES = ("argparse", "ssl", "http.client", "urllib.request", "email.parser", "subprocess", "hashlib")
+
+CLAUDE_USAGE_PATH = "/api/oauth/usage"
+CLAUDE_TOKEN_PATH = "/v1/oauth/token"
+CODEX_USAGE_PATH = "/backend-api/wham/usage"
+CODEX_TOKEN_PATH = "/oauth/token"
+
+
+class StubConfig:
+    def __init__(self, latency_ms: float, jitter_ms: float, inject: Dict[int, float], seed: int):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.inject = inject
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+
+    def count(self, key: str) -> None:
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def delay(self) -> float:
+        with self.lock:
+            jitter = self.random.uniform(0.0, self.jitter_ms) if self.jitter_ms > 0 else 0.0
+        return (self.latency_ms + jitter) / 1000.0
+
+    def injected_status(self) -> Optional[int]:
+        with self.lock:
+            roll = self.random.random()
+        threshold = 0.0
+        for status, probability in sorted(self.inject.items()):
+            threshold += probability
+            if roll < threshold:
+                return status
+        return None
+
+    def snapshot(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(sorted(self.counts.items()))
+
+
+def make_handler(config: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def send_json(self, status: int, body: dict, headers: Optional[Dict[str, str]] = None) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            config.count(f"{self.command} {self.path.split('?')[0]} {status}")
+
+        def injected(self) -> bool:
+            status = config.injected_status()
+            if status is None:
+                return False
+            headers = {"Retry-After": "0"} if status == 429 else None
+            self.send_json(status, {"error": "injected"}, headers)
+            return True
+
+        def do_GET(self) -> None:
+            time.sleep(config.delay())
+            path = self.path.split("?")[0]
+            if path not in (CLAUDE_USAGE_PATH, CODEX_USAGE_PATH):
+                self.send_json(404, {"error": "not found"})
+                return
+            if self.injected():
+                return
+            if path == CLAUDE_USAGE_PATH:
+                self.send_json(200, {
+                    "five_hour": {"utilization": 12.5, "resets_at": RESET_EPOCH},
+                    "seven_day": {"utilization": 40.0, "resets_at": RESET_EPOCH},
+                })
+                return
+            window = {"used_percent": 7, "reset_at": RESET_EPOCH}
+            self.send_json(200, {"rate_limit": {"primary_window": window, "secondary_window": window}}, {
+                "x-codex-primary-used-percent": "8",
+                "x-codex-secondary-used-percent": "21",
+            })
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+            time.sleep(config.delay())
+            path = self.path.split("?")[0]
+            if path not in (CLAUDE_TOKEN_PATH, CODEX_TOKEN_PATH):
+                self.send_json(404, {"error": "not found"})
+                return
+            self.send_json(200, {
+                "access_token": f"bench-access-{time.monotonic_ns()}",
+                "refresh_token": "bench-refresh",
+                "expires_in": 3600,
+            })
+
+    return Handler
+
+
+def make_certificate(directory: str) -> Tuple[str, str]:
+    cert = os.path.join(directory, "stub.crt")
+    key = os.path.join(directory, "stub.key")
+    if shutil.which("openssl") is None:
+        raise RuntimeError("--tls needs the openssl command to create a self-signed certificate.")
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+            "-subj", "/CN=localhost", "-addext", "subjectAltName=IP:127.0.0.1,DNS:localhost",
+            "-keyout", key, "-out", cert,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+def start_stub(config: StubConfig, cert: Optional[Tuple[str, str]]) -> Tuple[ThreadingHTTPServer, str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(config))
+    server.daemon_threads = True
+    scheme = "http"
+    if cert is not None:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*cert)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}"
+
+
+def write_fixtures(home: str) -> str:
+    now_ms = int(time.time() * 1000)
+    claude_dir = os.path.join(home, ".claude")
+    codex_dir = os.path.join(home, ".codex")
+    os.makedirs(claude_dir)
+    os.makedirs(codex_dir)
+    with open(os.path.join(claude_dir, ".credentials.json"), "w", encoding="utf-8") as handle:
+        json.dump({"claudeAiOauth": {
+            "accessToken": "bench-access",
+            "refreshToken": "bench-refresh",
+            "expiresAt": now_ms + 24 * 3600 * 1000,
+        }}, handle)
+    with open(os.path.join(codex_dir, "auth.json"), "w", encoding="utf-8") as handle:
+        json.dump({
+            "tokens": {"access_token": "bench-access", "refresh_token": "bench-refresh", "account_id": "bench"},
+            "last_refresh": datetime.now(timezone.utc).isoformat(),
+        }, handle)
+    # The wrapper parses provider JSON rather than fetching it; give it a representative document.
+    wrapper_input = os.path.join(home, "wrapper-input.json")
+    window = {"used_percent": 7, "reset_at": RESET_EPOCH}
+    with open(wrapper_input, "w", encoding="utf-8") as handle:
+        json.dump({"rate_limit": {"primary_window": window, "secondary_window": window}}, handle)
+    return wrapper_input
+
+
+def target_command(target: str, scripts_dir: str, wrapper: str, wrapper_input: str) -> List[str]:
+    if target == "wrapper":
+        return [sys.executable, wrapper, "--file", wrapper_input]
+    return [sys.executable, os.path.join(scripts_dir, f"{target}_usage.py")]
+
+
+def target_env(base_url: str, home: str, state_dir: str, cert: Optional[Tuple[str, str]]) -> Dict[str, str]:
+    env = dict(os.environ)
+    for name in ("https_proxy", "HTTPS_PROXY", "http_proxy", "HTTP_PROXY", "all_proxy", "ALL_PROXY"):
+        env.pop(name, None)
+    env.update({
+        "HOME": home,
+        "MODELMETER_STATE_DIR": state_dir,
+        "MODELMETER_CACHE_TTL": "0",
+        "MODELMETER_CACHE_MAX_STALE": "0",
+        "CLAUDE_USAGE_URL": base_url + CLAUDE_USAGE_PATH,
+        "CLAUDE_TOKEN_URL": base_url + CLAUDE_TOKEN_PATH,
+        "CODEX_USAGE_URL": base_url + CODEX_USAGE_PATH,
+        "CODEX_TOKEN_URL": base_url + CODEX_TOKEN_PATH,
+        "NO_PROXY": "127.0.0.1,localhost",
+    })
+    env.pop("CLAUDE_CONFIG_DIR", None)
+    if cert is not None:
+        env["SSL_CERT_FILE"] = cert[0]
+    return env
+
+
+def run_once(command: List[str], env: Dict[str, str], timeout: float) -> Tuple[float, int]:
+    started = time.perf_counter()
+    try:
+        result = subprocess.run(command, env=env, capture_output=True, timeout=timeout)
+        code = result.returncode
+    except subprocess.TimeoutExpired:
+        code = -1
+    return (time.perf_counter() - started) * 1000.0, code
+
+
+def parse_importtime(stderr: str) -> Dict[str, float]:
+    """Top-level module -> cumulative import milliseconds from `python -X importtime` output."""
+    modules: Dict[str, float] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        if name.startswith(" ") and not name.startswith("  "):
+            modules[name.strip()] = int(parts[1]) / 1000.0
+    return modules
+
+
+def all_imported(stderr: str) -> List[str]:
+    names = []
+    for line in stderr.splitlines():
+        parts = line.split("|")
+        if line.startswith("import time:") and len(parts) == 3:
+            names.append(parts[2].strip())
+    return names
+
+
+def measure_fast_path(command: List[str], env: Dict[str, str], timeout: float) -> dict:
+    """Import cost of a run served from the cache filled by the timed polls.
+
+    Only modules a bare `python -c pass` does not already load are counted. The
+    first run may write bytecode, so what is timed is importing the fast path
+    rather than compiling it (PYTHONDONTWRITEBYTECODE would make every sample
+    a compile).
+    """
+    cached_env = dict(env, MODELMETER_CACHE_TTL="3600")
+    cached_env.pop("PYTHONDONTWRITEBYTECODE", None)
+    subprocess.run(command, capture_output=True, env=cached_env, timeout=timeout)
+    startup = subprocess.run([sys.executable, "-X", "importtime", "-c", "pass"], capture_output=True, text=True, env=cached_env)
+    baseline = set(all_imported(startup.stderr))
+    samples = []
+    exit_code = 0
+    heavy = set()
+    for _ in range(FAST_PATH_SAMPLES):
+        result = subprocess.run(
+            [command[0], "-X", "importtime"] + command[1:], capture_output=True, text=True, env=cached_env, timeout=timeout
+        )
+        imported = parse_importtime(result.stderr)
+        samples.append(sum(ms for name, ms in imported.items() if name not in baseline))
+        exit_code = exit_code or result.returncode
+        heavy.update(name for name in all_imported(result.stderr) if name in HEAVY_MODULES)
+    return {
+        "exitCode": exit_code,
+        "importMs": round(sorted(samples)[len(samples) // 2], 2),
+        "heavyModules": sorted(heavy),
+    }
+
+
+def percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return round(sorted_values[rank], 2)
+
+
+def bench_target(
+    target: str,
+    command: List[str],
+    env: Dict[str, str],
+    polls: int,
+    concurrency: int,
+    timeout: float,
+    config: StubConfig,
+    import_budget_ms: float,
+) -> dict:
+    before = config.snapshot()
+    cold_ms, cold_code = run_once(command, env, timeout)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: run_once(command, env, timeout), range(polls)))
+    elapsed = time.perf_counter() - started
+    after = config.snapshot()
+    fast_path = measure_fast_path(command, env, timeout) if target != "wrapper" else None
+    if fast_path is not None:
+        fast_path["budgetMs"] = import_budget_ms
+        fast_path["withinBudget"] = fast_path["exitCode"] == 0 and fast_path["importMs"] <= import_budget_ms
+
+    latencies = sorted(ms for ms, _ in results)
+    failures: Dict[str, int] = {}
+    for _, code in results:
+        if code != 0:
+            failures[str(code)] = failures.get(str(code), 0) + 1
+    return {
+        "target": target,
+        "polls": polls,
+        "concurrency": concurrency,
+        "coldStartMs": round(cold_ms, 2),
+        "coldStartExitCode": cold_code,
+        "latencyMs": {
+            "min": round(latencies[0], 2) if latencies else None,
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": round(latencies[-1], 2) if latencies else None,
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else None,
+        },
+        "throughputPerSecond": round(polls / elapsed, 2) if elapsed > 0 else None,
+        "succeeded": polls - sum(failures.values()),
+        "failuresByExitCode": failures,
+        "stubRequests": {key: after[key] - before.get(key, 0) for key in after if after[key] != before.get(key, 0)},
+        "cachedRun": fast_path,
+    }
+
+
+def parse_inject(raw: str) -> Dict[int, float]:
+    inject: Dict[int, float] = {}
+    for part in filter(None, (piece.strip() for piece in raw.split(","))):
+        status, _, probability = part.partition(":")
+        try:
+            code, chance = int(status), float(probability)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Expected STATUS:PROBABILITY, got {part!r}")
+        if code not in INJECTABLE or not 0.0 <= chance <= 1.0:
+            raise argparse.ArgumentTypeError(f"Can inject {INJECTABLE} with a probability in [0, 1], got {part!r}")
+        inject[code] = chance
+    if sum(inject.values()) > 1.0:
+        raise argparse.ArgumentTypeError("Injection probabilities add up to more than 1.")
+    return inject
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the ModelMeter usage scripts against a local stub server.")
+    parser.add_argument("--targets", default=",".join(TARGETS), help=f"Comma-separated subset of {','.join(TARGETS)}")
+    parser.add_argument("--polls", type=int, default=30, help="Timed runs per target after the cold start")
+    parser.add_argument("--concurrency", type=int, default=1, help="Runs in flight at once")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Stub response latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Extra uniform random stub latency")
+    parser.add_argument("--inject", type=parse_inject, default={}, help="Injected statuses, e.g. 429:0.05,401:0.02")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency jitter and injection")
+    parser.add_argument("--tls", action="store_true", help="Serve HTTPS with a throwaway self-signed certificate")
+    parser.add_argument("--import-budget-ms", type=float, default=DEFAULT_IMPORT_BUDGET_MS,
+                        help="Most import time a cached provider run may spend before the benchmark fails")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds before a run counts as hung")
+    parser.add_argument("--scripts-dir", default=BUNDLED_SCRIPTS, help="Directory holding claude_usage.py and codex_usage.py")
+    parser.add_argument("--wrapper", default=WRAPPER_SCRIPT, help="Path to usage_wrapper.py")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    unknown = [t for t in targets if t not in TARGETS]
+    if unknown:
+        parser.error(f"Unknown targets: {', '.join(unknown)}")
+    if args.polls < 1 or args.concurrency < 1:
+        parser.error("--polls and --concurrency must be at least 1")
+
+    workdir = tempfile.mkdtemp(prefix="modelmeter-bench-")
+    try:
+        home = os.path.join(workdir, "home")
+        os.makedirs(home)
+        wrapper_input = write_fixtures(home)
+        cert = make_certificate(workdir) if args.tls else None
+        config = StubConfig(args.latency_ms, args.jitter_ms, args.inject, args.seed)
+        server, base_url = start_stub(config, cert)
+        try:
+            results = []
+            for target in targets:
+                # A fresh state directory per target so its cold start really is cold.
+                state_dir = os.path.join(workdir, f"state-{target}")
+                env = target_env(base_url, home, state_dir, cert)
+                command = target_command(target, args.scripts_dir, args.wrapper, wrapper_input)
+                result = bench_target(
+                    target, command, env, args.polls, args.concurrency, args.timeout, config, args.import_budget_ms
+                )
+                results.append(result)
+                print(
+                    f"{target}: cold {result['coldStartMs']}ms, p50 {result['latencyMs']['p50']}ms, "
+                    f"p95 {result['latencyMs']['p95']}ms, p99 {result['latencyMs']['p99']}ms, "
+                    f"{result['throughputPerSecond']}/s, {result['succeeded']}/{args.polls} ok",
+                    file=sys.stderr,
+                )
+        finally:
+            server.shutdown()
+            server.server_close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "generatedAt": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "config": {
+            "polls": args.polls,
+            "concurrency": args.concurrency,
+            "latencyMs": args.latency_ms,
+            "jitterMs": args.jitter_ms,
+            "inject": {str(code): chance for code, chance in sorted(args.inject.items())},
+            "seed": args.seed,
+            "tls": args.tls,
+            "importBudgetMs": args.import_budget_ms,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(text + "\n")
+    print(text)
+    within_budget = all(r["cachedRun"] is None or r["cachedRun"]["withinBudget"] for r in results)
+    return 0 if within_budget and all(r["succeeded"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,10 +1,64 @@
 #!/usr/bin/env python3
 import argparse
 import json
+import os
+import selectors
+import signal
 import subprocess
 import sys
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime, timezone
-from typing import Any, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_MAPPINGS_PATH = os.path.join(
+    os.environ.get("MODELMETER_STATE_DIR", "").strip() or os.path.expanduser("~/.modelmeter"),
+    "wrapper-mappings.json",
+)
+
+# Candidate dotted paths per output field, in priority order.
+DEFAULT_MAPPINGS: Dict[str, List[str]] = {
+    "sessionPercent": [
+        "sessionPercent",
+        "session_percent",
+        "five_hour.utilization",
+        "fiveHour.utilization",
+        "rate_limit.primary_window.used_percent",
+        "rateLimit.primaryWindow.used_percent",
+        "primary_window.used_percent",
+    ],
+    "weeklyPercent": [
+        "weeklyPercent",
+        "weekly_percent",
+        "seven_day.utilization",
+        "sevenDay.utilization",
+        "rate_limit.secondary_window.used_percent",
+        "rateLimit.secondaryWindow.used_percent",
+        "secondary_window.used_percent",
+    ],
+    "sessionResetAt": [
+        "five_hour.resets_at",
+        "fiveHour.resets_at",
+        "primary_window.reset_at",
+        "rate_limit.primary_window.reset_at",
+        "rateLimit.primaryWindow.reset_at",
+    ],
+    "weeklyResetAt": [
+        "seven_day.resets_at",
+        "sevenDay.resets_at",
+        "secondary_window.reset_at",
+        "rate_limit.secondary_window.reset_at",
+        "rateLimit.secondaryWindow.reset_at",
+    ],
+}
+NUMBER_FIELDS = ("sessionPercent", "weeklyPercent")
+RESET_FIELDS = ("sessionResetAt", "weeklyResetAt")
+MAX_TRACE_EVENTS = 100_000
+READ_CHUNK_BYTES = 64 * 1024
+MAX_LINE_BYTES = 1024 * 1024
+# How long a command may keep running after closing its output before it is stopped.
+EXIT_GRACE_S = 5.0
 
 
 def read_input(cmd: Optional[str], file_path: Optional[str]) -> str:
@@ -20,15 +74,6 @@ def read_input(cmd: Optional[str], file_path: Optional[str]) -> str:
     return sys.stdin.read()
 
 
-def get_path(obj: Any, path: str) -> Optional[Any]:
-    cur = obj
-    for key in path.split("."):
-        if not isinstance(cur, dict) or key not in cur:
-            return None
-        cur = cur[key]
-    return cur
-
-
 def read_number(value: Any) -> Optional[float]:
     try:
         num = float(value)
@@ -39,100 +84,342 @@ def read_number(value: Any) -> Optional[float]:
         return None
 
 
-def first_number(obj: Any, paths: list[str]) -> Optional[float]:
-    for path in paths:
-        value = get_path(obj, path)
-        num = read_number(value)
-        if num is not None:
-            return num
+def read_reset(value: Any) -> Optional[str]:
+    if isinstance(value, str) and value.strip():
+        return value
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(float(value), tz=timezone.utc).isoformat()
     return None
 
 
-def read_reset(obj: Any, paths: list[str]) -> Optional[str]:
-    for path in paths:
-        value = get_path(obj, path)
-        if isinstance(value, str) and value.strip():
-            return value
-        if isinstance(value, (int, float)):
-            return datetime.fromtimestamp(float(value), tz=timezone.utc).isoformat()
+class _Node:
+    __slots__ = ("children", "terminals")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_Node"] = {}
+        # (field, priority) pairs whose path ends here.
+        self.terminals: List[Tuple[str, int]] = []
+
+
+class Extractor:
+    """Every field's candidate paths compiled into one trie and resolved in a single walk."""
+
+    def __init__(self, mappings: Dict[str, List[str]]):
+        self.fields = list(mappings)
+        self.root = _Node()
+        for field, paths in mappings.items():
+            for priority, path in enumerate(paths):
+                node = self.root
+                for key in path.split("."):
+                    node = node.children.setdefault(key, _Node())
+                node.terminals.append((field, priority))
+
+    def extract(self, data: Any) -> Dict[str, Any]:
+        found: Dict[str, Tuple[int, Any]] = {}
+        stack = [(self.root, data)]
+        while stack:
+            node, value = stack.pop()
+            for field, priority in node.terminals:
+                best = found.get(field)
+                if best is not None and best[0] <= priority:
+                    continue
+                converted = read_number(value) if field in NUMBER_FIELDS else read_reset(value)
+                if converted is not None:
+                    found[field] = (priority, converted)
+            if node.children and isinstance(value, dict):
+                for key, child in node.children.items():
+                    if key in value:
+                        stack.append((child, value[key]))
+        return {field: found[field][1] if field in found else None for field in self.fields}
+
+
+def load_mappings(path: Optional[str]) -> Dict[str, List[str]]:
+    """Defaults, with paths from a JSON config ({"field": ["a.b", ...]}) tried first.
+
+    Problems with an explicit `path` are fatal; a broken default config only
+    draws a warning, and the built-in paths are used.
+    """
+    if path:
+        if not os.path.exists(path):
+            raise RuntimeError(f"Mappings file not found: {path}")
+        return read_mappings(path)
+    if not os.path.exists(DEFAULT_MAPPINGS_PATH):
+        return read_mappings(None)
+    try:
+        return read_mappings(DEFAULT_MAPPINGS_PATH)
+    except RuntimeError as exc:
+        print(f"{exc} Using the built-in mappings.", file=sys.stderr)
+        return read_mappings(None)
+
+
+def read_mappings(config_path: Optional[str]) -> Dict[str, List[str]]:
+    mappings = {field: list(paths) for field, paths in DEFAULT_MAPPINGS.items()}
+    if config_path is None:
+        return mappings
+    try:
+        with open(config_path, "r", encoding="utf-8") as handle:
+            config = json.load(handle)
+    except (OSError, json.JSONDecodeError) as exc:
+        raise RuntimeError(f"Invalid mappings file {config_path}: {exc}.")
+    if not isinstance(config, dict):
+        raise RuntimeError(f"Invalid mappings file {config_path}: expected an object.")
+    for field, paths in config.items():
+        if field not in mappings:
+            raise RuntimeError(f"Unknown field in mappings: {field}.")
+        if not isinstance(paths, list) or not all(isinstance(p, str) and p for p in paths):
+            raise RuntimeError(f"Mappings for {field} must be a list of dotted paths.")
+        mappings[field] = paths + [p for p in mappings[field] if p not in paths]
+    return mappings
+
+
+class Tracer:
+    """Per-phase timings for `--timings` and a Chrome trace-event file for `--trace`.
+
+    Same event format as usage_trace.py in the app bundle, which this script
+    cannot import. In `--follow` mode recording stops after MAX_TRACE_EVENTS.
+    """
+
+    def __init__(self, timings: bool, trace_path: Optional[str]):
+        self.timings_enabled = timings or os.environ.get("MODELMETER_TIMINGS", "").strip() == "1"
+        trace_dir = os.environ.get("MODELMETER_TRACE_DIR", "").strip()
+        if trace_path is None and trace_dir:
+            trace_path = os.path.join(trace_dir, f"wrapper-{int(time.time() * 1000)}-{os.getpid()}.trace.json")
+        self.trace_path = trace_path
+        self.events: Optional[List[dict]] = [] if self.timings_enabled or trace_path else None
+        self.origin_ns = time.perf_counter_ns()
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        if self.events is None:
+            yield
+            return
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            if len(self.events) < MAX_TRACE_EVENTS:
+                end = time.perf_counter_ns()
+                self.events.append({
+                    "name": name,
+                    "ph": "X",
+                    "ts": (start - self.origin_ns) / 1000.0,
+                    "dur": (end - start) / 1000.0,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                })
+
+    def mark(self) -> int:
+        return len(self.events or [])
+
+    def annotate(self, payload: dict, since: int = 0) -> dict:
+        """Add the milliseconds per phase recorded since `mark()` returned `since`."""
+        if not self.timings_enabled:
+            return payload
+        totals: Dict[str, float] = {}
+        for event in (self.events or [])[since:]:
+            totals[event["name"]] = totals.get(event["name"], 0.0) + event["dur"] / 1000.0
+        return dict(payload, timings={name: round(ms, 3) for name, ms in totals.items()})
+
+    def write(self) -> None:
+        if not self.trace_path:
+            return
+        try:
+            directory = os.path.dirname(self.trace_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.trace_path, "w", encoding="utf-8") as handle:
+                json.dump({"traceEvents": self.events or [], "displayTimeUnit": "ms"}, handle)
+        except OSError as exc:
+            print(f"Failed to write trace: {exc}", file=sys.stderr)
+
+
+def build_payload(data: Any, extractor: Extractor) -> Optional[dict]:
+    fields = extractor.extract(data)
+    if fields["sessionPercent"] is None or fields["weeklyPercent"] is None:
+        return None
+    return {
+        "sessionPercent": fields["sessionPercent"],
+        "weeklyPercent": fields["weeklyPercent"],
+        "sessionResetAt": fields["sessionResetAt"],
+        "weeklyResetAt": fields["weeklyResetAt"],
+        "updatedAt": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+class LineTimeout(Exception):
+    pass
+
+
+def read_lines(fd: int, line_timeout: float) -> Iterator[bytes]:
+    """Yield complete lines from `fd` as they arrive.
+
+    Nothing more is read while the caller is busy with a line, so a slow
+    consumer stalls the producer through the pipe instead of growing a buffer
+    here. A line longer than MAX_LINE_BYTES is reported and skipped up to its
+    newline. Raises LineTimeout if no full line arrives within `line_timeout`
+    seconds (0 waits forever).
+    """
+    selector = selectors.DefaultSelector()
+    selector.register(fd, selectors.EVENT_READ)
+    buffer = bytearray()
+    discarding = False
+    try:
+        deadline = time.monotonic() + line_timeout if line_timeout > 0 else None
+        while True:
+            newline = buffer.find(b"\n")
+            if newline >= 0:
+                line = bytes(buffer[:newline])
+                del buffer[:newline + 1]
+                deadline = time.monotonic() + line_timeout if line_timeout > 0 else None
+                if discarding:
+                    discarding = False
+                    continue
+                yield line
+                continue
+            if len(buffer) > MAX_LINE_BYTES:
+                if not discarding:
+                    print(f"Skipping input line longer than {MAX_LINE_BYTES} bytes.", file=sys.stderr)
+                    discarding = True
+                buffer.clear()
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise LineTimeout(f"No complete line within {line_timeout:g}s.")
+            if not selector.select(remaining):
+                continue
+            chunk = os.read(fd, READ_CHUNK_BYTES)
+            if not chunk:
+                if buffer.strip() and not discarding:
+                    yield bytes(buffer)
+                return
+            buffer += chunk
+    finally:
+        selector.close()
+
+
+def stop_process(process: Optional[subprocess.Popen], grace: float = 0.0) -> Optional[int]:
+    """Stop the command and anything its shell started.
+
+    The command gets `grace` seconds to exit on its own first. Returns its
+    exit code, or None if it had to be terminated.
+    """
+    if process is None:
+        return None
+    try:
+        return process.wait(timeout=grace)
+    except subprocess.TimeoutExpired:
+        pass
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=2)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+    except ProcessLookupError:
+        process.wait()
     return None
 
 
+def follow(cmd: Optional[str], extractor: Extractor, line_timeout: float, tracer: Tracer) -> int:
+    """Normalize every JSON line of a long-running command (or stdin) into one payload line."""
+    process = None
+    if cmd:
+        process = subprocess.Popen(
+            cmd, shell=True, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, start_new_session=True
+        )
+        fd = process.stdout.fileno()
+    else:
+        fd = sys.stdin.fileno()
+
+    status = None
+    # At end of input the command is normally exiting by itself; only interruptions stop it at once.
+    grace = EXIT_GRACE_S
+    try:
+        for line in read_lines(fd, line_timeout):
+            if not line.strip():
+                continue
+            mark = tracer.mark()
+            try:
+                with tracer.span("json.decode"):
+                    data = json.loads(line)
+            except ValueError as exc:
+                print(f"Invalid JSON line: {exc}", file=sys.stderr)
+                continue
+            with tracer.span("normalize"):
+                payload = build_payload(data, extractor)
+            if payload is None:
+                print("Missing session or weekly percent values.", file=sys.stderr)
+                continue
+            sys.stdout.write(json.dumps(tracer.annotate(payload, mark)) + "\n")
+            sys.stdout.flush()
+    except (LineTimeout, RuntimeError) as exc:
+        print(str(exc), file=sys.stderr)
+        status, grace = 1, 0.0
+    except BrokenPipeError:
+        # The reader went away; stop quietly and keep Python from complaining at exit.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        status, grace = 0, 0.0
+    except KeyboardInterrupt:
+        status, grace = 130, 0.0
+    finally:
+        code = stop_process(process, grace)
+    if status is not None:
+        return status
+    if code:
+        print(f"Command failed with exit code {code}.", file=sys.stderr)
+        return 1
+    return 0
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="Wrap a provider command into MenuUsage JSON.")
     parser.add_argument("--cmd", help="Shell command to run and parse JSON output")
     parser.add_argument("--file", help="Read JSON from file instead of running a command")
+    parser.add_argument("--follow", action="store_true",
+                        help="Keep reading JSON lines from --cmd or stdin and print one payload per line")
+    parser.add_argument("--line-timeout", type=float, default=0.0,
+                        help="With --follow, give up if no complete line arrives within this many seconds")
+    parser.add_argument("--mappings", help=f"JSON file of extra field paths (default {DEFAULT_MAPPINGS_PATH} if present)")
+    parser.add_argument("--timings", action="store_true", help="Add per-phase milliseconds as a `timings` object")
+    parser.add_argument("--trace", metavar="PATH", help="Write a Chrome trace-event file for the run")
     args = parser.parse_args()
+    tracer = Tracer(args.timings, args.trace)
+    try:
+        return run(args, parser, tracer)
+    finally:
+        tracer.write()
+
 
-    raw = read_input(args.cmd, args.file).strip()
+def run(args: argparse.Namespace, parser: argparse.ArgumentParser, tracer: Tracer) -> int:
+    try:
+        extractor = Extractor(load_mappings(args.mappings))
+    except RuntimeError as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
+
+    if args.follow:
+        if args.file:
+            parser.error("--follow reads from --cmd or stdin, not --file")
+        return follow(args.cmd, extractor, max(0.0, args.line_timeout), tracer)
+
+    with tracer.span("input.read"):
+        raw = read_input(args.cmd, args.file).strip()
     if not raw:
         print("Empty input.", file=sys.stderr)
         return 1
 
     try:
-        data = json.loads(raw)
+        with tracer.span("json.decode"):
+            data = json.loads(raw)
     except json.JSONDecodeError as exc:
         print(f"Invalid JSON: {exc}", file=sys.stderr)
         return 1
 
-    session = first_number(
-        data,
-        [
-            "sessionPercent",
-            "session_percent",
-            "five_hour.utilization",
-            "fiveHour.utilization",
-            "rate_limit.primary_window.used_percent",
-            "rateLimit.primaryWindow.used_percent",
-            "primary_window.used_percent",
-        ],
-    )
-    weekly = first_number(
-        data,
-        [
-            "weeklyPercent",
-            "weekly_percent",
-            "seven_day.utilization",
-            "sevenDay.utilization",
-            "rate_limit.secondary_window.used_percent",
-            "rateLimit.secondaryWindow.used_percent",
-            "secondary_window.used_percent",
-        ],
-    )
-
-    if session is None or weekly is None:
+    with tracer.span("normalize"):
+        payload = build_payload(data, extractor)
+    if payload is None:
         print("Missing session or weekly percent values.", file=sys.stderr)
         return 1
-
-    session_reset = read_reset(
-        data,
-        [
-            "five_hour.resets_at",
-            "fiveHour.resets_at",
-            "primary_window.reset_at",
-            "rate_limit.primary_window.reset_at",
-            "rateLimit.primaryWindow.reset_at",
-        ],
-    )
-    weekly_reset = read_reset(
-        data,
-        [
-            "seven_day.resets_at",
-            "sevenDay.resets_at",
-            "secondary_window.reset_at",
-            "rate_limit.secondary_window.reset_at",
-            "rateLimit.secondaryWindow.reset_at",
-        ],
-    )
-
-    payload = {
-        "sessionPercent": session,
-        "weeklyPercent": weekly,
-        "sessionResetAt": session_reset,
-        "weeklyResetAt": weekly_reset,
-        "updatedAt": datetime.now(timezone.utc).isoformat(),
-    }
-    print(json.dumps(payload))
+    print(json.dumps(tracer.annotate(payload)))
     return 0
 
 